@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Throughput of batched multi-record prompts versus one chat request per record.
+
+Runs against benchmarks.stand_in_ollama, whose latency model charges per-request overhead,
+prefill per prompt character and decode per generated character. Batching only saves the
+overhead and the repeated instruction prefill, so the gain depends on how large those are
+relative to decoding; two rough profiles for an 8B model are compared. Adjust PROFILES to
+match your hardware.
+
+Usage: python -m benchmarks.bench_batch_prompt [records] [scale]
+"""
+
+import asyncio
+import sys
+import time
+from unittest.mock import patch
+
+from benchmarks.common import REASONS, synthetic_email
+from benchmarks.stand_in_ollama import StandInOllama
+from config import config
+from services import OllamaService
+
+
+def records(count: int):
+    return [
+        (synthetic_email(i), REASONS[i % len(REASONS)], "2024-01-15T10:30:00Z",
+         "January 15, 2024 at 10:30 AM UTC", "emails to this address consistently bounce back")
+        for i in range(count)
+    ]
+
+
+PROFILES = {
+    "gpu": {"overhead_ms": 30.0, "prefill_ms_per_char": 0.15, "decode_ms_per_char": 4.0},
+    "cpu": {"overhead_ms": 50.0, "prefill_ms_per_char": 2.5, "decode_ms_per_char": 10.0},
+}
+
+
+def main(count: int, scale: float):
+    for profile, costs in PROFILES.items():
+        print(f"\n{profile} profile: {costs}")
+        run_profile(count, scale, costs)
+    print("\nrecords/s and model time are in unscaled (simulated model) time.")
+
+
+def run_profile(count: int, scale: float, costs: dict):
+    print(f"{'batch size':>10} {'records/s':>10} {'model time':>11} {'prefill chars':>14} {'requests':>9} {'fallbacks':>9}")
+    for batch_size in (1, 4, 8, 16):
+        with StandInOllama(scale=scale, load_ms=0, **costs) as server, \
+             patch.object(config, "OLLAMA_BASE_URL", server.url), \
+             patch.object(config, "OLLAMA_BATCH_SIZE", batch_size), \
+             patch.object(config, "EXPLANATION_BUDGET_SECONDS", 0), \
+             patch.object(config, "OLLAMA_MAX_QUEUE", count):
+            service = OllamaService()
+            start = time.perf_counter()
+            results = asyncio.run(service.agenerate_batch(records(count)))
+            elapsed = time.perf_counter() - start
+        assert not any(result.degraded for result in results)
+        print(f"{batch_size:>10} {count / elapsed * scale:>10.2f} {elapsed / scale:>10.1f}s "
+              f"{server.prefilled_chars:>14,} {server.requests:>9} {service.batch_fallbacks:>9}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 32,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    )
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Hit-heavy versus miss-heavy lookup latency with and without the Bloom filter.
+
+Usage: python -m benchmarks.bench_bloom [rows] [false_positive_rate]
+"""
+
+import os
+import random
+import sys
+import tempfile
+from unittest.mock import patch
+
+from benchmarks.common import synthetic_email, temp_dataset, time_per_call
+from config import config
+from services import SuppressionService
+from snapshot import build_snapshot
+
+WORKLOADS = {"hit-heavy (90% hits)": 0.9, "miss-heavy (10% hits)": 0.1}
+
+
+def workload(rows: int, hit_ratio: float, size: int = 20_000):
+    rng = random.Random(7)
+    return [
+        synthetic_email(rng.randrange(rows)) if rng.random() < hit_ratio else f"nobody{i}@example.org"
+        for i in range(size)
+    ]
+
+
+def main(rows: int, rate: float):
+    print(f"{'backend':>9} {'filter':>7} " + " ".join(f"{name:>22}" for name in WORKLOADS))
+    with temp_dataset(rows) as path, tempfile.TemporaryDirectory() as directory, \
+         patch.object(config, "SUPPRESSION_LOAD_PROGRESS_EVERY", 0), \
+         patch.object(config, "SUPPRESSION_BLOOM_FALSE_POSITIVE_RATE", rate):
+        snapshot_path = os.path.join(directory, "bench.snap")
+        build_snapshot(path, snapshot_path, progress_every=0)
+        for backend in ("dict", "compact", "snapshot"):
+            for enabled in (False, True):
+                with patch.object(config, "SUPPRESSION_STORE_BACKEND", "compact" if backend == "snapshot" else backend), \
+                     patch.object(config, "SUPPRESSION_SNAPSHOT_PATH", snapshot_path if backend == "snapshot" else ""), \
+                     patch.object(config, "SUPPRESSION_BLOOM_FILTER_ENABLED", enabled):
+                    service = SuppressionService()
+                timings = [
+                    time_per_call(service.check_email_suppression, workload(rows, ratio))
+                    for ratio in WORKLOADS.values()
+                ]
+                print(f"{backend:>9} {'on' if enabled else 'off':>7} " + " ".join(f"{t * 1e6:>20.2f}us" for t in timings))
+        misses = [f"nobody{i}@example.org" for i in range(100_000)]
+        observed = sum(email in service.negative_filter for email in misses) / len(misses)
+        print(f"\nConfigured false-positive rate {rate:.4f}, observed {observed:.4f}, "
+              f"filter size {service.negative_filter.size_bytes / 1e6:.2f} MB for {rows:,} rows")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200_000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+    )
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Domain rule lookup cost versus the number of rules.
+
+Builds DomainRuleTrie with growing numbers of synthetic rules (half *@domain, half
+*.domain) and times match() for addresses that hit a rule and addresses that do not.
+For comparison, the "scan" column checks the same addresses against every rule in turn,
+which is what a list of patterns would cost.
+
+Usage: python -m benchmarks.bench_domain_rules [max_rules]
+"""
+
+import random
+import sys
+
+from benchmarks.common import time_per_call
+from domain_rules import DomainRuleTrie, parse_pattern
+
+
+def rule_pattern(i: int) -> str:
+    return f"*@mail{i}.example{i % 101}.com" if i % 2 else f"*.corp{i}.example{i % 101}.net"
+
+
+def scan_match(rules, key: str):
+    """Check ``key`` against every (labels, subdomains) rule; the most specific one wins"""
+    labels = key.rpartition("@")[2].split(".")[::-1]
+    best = None
+    for rule_labels, subdomains in rules:
+        depth = len(rule_labels)
+        if labels[:depth] == rule_labels and (len(labels) > depth if subdomains else len(labels) == depth):
+            if best is None or depth > len(best[0]):
+                best = (rule_labels, subdomains)
+    return best
+
+
+def main(max_rules: int) -> int:
+    sizes = [10]
+    while sizes[-1] * 10 <= max_rules:
+        sizes.append(sizes[-1] * 10)
+    print(f"{'rules':>9} {'hit':>10} {'miss':>10} {'scan hit':>12}")
+    for size in sizes:
+        trie = DomainRuleTrie()
+        for i in range(size):
+            trie.add(rule_pattern(i), "BOUNCE", "2024-01-01T00:00:00Z")
+        rng = random.Random(size)
+        hits = []
+        for _ in range(10_000):
+            i = rng.randrange(size)
+            domain = rule_pattern(i).lstrip("*@.")
+            hits.append(f"user@{domain}" if i % 2 else f"user@eu.{domain}")
+        misses = [f"user{i}@elsewhere{i % 97}.org" for i in range(10_000)]
+        assert all(trie.match(key) is not None for key in hits)
+
+        hit = time_per_call(trie.match, hits)
+        miss = time_per_call(trie.match, misses)
+        scan = "-"
+        if size <= 10_000:
+            rules = [parse_pattern(rule_pattern(i)) for i in range(size)]
+            scan = f"{time_per_call(lambda key: scan_match(rules, key), hits[:100], repeat=1) * 1e6:>10.1f}us"
+        print(f"{size:>9,} {hit * 1e6:>8.2f}us {miss * 1e6:>8.2f}us {scan:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Time to first token for bursty /check-email traffic, before and after the prompt layout change.
+
+Runs against benchmarks.stand_in_ollama, which keeps the previous prompt's prefill cached
+and unloads the model once its keep-alive expires. Traffic arrives in bursts separated by
+idle gaps longer than the server's default keep-alive. Three configurations are compared:
+
+- legacy prompt: the old single user message with the record in the middle of the
+  instructions, and no keep_alive sent (the model unloads between bursts);
+- system prompt: fixed system message plus a small user message, still no keep_alive;
+- system prompt + keep-alive + warm-up: OLLAMA_KEEP_ALIVE=-1 and a startup warm-up.
+
+Usage: python -m benchmarks.bench_first_token [requests_per_burst] [bursts] [scale]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+from benchmarks.common import REASONS, synthetic_email
+from benchmarks.stand_in_ollama import StandInOllama
+from config import config
+from services import OllamaService
+
+# Real seconds; the stand-in unloads the model after half a gap when no keep_alive is sent
+IDLE_GAP_SECONDS = 1.0
+
+
+def legacy_messages(self, email, reason, formatted_time, reason_explanation):
+    prompt = f"""You are an email suppression status assistant. Provide a clear, concise explanation in 1-2 sentences.
+
+Email: {email}
+Status: Suppressed
+Reason: {reason}
+Last Updated: {formatted_time}
+Reason Explanation: {reason_explanation}
+
+Write a professional explanation that combines all this information into a natural, human-readable response. Do not include any additional text, headers, formatting, thinking process, or reasoning - just provide the final explanation directly."""
+    return [{"role": "user", "content": prompt}]
+
+
+async def first_token_ms(service: OllamaService, index: int) -> float:
+    start = time.perf_counter()
+    stream = service.astream_explanation(
+        synthetic_email(index), REASONS[index % len(REASONS)], "2024-01-15T10:30:00Z",
+        f"January {index % 28 + 1}, 2024 at 10:30 AM UTC", "emails to this address consistently bounce back"
+    )
+    first = None
+    async for kind, _ in stream:
+        if kind == "token" and first is None:
+            first = time.perf_counter() - start
+    return first * 1000
+
+
+async def traffic(service: OllamaService, per_burst: int, bursts: int, warm_up: bool):
+    if warm_up:
+        await service.warm_up()
+    latencies = []
+    for burst in range(bursts):
+        if burst:
+            await asyncio.sleep(IDLE_GAP_SECONDS)
+        for i in range(per_burst):
+            latencies.append(await first_token_ms(service, burst * per_burst + i))
+    return latencies
+
+
+def run(label: str, per_burst: int, bursts: int, scale: float, keep_alive: str, warm_up: bool, legacy: bool):
+    with StandInOllama(scale=scale, default_keep_alive=IDLE_GAP_SECONDS / 2) as server, \
+         patch.object(config, "OLLAMA_BASE_URL", server.url), \
+         patch.object(config, "OLLAMA_KEEP_ALIVE", keep_alive), \
+         patch.object(config, "EXPLANATION_BUDGET_SECONDS", 0), \
+         patch.object(config, "EXPLANATION_CACHE_MODE", "off"):
+        service = OllamaService()
+        if legacy:
+            with patch.object(OllamaService, "_build_messages", legacy_messages):
+                latencies = asyncio.run(traffic(service, per_burst, bursts, warm_up))
+        else:
+            latencies = asyncio.run(traffic(service, per_burst, bursts, warm_up))
+    latencies = sorted(ms / scale for ms in latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{label:<38} {statistics.median(latencies):>8.0f} {p95:>8.0f} {latencies[-1]:>8.0f} "
+          f"{server.loads:>6} {server.prefilled_chars / server.requests:>13.0f}")
+
+
+def main(per_burst: int, bursts: int, scale: float):
+    print(f"{bursts} bursts of {per_burst} requests, idle gaps longer than the server's default keep-alive")
+    print(f"{'configuration':<38} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'loads':>6} {'prefill/req':>13}")
+    run("legacy prompt", per_burst, bursts, scale, keep_alive="", warm_up=False, legacy=True)
+    run("system prompt", per_burst, bursts, scale, keep_alive="", warm_up=False, legacy=False)
+    run("system prompt + keep-alive + warm-up", per_burst, bursts, scale, keep_alive="-1", warm_up=True, legacy=False)
+    print("\nLatencies are in unscaled (simulated model) time; prefill/req is in prompt characters.")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 10, int(args[1]) if len(args) > 1 else 3, float(args[2]) if len(args) > 2 else 0.1)
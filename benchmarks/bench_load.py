@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Compare peak memory and time of json.load against the streaming loader.
+
+Usage: python -m benchmarks.bench_load [sizes...]
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import temp_dataset
+from loader import iter_suppressed_destinations
+
+
+def measure(func):
+    """Return (seconds, peak traced bytes) for one call of ``func``"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def json_load_items(path):
+    with open(path) as f:
+        for _ in json.load(f)["SuppressedDestinationSummaries"]:
+            pass
+
+
+def streamed_items(path):
+    for _ in iter_suppressed_destinations(path):
+        pass
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'json.load':>22} {'streaming':>22}")
+    for size in sizes:
+        with temp_dataset(size) as path:
+            load_time, load_peak = measure(lambda: json_load_items(path))
+            stream_time, stream_peak = measure(lambda: streamed_items(path))
+        print(f"{size:>10} {load_time:>8.2f}s {load_peak / 1e6:>9.1f} MB "
+              f"{stream_time:>8.2f}s {stream_peak / 1e6:>9.1f} MB")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 500_000])
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Compare the hash-indexed lookup against the previous linear scan.
+
+Usage: python -m benchmarks.bench_lookup [sizes...]
+"""
+
+import sys
+from typing import Optional
+
+from benchmarks.common import synthetic_email, temp_dataset, time_per_call
+from models import SuppressionInfo
+from services import SuppressionService
+
+
+def linear_scan(service: SuppressionService, email: str) -> Optional[SuppressionInfo]:
+    """The pre-index implementation of check_email_suppression"""
+    for suppressed_email in service.suppressed_emails_data:
+        if suppressed_email.email_address.lower() == email.lower():
+            return suppressed_email
+    return None
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'scan hit':>12} {'scan miss':>12} {'index hit':>12} {'index miss':>12}")
+    for size in sizes:
+        with temp_dataset(size):
+            service = SuppressionService()
+        hits = [synthetic_email(i).upper() for i in range(0, size, max(1, size // 50))]
+        misses = [f"nobody{i}@example.org" for i in range(len(hits))]
+        scan_hit = time_per_call(lambda e: linear_scan(service, e), hits, repeat=1)
+        scan_miss = time_per_call(lambda e: linear_scan(service, e), misses, repeat=1)
+        index_hit = time_per_call(service.check_email_suppression, hits * 100)
+        index_miss = time_per_call(service.check_email_suppression, misses * 100)
+        print(f"{size:>10} {scan_hit * 1e6:>10.1f}us {scan_miss * 1e6:>10.1f}us "
+              f"{index_hit * 1e6:>10.2f}us {index_miss * 1e6:>10.2f}us")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
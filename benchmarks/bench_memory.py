@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Memory footprint and lookup latency of each suppression store backend.
+
+Usage: python -m benchmarks.bench_memory [rows]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+from unittest.mock import patch
+
+from benchmarks.common import synthetic_email, temp_dataset, time_per_call
+from config import config
+from services import SuppressionService
+from stores import STORE_BACKENDS
+
+
+def main(rows: int):
+    print(f"{'backend':>10} {'rows':>10} {'traced':>12} {'reported':>12} {'B/row':>8} {'load':>8} {'hit':>9} {'miss':>9}")
+    with temp_dataset(rows):
+        for backend in STORE_BACKENDS:
+            gc.collect()
+            with patch.object(config, "SUPPRESSION_STORE_BACKEND", backend), \
+                 patch.object(config, "SUPPRESSION_LOAD_PROGRESS_EVERY", 0):
+                tracemalloc.start()
+                start = time.perf_counter()
+                service = SuppressionService()
+                load_time = time.perf_counter() - start
+                traced, _ = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            report = service.memory_footprint()
+            hits = [synthetic_email(i) for i in range(0, rows, max(1, rows // 1000))]
+            misses = [f"nobody{i}@example.org" for i in range(len(hits))]
+            hit = time_per_call(service.check_email_suppression, hits)
+            miss = time_per_call(service.check_email_suppression, misses)
+            print(f"{backend:>10} {rows:>10} {traced / 1e6:>9.1f} MB {report['bytes'] / 1e6:>9.1f} MB "
+                  f"{traced // rows:>8} {load_time:>7.2f}s {hit * 1e6:>7.2f}us {miss * 1e6:>7.2f}us")
+            del service
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Operational queries through the secondary indexes versus scanning the store.
+
+Fills a store with synthetic rows (five years of LastUpdateTime, four reasons), builds
+SuppressionQueryIndex over it and times:
+
+- "BOUNCE since yesterday": first page of 100, as GET /suppressions would serve it;
+- a page 1000 pages deep, reached through a cursor;
+- counts by reason per day over the whole range and over the last 30 days.
+
+The scan column is what answering the same question from suppressed_emails_data costs
+(pass --no-scan to skip it on very large stores).
+
+Usage: python -m benchmarks.bench_query [rows] [--backend compact|dict] [--no-scan]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import List
+
+from benchmarks.common import synthetic_records
+from query_index import SuppressionQueryIndex
+from stores import create_store
+
+
+def best_of(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("rows", type=int, nargs="?", default=1_000_000)
+    parser.add_argument("--backend", choices=("compact", "dict"), default="compact")
+    parser.add_argument("--no-scan", action="store_true", help="skip the full-scan comparison")
+    args = parser.parse_args(argv)
+
+    store = create_store(args.backend)
+    start = time.perf_counter()
+    for item in synthetic_records(args.rows):
+        address = item["EmailAddress"]
+        store.add(address.lower(), address, item["Reason"], item["LastUpdateTime"])
+    print(f"{args.rows:,} rows ({args.backend} store) filled in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    index = SuppressionQueryIndex(store, version=1)
+    build_seconds = time.perf_counter() - start
+    # Built a second time for the allocation peak; tracing would distort the timing above
+    tracemalloc.start()
+    SuppressionQueryIndex(store, version=1)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"index built in {build_seconds:.2f}s: {index.size_bytes / 1e6:.1f} MB "
+          f"({index.size_bytes / max(1, len(index)):.1f} bytes/entry), peak while building {peak / 1e6:.1f} MB\n")
+
+    latest = index.epochs[-1]
+    yesterday = latest - 86400
+    month = latest - 30 * 86400
+
+    def deep_page():
+        cursor = index._encode_cursor(1000 * 100)
+        return index.query(limit=100, cursor=cursor)
+
+    queries = {
+        "BOUNCE since yesterday, first 100": (
+            lambda: index.query(reason="BOUNCE", since=yesterday, limit=100),
+            lambda: [info for info in store if info.reason == "BOUNCE" and info.last_update_epoch >= yesterday][:100],
+        ),
+        "all entries, page 1001 of 100": (
+            deep_page,
+            lambda: sorted(store, key=lambda info: info.last_update_epoch)[100_000:100_100],
+        ),
+        "count by reason per day, all time": (
+            lambda: index.counts(interval="day"),
+            lambda: [(info.reason, info.last_update_epoch // 86400) for info in store],
+        ),
+        "count by reason per day, 30 days": (
+            lambda: index.counts(since=month, interval="day"),
+            lambda: [(info.reason, info.last_update_epoch // 86400) for info in store if info.last_update_epoch >= month],
+        ),
+    }
+    print(f"{'query':<36} {'index':>12} {'scan':>12}")
+    for name, (indexed, scan) in queries.items():
+        indexed_seconds = best_of(indexed)
+        scan_text = "-" if args.no_scan else f"{best_of(scan, repeat=1) * 1000:>10.1f}ms"
+        print(f"{name:<36} {indexed_seconds * 1000:>10.3f}ms {scan_text:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
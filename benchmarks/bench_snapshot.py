@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Cold-start time of SuppressionService from JSON versus an mmapped snapshot.
+
+Usage: python -m benchmarks.bench_snapshot [sizes...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from benchmarks.common import synthetic_email, temp_dataset, time_per_call
+from config import config
+from services import SuppressionService
+from snapshot import build_snapshot
+
+
+def start_service() -> tuple:
+    start = time.perf_counter()
+    service = SuppressionService()
+    return time.perf_counter() - start, service
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'json start':>11} {'build':>8} {'snap start':>11} {'snap hit':>9} {'snap miss':>9}")
+    for size in sizes:
+        with temp_dataset(size) as path, tempfile.TemporaryDirectory() as directory, \
+             patch.object(config, "SUPPRESSION_LOAD_PROGRESS_EVERY", 0):
+            json_start, _ = start_service()
+            snapshot_path = os.path.join(directory, "bench.snap")
+            build_start = time.perf_counter()
+            build_snapshot(path, snapshot_path, progress_every=0)
+            build_time = time.perf_counter() - build_start
+            with patch.object(config, "SUPPRESSION_SNAPSHOT_PATH", snapshot_path):
+                snap_start, service = start_service()
+            hits = [synthetic_email(i) for i in range(0, size, max(1, size // 1000))]
+            misses = [f"nobody{i}@example.org" for i in range(len(hits))]
+            hit = time_per_call(service.check_email_suppression, hits)
+            miss = time_per_call(service.check_email_suppression, misses)
+            service.suppressed_emails_index.close()
+        print(f"{size:>10} {json_start:>10.2f}s {build_time:>7.2f}s {snap_start * 1e3:>9.2f}ms "
+              f"{hit * 1e6:>7.2f}us {miss * 1e6:>7.2f}us")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 500_000])
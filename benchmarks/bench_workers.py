@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Per-worker memory and throughput scaling of the multi-process run modes.
+
+Starts the service on a synthetic export with 1..N worker processes in three ways:
+
+- uvicorn --workers: each worker is a fresh interpreter that parses the JSON itself;
+- serve.py preload: the index is loaded once in the parent and shared copy-on-write;
+- serve.py snapshot: the index is a snapshot mapped by every worker.
+
+For each run it drives /check-email (half hits, half misses, explanation_mode "none")
+from --clients load-generating processes, then reads /proc/<pid>/smaps_rollup of every
+process. RSS counts shared pages in full for each worker; PSS divides them between the
+processes sharing them, so the PSS total is the memory the whole service really uses.
+
+Usage: python -m benchmarks.bench_workers [rows] [max_workers] [requests] [--clients N]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from benchmarks.common import synthetic_email, write_dataset
+from snapshot import build_snapshot
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    "uvicorn --workers": lambda port, workers: [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                                                "--workers", str(workers), "--no-access-log"],
+    "serve.py preload": lambda port, workers: [sys.executable, "serve.py", "--port", str(port), "--workers",
+                                               str(workers), "--shared-index", "preload", "--no-access-log"],
+    "serve.py snapshot": lambda port, workers: [sys.executable, "serve.py", "--port", str(port), "--workers",
+                                                str(workers), "--shared-index", "snapshot", "--no-access-log"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    """Rss, Pss and private bytes of ``pid`` in kB"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                values[key] = int(rest.split()[0])
+    return values
+
+
+def drive(port: int, emails: List[str], concurrency: int) -> List[float]:
+    """One load-generating process: POST every email, ``concurrency`` at a time; returns latencies"""
+    import httpx
+
+    async def run():
+        latencies = []
+        queue = list(emails)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            async def worker():
+                while queue:
+                    email = queue.pop()
+                    start = time.perf_counter()
+                    response = await client.post("/check-email", json={"email": email, "explanation_mode": "none"})
+                    latencies.append(time.perf_counter() - start)
+                    response.raise_for_status()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies
+
+    return asyncio.run(run())
+
+
+def wait_ready(log_path: str, workers: int, process: subprocess.Popen, timeout: float = 600) -> List[int]:
+    """Wait until every worker has started; returns the worker pids"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}:\n{open(log_path).read()}")
+        with open(log_path) as f:
+            log = f.read()
+        if log.count("Application startup complete.") >= workers:
+            return [int(pid) for pid in re.findall(r"Started server process \[(\d+)\]", log)]
+        time.sleep(0.2)
+    raise RuntimeError(f"workers not ready after {timeout}s")
+
+
+def measure(mode: str, workers: int, dataset: str, rows: int, requests: int, clients: int, concurrency: int) -> Dict:
+    port = free_port()
+    env = dict(os.environ, SUPPRESSED_EMAILS_JSON_PATH=dataset, SUPPRESSION_SNAPSHOT_PATH="",
+               SUPPRESSION_LOAD_PROGRESS_EVERY="0", OLLAMA_WARMUP_ON_STARTUP="false",
+               OLLAMA_HEALTH_CHECK_INTERVAL_SECONDS="0", WARMER_ENABLED="false")
+    log_path = dataset + f".{port}.log"
+    with open(log_path, "w") as log:
+        started = time.perf_counter()
+        process = subprocess.Popen(MODES[mode](port, workers), cwd=ROOT, env=env, stdout=log,
+                                   stderr=subprocess.STDOUT, start_new_session=True)
+    try:
+        pids = wait_ready(log_path, workers, process)
+        ready_seconds = time.perf_counter() - started
+
+        rng = random.Random(workers)
+        emails = [synthetic_email(rng.randrange(rows)) if i % 2 else f"nobody{i}@example.org" for i in range(requests)]
+        shares = [emails[i::clients] for i in range(clients)]
+        with ProcessPoolExecutor(clients) as pool:
+            start = time.perf_counter()
+            results = list(pool.map(drive, [port] * clients, shares, [concurrency] * clients))
+            elapsed = time.perf_counter() - start
+        latencies = sorted(latency for result in results for latency in result)
+
+        per_worker = [memory_kb(pid) for pid in pids]
+        total_pss = sum(memory_kb(pid)["Pss"] for pid in {process.pid, *pids})
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+        os.unlink(log_path)
+    return {
+        "ready_seconds": ready_seconds,
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "worker_rss_mb": sum(sample["Rss"] for sample in per_worker) / len(per_worker) / 1024,
+        "worker_pss_mb": sum(sample["Pss"] for sample in per_worker) / len(per_worker) / 1024,
+        "worker_private_mb": sum(sample["Private_Clean"] + sample["Private_Dirty"] for sample in per_worker)
+                             / len(per_worker) / 1024,
+        "total_pss_mb": total_pss / 1024,
+    }
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("rows", type=int, nargs="?", default=1_000_000)
+    parser.add_argument("max_workers", type=int, nargs="?", default=4)
+    parser.add_argument("requests", type=int, nargs="?", default=4000)
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="load-generating processes (default: half the CPUs)")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight per client")
+    args = parser.parse_args(argv)
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("This benchmark reads /proc/<pid>/smaps_rollup and needs Linux 4.14 or later")
+        return 1
+
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= args.max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != args.max_workers:
+        worker_counts.append(args.max_workers)
+
+    directory = tempfile.mkdtemp(prefix="bench-workers-")
+    dataset = write_dataset(os.path.join(directory, "suppressed.json"), args.rows)
+    # Built up front (where serve.py looks for it) so start-up times compare loading, not compiling
+    build_snapshot(dataset, os.path.splitext(dataset)[0] + ".snap", progress_every=0)
+    print(f"{args.rows:,} rows, {args.requests:,} requests from {args.clients} client process(es), "
+          f"{os.cpu_count()} CPU(s)")
+    print(f"{'mode':<20} {'workers':>7} {'ready s':>8} {'req/s':>8} {'p50 ms':>7} "
+          f"{'RSS/worker':>11} {'PSS/worker':>11} {'private/worker':>15} {'total PSS':>10}")
+    try:
+        for mode in MODES:
+            for workers in worker_counts:
+                r = measure(mode, workers, dataset, args.rows, args.requests, args.clients, args.concurrency)
+                print(f"{mode:<20} {workers:>7} {r['ready_seconds']:>8.1f} {r['requests_per_second']:>8.0f} "
+                      f"{r['p50_ms']:>7.1f} {r['worker_rss_mb']:>8.1f} MB {r['worker_pss_mb']:>8.1f} MB "
+                      f"{r['worker_private_mb']:>12.1f} MB {r['total_pss_mb']:>7.1f} MB")
+    finally:
+        for name in os.listdir(directory):
+            os.unlink(os.path.join(directory, name))
+        os.rmdir(directory)
+    print("\nMemory is read after the traffic, so pages copied on write by lookups are included.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
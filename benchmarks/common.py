@@ -0,0 +1,70 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import json
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+from unittest.mock import patch
+
+from config import config
+
+REASONS = ["COMPLAINT", "BOUNCE", "UNSUBSCRIBE", "REPUTATION"]
+
+
+def synthetic_email(i: int) -> str:
+    """Deterministic synthetic address for row ``i``"""
+    return f"recipient{i}@example{i % 97}.com"
+
+
+def synthetic_records(count: int, seed: int = 42) -> Iterator[Dict[str, str]]:
+    """Yield ``count`` SuppressedDestinationSummaries items"""
+    rng = random.Random(seed)
+    base = 1577836800  # 2020-01-01T00:00:00Z
+    for i in range(count):
+        ts = base + rng.randrange(0, 5 * 365 * 24 * 3600)
+        yield {
+            "EmailAddress": synthetic_email(i),
+            "Reason": REASONS[rng.randrange(len(REASONS))],
+            "LastUpdateTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts)),
+        }
+
+
+def write_dataset(path: str, count: int, seed: int = 42) -> str:
+    """Write a synthetic export to ``path`` without holding it in memory"""
+    with open(path, "w") as f:
+        f.write('{\n    "SuppressedDestinationSummaries": [\n')
+        for i, item in enumerate(synthetic_records(count, seed)):
+            if i:
+                f.write(",\n")
+            f.write("        " + json.dumps(item))
+        f.write("\n    ]\n}\n")
+    return path
+
+
+@contextmanager
+def temp_dataset(count: int, seed: int = 42) -> Iterator[str]:
+    """Create a temporary synthetic export and point the config at it"""
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        write_dataset(path, count, seed)
+        with patch.object(config, "SUPPRESSED_EMAILS_JSON_PATH", path):
+            yield path
+    finally:
+        os.unlink(path)
+
+
+def time_per_call(func, args: List, repeat: int = 3) -> float:
+    """Best-of-``repeat`` mean seconds per call of ``func`` over ``args``"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for arg in args:
+            func(arg)
+        best = min(best, (time.perf_counter() - start) / len(args))
+    return best
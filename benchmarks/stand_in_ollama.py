@@ -0,0 +1,154 @@
+"""
+Local stand-in for an Ollama server with a simple latency model, for benchmarks.
+
+Each chat request costs a fixed overhead, plus prefill time per prompt character not
+covered by the cached prefix of the previous prompt (mimicking the server's KV cache),
+plus decode time per generated character. Requests are processed one at a time, like a
+single loaded model. All costs are multiplied by ``scale`` so benchmarks stay short while
+keeping the ratios between configurations.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+SENTENCE = ("The email address {email} is suppressed because of a {reason} event, so messages to it "
+            "are withheld to protect sender reputation; this was last updated on {time}.")
+
+
+def _prompt_text(messages: List[Dict[str, str]]) -> str:
+    return "".join(f"<{m.get('role')}>{m.get('content', '')}" for m in messages)
+
+
+def _field(prompt: str, name: str) -> str:
+    match = re.search(rf"^{name}: (.*)$", prompt, flags=re.MULTILINE)
+    return match.group(1) if match else "unknown"
+
+
+class StandInOllama:
+    """Context manager running the stand-in server on a free local port"""
+
+    def __init__(self, overhead_ms: float = 30.0, prefill_ms_per_char: float = 0.15,
+                 decode_ms_per_char: float = 4.0, load_ms: float = 2000.0, scale: float = 0.1,
+                 default_keep_alive: float = 300.0):
+        self.overhead_ms = overhead_ms
+        self.prefill_ms_per_char = prefill_ms_per_char
+        self.decode_ms_per_char = decode_ms_per_char
+        self.load_ms = load_ms
+        self.scale = scale
+        # Seconds the model stays loaded when a request sends no keep_alive (real, unscaled time)
+        self.default_keep_alive = default_keep_alive
+        self.model_lock = threading.Lock()
+        self.cached_prompt = ""
+        self.loaded_until = 0.0
+        self.requests = 0
+        self.prefilled_chars = 0
+        self.loads = 0
+
+    def _sleep_ms(self, ms: float) -> None:
+        time.sleep(ms * self.scale / 1000)
+
+    def _admit(self, request: dict) -> str:
+        """Charge load, overhead and prefill for a request; returns its prompt text"""
+        prompt = _prompt_text(request.get("messages") or [])
+        now = time.monotonic()
+        if now >= self.loaded_until:
+            self.loads += 1
+            self.cached_prompt = ""
+            self._sleep_ms(self.load_ms)
+        common = 0
+        for a, b in zip(prompt, self.cached_prompt):
+            if a != b:
+                break
+            common += 1
+        self._sleep_ms(self.overhead_ms + (len(prompt) - common) * self.prefill_ms_per_char)
+        self.prefilled_chars += len(prompt) - common
+        self.cached_prompt = prompt
+        keep_alive = request.get("keep_alive")
+        seconds = self.default_keep_alive if keep_alive is None else _duration_seconds(keep_alive)
+        self.loaded_until = float("inf") if seconds < 0 else time.monotonic() + seconds
+        self.requests += 1
+        return prompt
+
+    def _reply_for(self, request: dict, prompt: str) -> str:
+        if request.get("format") == "json" and "Records:\n" in prompt:
+            records = json.loads(prompt.split("Records:\n", 1)[1])
+            return json.dumps({"explanations": [
+                {"id": r["id"], "explanation": SENTENCE.format(email=r["email"], reason=r["reason"], time=r["last_updated"])}
+                for r in records
+            ]})
+        if not request.get("messages"):
+            return ""
+        reply = SENTENCE.format(email=_field(prompt, "Email"), reason=_field(prompt, "Reason"), time=_field(prompt, "Last Updated"))
+        num_predict = (request.get("options") or {}).get("num_predict")
+        # Roughly four characters per token
+        return reply[:num_predict * 4] if num_predict and num_predict > 0 else reply
+
+    def __enter__(self) -> "StandInOllama":
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _json(self, payload: dict) -> None:
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._json({"models": [{"model": "stand-in", "name": "stand-in"}]})
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+                chunk = {"model": request.get("model", ""), "created_at": "2024-01-01T00:00:00Z", "done": False}
+                with stand_in.model_lock:
+                    prompt = stand_in._admit(request)
+                    reply = stand_in._reply_for(request, prompt)
+                    if not request.get("stream", True):
+                        stand_in._sleep_ms(len(reply) * stand_in.decode_ms_per_char)
+                        self._json(dict(chunk, done=True, message={"role": "assistant", "content": reply}))
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for i in range(0, len(reply), 4):
+                        stand_in._sleep_ms(4 * stand_in.decode_ms_per_char)
+                        self._chunk(dict(chunk, message={"role": "assistant", "content": reply[i:i + 4]}))
+                    self._chunk(dict(chunk, done=True, message={"role": "assistant", "content": ""}))
+                    self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, payload: dict) -> None:
+                data = json.dumps(payload).encode() + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _duration_seconds(value) -> float:
+    """Seconds in an Ollama keep_alive value (number of seconds or a "5m"/"30s"/"1h" string)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)(ms|s|m|h)?", str(value).strip())
+    if not match:
+        return 300.0
+    number, unit = float(match.group(1)), match.group(2) or "s"
+    return number * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: dataset load, lookup latency and /check-email throughput per dataset size.
+
+Each size runs in a fresh interpreter so its RSS figures are not polluted by the previous
+one. Per size it records:
+
+- load: SuppressionService start-up time (streaming _load_suppressed_emails into the store)
+  plus RSS before/after and peak RSS of the process;
+- lookup: check_email_suppression latency for hits and misses (mean, p50, p99);
+- asgi: /check-email requests per second and latency through the ASGI app (httpx
+  ASGITransport, no sockets), with OllamaService stubbed to answer instantly.
+
+Results are written as JSON; pass --baseline with an earlier file to compare, which exits
+non-zero when a metric regresses by more than --tolerance.
+
+Usage:
+    python -m benchmarks.suite [--sizes 1000 100000 1000000] [--output results.json]
+                               [--baseline old.json] [--tolerance 0.2] [--data-dir DIR]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.common import synthetic_email, write_dataset
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# Metrics compared against a baseline: (section, key, True if higher is better)
+COMPARED = [
+    ("load", "seconds", False),
+    ("load", "rss_delta_mb", False),
+    ("lookup", "hit_mean_ns", False),
+    ("lookup", "miss_mean_ns", False),
+    ("asgi", "requests_per_second", True),
+    ("asgi", "p50_ms", False),
+]
+
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size, where /proc is available"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def lookup_latencies(check, emails: List[str], rounds: int = 5) -> Dict[str, float]:
+    """Per-call latency samples (ns) and the best bulk mean over ``rounds`` passes"""
+    samples = []
+    clock = time.perf_counter_ns
+    for email in emails:
+        start = clock()
+        check(email)
+        samples.append(clock() - start)
+    best_mean = float("inf")
+    for _ in range(rounds):
+        start = clock()
+        for email in emails:
+            check(email)
+        best_mean = min(best_mean, (clock() - start) / len(emails))
+    return {"mean_ns": round(best_mean, 1), "p50_ns": percentile(samples, 0.5), "p99_ns": percentile(samples, 0.99)}
+
+
+async def asgi_throughput(app, emails: List[str], concurrency: int) -> Dict[str, float]:
+    import httpx
+
+    latencies = []
+    queue = list(reversed(emails))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            while queue:
+                email = queue.pop()
+                start = time.perf_counter()
+                response = await client.post("/check-email", json={"email": email})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise RuntimeError(f"/check-email returned {response.status_code}: {response.text}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def run_size(path: str, rows: int, requests: int, concurrency: int) -> Dict:
+    """Measure one dataset size in this process (run via --worker)"""
+    from unittest.mock import patch
+
+    from config import config
+    import main as app_module
+    from services import ExplanationResult, OllamaService, SuppressionService
+
+    class StubOllamaService(OllamaService):
+        """Answers every explanation with the template immediately"""
+
+        async def agenerate_explanation(self, email, reason, last_update_time, formatted_time,
+                                        reason_explanation, budget_seconds=None):
+            return ExplanationResult(self.template_explanation(email, formatted_time, reason_explanation))
+
+    rng = random.Random(7)
+    sample = min(rows, 10_000)
+    hits = [synthetic_email(rng.randrange(rows)) for _ in range(sample)]
+    misses = [f"nobody{i}@example.org" for i in range(sample)]
+
+    with patch.object(config, "SUPPRESSED_EMAILS_JSON_PATH", path), \
+         patch.object(config, "SUPPRESSION_LOAD_PROGRESS_EVERY", 0):
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        service = SuppressionService()
+        load_seconds = time.perf_counter() - start
+        rss_after = rss_mb()
+    info = service.dataset_info()
+    if info["entries"] == 0:
+        raise RuntimeError(f"no entries loaded from {path}")
+
+    hit = lookup_latencies(service.check_email_suppression, hits)
+    miss = lookup_latencies(service.check_email_suppression, misses)
+
+    mixed = [hits[i % len(hits)] if i % 2 == 0 else misses[i % len(misses)] for i in range(requests)]
+    with patch.object(app_module, "suppression_service", service), \
+         patch.object(app_module, "ollama_service", StubOllamaService()):
+        asgi = asyncio.run(asgi_throughput(app_module.app, mixed, concurrency))
+
+    return {
+        "rows": rows,
+        "load": {
+            "seconds": round(load_seconds, 4),
+            "entries": info["entries"],
+            "backend": info["backend"],
+            "rss_before_mb": round(rss_before, 1) if rss_before is not None else None,
+            "rss_after_mb": round(rss_after, 1) if rss_after is not None else None,
+            "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "store_bytes": service.memory_footprint()["bytes"],
+        },
+        "lookup": {
+            "samples": sample,
+            "hit_mean_ns": hit["mean_ns"], "hit_p50_ns": hit["p50_ns"], "hit_p99_ns": hit["p99_ns"],
+            "miss_mean_ns": miss["mean_ns"], "miss_p50_ns": miss["p50_ns"], "miss_p99_ns": miss["p99_ns"],
+        },
+        "asgi": asgi,
+    }
+
+
+def dataset(data_dir: str, rows: int) -> str:
+    """Synthetic export for ``rows``, generated once per data directory"""
+    path = os.path.join(data_dir, f"suppressed-{rows}.json")
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        write_dataset(path + ".tmp", rows)
+        os.replace(path + ".tmp", path)
+        print(f"  generated {rows:,} rows ({os.path.getsize(path) / 1e6:,.1f} MB) in {time.perf_counter() - start:.1f}s",
+              file=sys.stderr)
+    return path
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Print metric changes against ``baseline``; returns the regressions beyond ``tolerance``"""
+    previous = {entry["rows"]: entry for entry in baseline.get("results", [])}
+    regressions = []
+    print(f"\n{'rows':>10} {'metric':<26} {'baseline':>12} {'current':>12} {'change':>8}")
+    for entry in results["results"]:
+        old = previous.get(entry["rows"])
+        if old is None:
+            continue
+        for section, key, higher_is_better in COMPARED:
+            before, after = old.get(section, {}).get(key), entry[section].get(key)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            print(f"{entry['rows']:>10} {section + '.' + key:<26} {before:>12,.2f} {after:>12,.2f} {change:>+7.1%}{flag}")
+            if flag:
+                regressions.append(f"{entry['rows']} rows: {section}.{key} {change:+.1%}")
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--requests", type=int, default=2000, help="/check-email requests per size")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (0.2 = 20%%)")
+    parser.add_argument("--data-dir", help="keep generated datasets here and reuse them between runs")
+    parser.add_argument("--worker", nargs=2, metavar=("PATH", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        path, rows = args.worker
+        print(json.dumps(run_size(path, int(rows), args.requests, args.concurrency)))
+        return 0
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="suppression-bench-")
+    os.makedirs(data_dir, exist_ok=True)
+    results = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": [],
+    }
+    print(f"{'rows':>10} {'load':>8} {'RSS +MB':>8} {'peak MB':>8} {'hit':>9} {'miss':>9} {'req/s':>8} {'p99 ms':>8}")
+    try:
+        for rows in args.sizes:
+            path = dataset(data_dir, rows)
+            worker = subprocess.run(
+                [sys.executable, "-m", "benchmarks.suite", "--worker", path, str(rows),
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                capture_output=True, text=True
+            )
+            if worker.returncode != 0:
+                print(worker.stderr, file=sys.stderr)
+                return worker.returncode
+            entry = json.loads(worker.stdout.strip().splitlines()[-1])
+            results["results"].append(entry)
+            load, lookup, asgi = entry["load"], entry["lookup"], entry["asgi"]
+            print(f"{rows:>10} {load['seconds']:>7.2f}s {load['rss_delta_mb'] or 0:>8.1f} {load['peak_rss_mb']:>8.1f} "
+                  f"{lookup['hit_mean_ns']:>7.0f}ns {lookup['miss_mean_ns']:>7.0f}ns "
+                  f"{asgi['requests_per_second']:>8.0f} {asgi['p99_ms']:>8.2f}")
+    finally:
+        if not args.data_dir:
+            for name in os.listdir(data_dir):
+                os.unlink(os.path.join(data_dir, name))
+            os.rmdir(data_dir)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
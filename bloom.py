@@ -0,0 +1,92 @@
+import math
+import random
+from array import array
+from typing import Iterable, List, Tuple
+
+_WORD_BITS = 64
+_MASK_TABLE_BITS = 12
+
+
+def _expected_false_positive_rate(bits_per_key: float, num_hashes: int) -> float:
+    """False-positive rate of a one-word-per-key filter, with Poisson-distributed word loads"""
+    load = _WORD_BITS / bits_per_key
+    probability = math.exp(-load)
+    rate = 0.0
+    keys = 0
+    while keys < load * 4 + 40:
+        fill = 1 - (1 - num_hashes / _WORD_BITS) ** keys
+        rate += probability * fill ** num_hashes
+        keys += 1
+        probability *= load / keys
+    return rate
+
+
+def _choose_parameters(false_positive_rate: float) -> Tuple[float, int]:
+    """Smallest (bits per key, bits set per key) that meets ``false_positive_rate``"""
+    # The model ignores correlations from the finite mask table; aim a little lower
+    target = false_positive_rate * 0.75
+    bits_per_key = 2.0
+    while True:
+        num_hashes = min(range(1, 17), key=lambda k: _expected_false_positive_rate(bits_per_key, k))
+        if _expected_false_positive_rate(bits_per_key, num_hashes) <= target or bits_per_key >= _WORD_BITS:
+            return bits_per_key, num_hashes
+        bits_per_key += 0.25
+
+
+def _mask_table(num_hashes: int) -> List[int]:
+    """Deterministic table of 64-bit masks with exactly ``num_hashes`` bits set"""
+    rng = random.Random(num_hashes)
+    masks = []
+    for _ in range(1 << _MASK_TABLE_BITS):
+        mask = 0
+        for bit in rng.sample(range(_WORD_BITS), num_hashes):
+            mask |= 1 << bit
+        masks.append(mask)
+    return masks
+
+
+class BloomFilter:
+    """
+    Register-blocked Bloom filter over strings.
+
+    Every key maps to a single 64-bit word and a precomputed mask of bits within it, so
+    a lookup is one hash, one word load and one compare. ``key in filter`` is False only
+    for keys that were never added, which lets callers skip the main index on misses.
+    Positions come from the built-in str hash (cached on the string by CPython), so a
+    filter is only valid inside the process, or forked children, that built it. Packing
+    each key into one word floors the achievable rate at roughly 0.1%.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.01):
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("false_positive_rate must be between 0 and 1")
+        capacity = max(1, capacity)
+        bits_per_key, self._num_hashes = _choose_parameters(false_positive_rate)
+        self._num_words = max(1, math.ceil(capacity * bits_per_key / _WORD_BITS))
+        self._words = array("Q", bytes(8 * self._num_words))
+        self._masks = _mask_table(self._num_hashes)
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.count = 0
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[str], capacity: int, false_positive_rate: float = 0.01) -> "BloomFilter":
+        """Build a filter containing ``keys``"""
+        bloom = cls(capacity, false_positive_rate)
+        for key in keys:
+            bloom.add(key)
+        return bloom
+
+    def add(self, key: str) -> None:
+        h = hash(key)
+        self._words[(h & 0xFFFFFFFF) % self._num_words] |= self._masks[(h >> 32) & 0xFFF]
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        h = hash(key)
+        mask = self._masks[(h >> 32) & 0xFFF]
+        return self._words[(h & 0xFFFFFFFF) % self._num_words] & mask == mask
+
+    @property
+    def size_bytes(self) -> int:
+        return self._num_words * 8
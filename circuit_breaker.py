@@ -0,0 +1,109 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    ``closed``: calls go through; ``failure_threshold`` failures in a row open the circuit.
+    ``open``: calls are refused until ``recovery_seconds`` have passed (or a health probe
+    succeeds), then the circuit turns ``half_open``.
+    ``half_open``: a single trial call is let through; its success closes the circuit and
+    its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_seconds: float = 30):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_seconds = recovery_seconds
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_failure: Optional[str] = None
+        self.last_state_change = time.time()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _transition(self, state: str) -> None:
+        if state != self._state:
+            print(f"Ollama circuit breaker: {self._state} -> {state}")
+            self._state = state
+            self.last_state_change = time.time()
+            if state == OPEN:
+                self._opened_at = time.monotonic()
+                self.times_opened += 1
+            self._trial_in_flight = False
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_seconds:
+            self._transition(HALF_OPEN)
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to the backend now; a True in half-open claims the trial slot"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial slot whose call was abandoned before it had an outcome"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._transition(CLOSED)
+
+    def record_failure(self, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_failure = repr(error) if error is not None else None
+            if self._state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+    def record_probe(self, healthy: bool) -> None:
+        """Fold a health-probe result in: success lets an open circuit try again early"""
+        with self._lock:
+            if healthy and self._state == OPEN:
+                self._transition(HALF_OPEN)
+            elif not healthy and self._state != OPEN:
+                self.consecutive_failures += 1
+                if self._state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                    self._transition(OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "recovery_seconds": self.recovery_seconds,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+            "last_failure": self.last_failure,
+            "last_state_change": self.last_state_change,
+        }
@@ -8,12 +8,102 @@ class Config:
         "suppressed_emails.json"
     )
     
+    # Streaming loader: bytes read per chunk, and records between progress reports (0 disables)
+    SUPPRESSION_LOAD_CHUNK_SIZE: int = int(os.getenv("SUPPRESSION_LOAD_CHUNK_SIZE", str(1 << 20)))
+    SUPPRESSION_LOAD_PROGRESS_EVERY: int = int(os.getenv("SUPPRESSION_LOAD_PROGRESS_EVERY", "1000000"))
+    
+    # Malformed export rows skipped (and reported) before a load is rejected outright
+    SUPPRESSION_MAX_INVALID_ROWS: int = int(os.getenv("SUPPRESSION_MAX_INVALID_ROWS", "0"))
+    
+    # In-memory store backing lookups: "dict" (fastest) or "compact" (columnar, smallest)
+    SUPPRESSION_STORE_BACKEND: str = os.getenv("SUPPRESSION_STORE_BACKEND", "dict")
+    
+    # Binary snapshot built with `python snapshot.py build`; when present it is mmapped instead of parsing JSON
+    SUPPRESSION_SNAPSHOT_PATH: str = os.getenv("SUPPRESSION_SNAPSHOT_PATH", "")
+    
+    # Domain and wildcard rules (*@domain, *.domain), one "pattern REASON [LastUpdateTime]" per line ("" disables)
+    SUPPRESSION_DOMAIN_RULES_PATH: str = os.getenv("SUPPRESSION_DOMAIN_RULES_PATH", "")
+    
+    # Optional Bloom filter in front of the store so misses skip the main index
+    SUPPRESSION_BLOOM_FILTER_ENABLED: bool = os.getenv("SUPPRESSION_BLOOM_FILTER_ENABLED", "false").lower() in ("1", "true", "yes")
+    SUPPRESSION_BLOOM_FALSE_POSITIVE_RATE: float = float(os.getenv("SUPPRESSION_BLOOM_FALSE_POSITIVE_RATE", "0.01"))
+    
+    # Secondary indexes (by reason, by last update time) behind GET /suppressions, built on first query; ~16 bytes per entry
+    SUPPRESSION_QUERY_INDEX_ENABLED: bool = os.getenv("SUPPRESSION_QUERY_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Largest page GET /suppressions returns
+    SUPPRESSION_QUERY_MAX_LIMIT: int = int(os.getenv("SUPPRESSION_QUERY_MAX_LIMIT", "1000"))
+    
+    # Seconds between checks of the data source for changes (0 disables automatic reloads)
+    SUPPRESSION_RELOAD_INTERVAL_SECONDS: float = float(os.getenv("SUPPRESSION_RELOAD_INTERVAL_SECONDS", "0"))
+    
     # Ollama configuration
     OLLAMA_MODEL: str = os.getenv("OLLAMA_MODEL", "qwen3:8b")
     OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    # Concurrent Ollama generations per worker; extra requests queue without blocking the event loop
+    OLLAMA_MAX_CONCURRENCY: int = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "4"))
+    # Generations allowed to wait for a slot; beyond this, requests get the template immediately
+    OLLAMA_MAX_QUEUE: int = int(os.getenv("OLLAMA_MAX_QUEUE", "32"))
+    # Hard cap on a single Ollama call
+    OLLAMA_TIMEOUT_SECONDS: float = float(os.getenv("OLLAMA_TIMEOUT_SECONDS", "60"))
+    # How long a request waits for its explanation before falling back to the template (0 waits forever)
+    EXPLANATION_BUDGET_SECONDS: float = float(os.getenv("EXPLANATION_BUDGET_SECONDS", "5"))
+    # Records packed into one prompt by batched generation (warmer); 1 disables batching
+    OLLAMA_BATCH_SIZE: int = int(os.getenv("OLLAMA_BATCH_SIZE", "8"))
+    # How long Ollama keeps the model loaded after a request: a duration ("30m"), seconds, or -1 for
+    # forever; empty uses the server default of five minutes
+    OLLAMA_KEEP_ALIVE: str = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    # Load the model and prefill the system prompt in the background at startup
+    OLLAMA_WARMUP_ON_STARTUP: bool = os.getenv("OLLAMA_WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+    # Circuit breaker: consecutive failures that open it, and seconds before a trial call is allowed
+    OLLAMA_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("OLLAMA_BREAKER_FAILURE_THRESHOLD", "5"))
+    OLLAMA_BREAKER_RECOVERY_SECONDS: float = float(os.getenv("OLLAMA_BREAKER_RECOVERY_SECONDS", "30"))
+    # Seconds between background health probes of Ollama (0 disables probing)
+    OLLAMA_HEALTH_CHECK_INTERVAL_SECONDS: float = float(os.getenv("OLLAMA_HEALTH_CHECK_INTERVAL_SECONDS", "15"))
+    
+    # Generated explanation cache: "exact" keys on email+reason+time, "template" on reason+time, "off" disables
+    EXPLANATION_CACHE_MODE: str = os.getenv("EXPLANATION_CACHE_MODE", "exact")
+    EXPLANATION_CACHE_MAX_ENTRIES: int = int(os.getenv("EXPLANATION_CACHE_MAX_ENTRIES", "10000"))
+    EXPLANATION_CACHE_TTL_SECONDS: float = float(os.getenv("EXPLANATION_CACHE_TTL_SECONDS", "3600"))
+    # SQLite file persisting explanations across restarts, shared by all workers ("" keeps them in memory only)
+    EXPLANATION_STORE_PATH: str = os.getenv("EXPLANATION_STORE_PATH", "")
+    # Seconds a persisted explanation stays valid (0 keeps it until the model or prompt changes)
+    EXPLANATION_STORE_TTL_SECONDS: float = float(os.getenv("EXPLANATION_STORE_TTL_SECONDS", "0"))
+    
+    # Accept explanation_mode "deferred" (serve.py turns it off with several workers: handles live in one process)
+    DEFERRED_EXPLANATIONS_ENABLED: bool = os.getenv("DEFERRED_EXPLANATIONS_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Deferred explanations: seconds a finished result stays fetchable, and handles remembered
+    DEFERRED_EXPLANATION_TTL_SECONDS: float = float(os.getenv("DEFERRED_EXPLANATION_TTL_SECONDS", "600"))
+    DEFERRED_EXPLANATION_MAX_ENTRIES: int = int(os.getenv("DEFERRED_EXPLANATION_MAX_ENTRIES", "10000"))
+    # Hosts that deferred-explanation callbacks may be POSTed to (comma-separated, "*" for any; empty disables)
+    EXPLANATION_CALLBACK_ALLOWED_HOSTS: str = os.getenv("EXPLANATION_CALLBACK_ALLOWED_HOSTS", "")
+    # Timeout of a single callback POST
+    EXPLANATION_CALLBACK_TIMEOUT_SECONDS: float = float(os.getenv("EXPLANATION_CALLBACK_TIMEOUT_SECONDS", "10"))
+    
+    # Background pre-generation of explanations after each dataset load
+    WARMER_ENABLED: bool = os.getenv("WARMER_ENABLED", "false").lower() in ("1", "true", "yes")
+    WARMER_RATE_PER_SECOND: float = float(os.getenv("WARMER_RATE_PER_SECOND", "1"))
+    # "recent" (newest LastUpdateTime first), "hot" (most requested first) or "dataset" (file order)
+    WARMER_PRIORITY: str = os.getenv("WARMER_PRIORITY", "recent")
+    # Entries warmed per dataset version (0 means the explanation cache capacity)
+    WARMER_MAX_ENTRIES: int = int(os.getenv("WARMER_MAX_ENTRIES", "0"))
+    
+    # Maximum number of addresses accepted by /check-emails
+    BATCH_MAX_EMAILS: int = int(os.getenv("BATCH_MAX_EMAILS", "10000"))
+    
+    # Longest row accepted by /filter-emails; longer rows are skipped as invalid
+    FILTER_MAX_LINE_BYTES: int = int(os.getenv("FILTER_MAX_LINE_BYTES", "65536"))
+    
+    # Per-stage timings, request counters and the /metrics endpoint
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Send the /check-email stage timings to clients in a Server-Timing header
+    SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "true").lower() in ("1", "true", "yes")
     
     # API configuration
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     API_PORT: int = int(os.getenv("API_PORT", "8000"))
+    # Worker processes started by serve.py; they share one copy of the suppression index
+    API_WORKERS: int = int(os.getenv("API_WORKERS", "1"))
+    # How serve.py shares the index: "snapshot" (mmapped file) or "preload" (copy-on-write heap)
+    WORKER_SHARED_INDEX: str = os.getenv("WORKER_SHARED_INDEX", "snapshot")
 
 config = Config()
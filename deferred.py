@@ -0,0 +1,159 @@
+import asyncio
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+
+PENDING = "pending"
+READY = "ready"
+
+
+class _Job:
+    __slots__ = ("email", "status", "text", "degraded", "created_at", "completed_at", "callback_url",
+                 "callback_status", "ready")
+
+    def __init__(self, email: str, callback_url: Optional[str]):
+        self.email = email
+        self.status = PENDING
+        self.text: Optional[str] = None
+        self.degraded: Optional[bool] = None
+        self.created_at = time.time()
+        self.completed_at: Optional[float] = None
+        self.callback_url = callback_url
+        self.callback_status: Optional[str] = None
+        self.ready = asyncio.Event()
+
+
+class DeferredExplanations:
+    """
+    Explanations generated after the lookup has been answered, fetched later by handle.
+
+    ``submit`` starts the generation in the background and returns an opaque handle right
+    away. The result is kept for ``ttl_seconds`` after it is ready and can be polled (or
+    long-polled) with ``wait``; when a callback URL is given it is also POSTed there once.
+    At most ``max_entries`` handles are remembered; the oldest are forgotten first.
+    Generation goes through OllamaService, so it shares its cache, coalescing, queue
+    limits and circuit breaker; it just has no caller waiting on a latency budget.
+    """
+
+    def __init__(self, ollama_service, ttl_seconds: float = 600.0, max_entries: int = 10000,
+                 callback_timeout: float = 10.0, callback_allowed_hosts: str = ""):
+        self.ollama_service = ollama_service
+        self.callback_allowed_hosts = {host.strip().lower() for host in callback_allowed_hosts.split(",") if host.strip()}
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.callback_timeout = callback_timeout
+        self._jobs: "OrderedDict[str, _Job]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self.submitted = 0
+        self.completed = 0
+        self.callbacks_sent = 0
+        self.callbacks_failed = 0
+
+    def accepts_callback(self, url: str) -> bool:
+        """Whether callbacks to this URL's host are allowed (the service would otherwise POST anywhere)"""
+        host = (urlsplit(url).hostname or "").lower()
+        return "*" in self.callback_allowed_hosts or host in self.callback_allowed_hosts
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        while self._jobs:
+            handle, job = next(iter(self._jobs.items()))
+            if len(self._jobs) <= self.max_entries and not (job.completed_at is not None and job.completed_at < cutoff):
+                break
+            del self._jobs[handle]
+
+    def submit(self, email: str, reason: str, last_update_time: str, formatted_time: str,
+               reason_explanation: str, callback_url: Optional[str] = None) -> str:
+        """Start generating an explanation in the background and return its handle"""
+        handle = secrets.token_urlsafe(16)
+        job = _Job(email, callback_url)
+        self._jobs[handle] = job
+        self.submitted += 1
+        self._expire()
+        task = asyncio.create_task(self._run(job, handle, reason, last_update_time, formatted_time, reason_explanation))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return handle
+
+    async def _run(self, job: _Job, handle: str, reason: str, last_update_time: str, formatted_time: str,
+                   reason_explanation: str) -> None:
+        # budget_seconds=0: nobody is waiting, so only OLLAMA_TIMEOUT_SECONDS bounds the call
+        result = await self.ollama_service.agenerate_explanation(
+            email=job.email,
+            reason=reason,
+            last_update_time=last_update_time,
+            formatted_time=formatted_time,
+            reason_explanation=reason_explanation,
+            budget_seconds=0
+        )
+        job.text = result.text
+        job.degraded = result.degraded
+        job.status = READY
+        job.completed_at = time.time()
+        job.ready.set()
+        self.completed += 1
+        if job.callback_url:
+            await self._post_callback(job, handle)
+
+    async def _post_callback(self, job: _Job, handle: str) -> None:
+        try:
+            async with httpx.AsyncClient(timeout=self.callback_timeout) as client:
+                response = await client.post(job.callback_url, json=self._payload(handle, job))
+                response.raise_for_status()
+            job.callback_status = "delivered"
+            self.callbacks_sent += 1
+        except Exception as e:
+            print(f"Explanation callback to {job.callback_url} failed: {e}")
+            job.callback_status = "failed"
+            self.callbacks_failed += 1
+
+    @staticmethod
+    def _payload(handle: str, job: _Job) -> Dict[str, Any]:
+        return {
+            "explanation_id": handle,
+            "email": job.email,
+            "status": job.status,
+            "human_readable_explanation": job.text,
+            "explanation_degraded": job.degraded,
+        }
+
+    async def wait(self, handle: str, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+        """
+        The handle's current state, waiting up to ``timeout`` seconds for it to be ready.
+
+        Returns None for unknown or expired handles.
+        """
+        self._expire()
+        job = self._jobs.get(handle)
+        if job is None:
+            return None
+        if timeout > 0 and job.status == PENDING:
+            try:
+                await asyncio.wait_for(job.ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        payload = self._payload(handle, job)
+        if job.callback_url:
+            payload["callback_status"] = job.callback_status
+        return payload
+
+    async def close(self) -> None:
+        """Cancel generations still running, e.g. at shutdown"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "handles": len(self._jobs),
+            "pending": sum(1 for job in self._jobs.values() if job.status == PENDING),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "callbacks_sent": self.callbacks_sent,
+            "callbacks_failed": self.callbacks_failed,
+        }
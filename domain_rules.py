@@ -0,0 +1,141 @@
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from stores import SuppressionRecord, format_epoch, parse_epoch
+
+
+class DomainRuleError(ValueError):
+    """Raised for a rules file line that is not a valid rule"""
+
+
+def parse_pattern(pattern: str) -> Tuple[List[str], bool]:
+    """
+    Split a rule pattern into its domain labels, most significant first, and whether it
+    covers subdomains.
+
+    ``*@example.com`` matches addresses at example.com itself; ``*.example.com`` (or
+    ``*@*.example.com``) matches addresses at any subdomain of example.com.
+    """
+    rule = pattern.strip().lower()
+    if rule.startswith("*@"):
+        rule = rule[2:]
+        exact = not rule.startswith("*.")
+    elif rule.startswith("*."):
+        exact = False
+    else:
+        raise DomainRuleError(f"{pattern!r}: expected *@domain or *.domain")
+    if not exact:
+        rule = rule[2:]
+    labels = rule.rstrip(".").split(".")
+    if not all(labels) or any(char in rule for char in "@* \t"):
+        raise DomainRuleError(f"{pattern!r}: invalid domain")
+    return labels[::-1], not exact
+
+
+class DomainRuleRecord(SuppressionRecord):
+    """The record returned for addresses covered by a rule; ``email_address`` holds the pattern"""
+
+    @property
+    def matched_rule(self) -> Optional[str]:
+        return self.email_address
+
+
+class _Node:
+    __slots__ = ("children", "domain", "subdomains")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # Rule for addresses at exactly this domain, and for addresses below it
+        self.domain: Optional[DomainRuleRecord] = None
+        self.subdomains: Optional[DomainRuleRecord] = None
+
+
+class DomainRuleTrie:
+    """
+    Domain and wildcard suppression rules in a trie keyed by reversed domain labels.
+
+    A lookup walks the labels of the address's domain from the top-level domain down,
+    so it costs one dict probe per label however many rules are loaded. The most
+    specific rule wins: an exact domain rule over a subdomain wildcard, and a deeper
+    wildcard over a shallower one.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, pattern: str, reason: str, last_update_time: str) -> bool:
+        """Add a rule; returns False if an equivalent rule already exists"""
+        labels, subdomains = parse_pattern(pattern)
+        node = self._root
+        for label in labels:
+            child = node.children.get(label)
+            if child is None:
+                child = node.children[label] = _Node()
+            node = child
+        slot = "subdomains" if subdomains else "domain"
+        if getattr(node, slot) is not None:
+            return False
+        setattr(node, slot, DomainRuleRecord.parse(pattern.strip(), reason, last_update_time))
+        self._count += 1
+        return True
+
+    def match(self, key: str) -> Optional[DomainRuleRecord]:
+        """The most specific rule covering the normalized address ``key``, or None"""
+        at = key.rfind("@")
+        if at < 0:
+            return None
+        labels = key[at + 1:].rstrip(".").split(".")
+        node = self._root
+        best = None
+        depth = len(labels)
+        for label in reversed(labels):
+            node = node.children.get(label)
+            if node is None:
+                return best
+            depth -= 1
+            if depth == 0:
+                return node.domain if node.domain is not None else best
+            if node.subdomains is not None:
+                best = node.subdomains
+        return best
+
+    def __iter__(self) -> Iterator[DomainRuleRecord]:
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            for rule in (node.domain, node.subdomains):
+                if rule is not None:
+                    yield rule
+            stack.extend(node.children.values())
+
+
+def load_domain_rules(path: str) -> DomainRuleTrie:
+    """
+    Read a rules file: one ``pattern REASON [LastUpdateTime]`` per line, ``#`` starts a
+    comment. Rules without a time take the file's modification time.
+    """
+    default_time = format_epoch(int(os.path.getmtime(path)))
+    rules = DomainRuleTrie()
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split("#", 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) not in (2, 3):
+                raise DomainRuleError(f"{path}:{number}: expected 'pattern REASON [LastUpdateTime]'")
+            pattern, reason = fields[0], fields[1].upper()
+            last_update_time = fields[2] if len(fields) == 3 else default_time
+            try:
+                parse_epoch(last_update_time)
+                if not rules.add(pattern, reason, last_update_time):
+                    print(f"{path}:{number}: duplicate rule {pattern} ignored")
+            except DomainRuleError as e:
+                raise DomainRuleError(f"{path}:{number}: {e}")
+            except (ValueError, OverflowError):
+                raise DomainRuleError(f"{path}:{number}: invalid LastUpdateTime {last_update_time!r}, "
+                                      "expected e.g. 2024-01-15T10:30:00Z")
+    return rules
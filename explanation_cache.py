@@ -0,0 +1,184 @@
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from explanation_store import ExplanationStore
+
+CACHE_MODES = ("off", "exact", "template")
+
+# Stands in for the address inside explanations cached in template mode
+EMAIL_PLACEHOLDER = "\x00email\x00"
+
+
+class ExplanationCache:
+    """
+    LRU cache of generated explanations with a time-to-live.
+
+    In ``exact`` mode entries are keyed on every prompt input (email, reason, formatted time).
+    In ``template`` mode they are keyed on ``(reason, formatted_time)`` only: the address is
+    swapped for a placeholder when storing and substituted back on each hit, so one
+    generation serves every address suppressed for the same reason at the same time.
+
+    An optional persistent ``store`` (see explanation_store) backs the LRU: writes go to
+    both, and memory misses are looked up in the store and promoted on a hit. Coroutines
+    use ``aget``/``aput``/``acontains``, which run the store's blocking SQLite calls on a
+    worker thread instead of the event loop.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600, mode: str = "exact",
+                 store: Optional[ExplanationStore] = None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"mode must be one of {CACHE_MODES}")
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.mode = mode
+        self.store = store
+        self._entries: "OrderedDict[Tuple[str, ...], Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off" and (self.max_entries > 0 or self.store is not None)
+
+    def _key(self, email: str, reason: str, formatted_time: str) -> Tuple[str, ...]:
+        if self.mode == "template":
+            return (reason, formatted_time)
+        return (email, reason, formatted_time)
+
+    def get(self, email: str, reason: str, formatted_time: str) -> Optional[str]:
+        """Cached explanation for these inputs, or None (counted as a miss)"""
+        if not self.enabled:
+            return None
+        key = self._key(email, reason, formatted_time)
+        text = self._lookup(key)
+        if text is None:
+            text = self._promote(key, self.store.get((self.mode, *key)) if self.store is not None else None)
+        return self._render(email, text)
+
+    async def aget(self, email: str, reason: str, formatted_time: str) -> Optional[str]:
+        """``get`` for coroutines: a memory miss is looked up in the store on a worker thread"""
+        if not self.enabled:
+            return None
+        key = self._key(email, reason, formatted_time)
+        text = self._lookup(key)
+        if text is None:
+            stored = await asyncio.to_thread(self.store.get, (self.mode, *key)) if self.store is not None else None
+            text = self._promote(key, stored)
+        return self._render(email, text)
+
+    def _lookup(self, key: Tuple[str, ...]) -> Optional[str]:
+        """Live memory entry for ``key``, counted as a hit"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds > 0 and now - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry[1]
+
+    def _promote(self, key: Tuple[str, ...], text: Optional[str]) -> Optional[str]:
+        """Count a store lookup's outcome and keep a hit in memory"""
+        if text is None:
+            self.misses += 1
+            return None
+        self.store_hits += 1
+        self._remember(key, text)
+        return text
+
+    def _render(self, email: str, text: Optional[str]) -> Optional[str]:
+        if text is None or self.mode != "template":
+            return text
+        return text.replace(EMAIL_PLACEHOLDER, email)
+
+    def contains(self, email: str, reason: str, formatted_time: str) -> bool:
+        """Whether a live entry exists, without touching LRU order or the counters"""
+        if not self.enabled:
+            return False
+        key = self._key(email, reason, formatted_time)
+        if self._contains_live(key):
+            return True
+        return self.store is not None and self.store.contains((self.mode, *key))
+
+    async def acontains(self, email: str, reason: str, formatted_time: str) -> bool:
+        """``contains`` for coroutines: the store is checked on a worker thread"""
+        if not self.enabled:
+            return False
+        key = self._key(email, reason, formatted_time)
+        if self._contains_live(key):
+            return True
+        return self.store is not None and await asyncio.to_thread(self.store.contains, (self.mode, *key))
+
+    def _contains_live(self, key: Tuple[str, ...]) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and (self.ttl_seconds <= 0 or time.monotonic() - entry[0] <= self.ttl_seconds)
+
+    def put(self, email: str, reason: str, formatted_time: str, text: str) -> None:
+        entry = self._prepare(email, reason, formatted_time, text)
+        if entry is not None and self.store is not None:
+            self.store.put(*entry)
+
+    async def aput(self, email: str, reason: str, formatted_time: str, text: str) -> None:
+        """``put`` for coroutines: the store write runs on a worker thread"""
+        entry = self._prepare(email, reason, formatted_time, text)
+        if entry is not None and self.store is not None:
+            await asyncio.to_thread(self.store.put, *entry)
+
+    def _prepare(self, email: str, reason: str, formatted_time: str,
+                 text: str) -> Optional[Tuple[Tuple[str, ...], str]]:
+        """Remember ``text`` in memory; returns the (store key, text) to persist, or None"""
+        if not self.enabled:
+            return None
+        if self.mode == "template":
+            text = re.sub(re.escape(email), EMAIL_PLACEHOLDER, text, flags=re.IGNORECASE)
+            if "@" in text:
+                # The reply mentions the address in some altered form; sharing it would leak it
+                return None
+        key = self._key(email, reason, formatted_time)
+        self._remember(key, text)
+        return (self.mode, *key), text
+
+    def _remember(self, key: Tuple[str, ...], text: str) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.store_hits + self.misses
+        return {
+            "mode": self.mode,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.store_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "store": self.store.stats() if self.store is not None else None,
+        }
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Sequence
+
+
+class ExplanationStore:
+    """
+    SQLite-backed explanations that survive restarts and are shared by every worker.
+
+    Rows are keyed on a digest of the prompt inputs together with the model name and
+    prompt version, so changing either simply stops old rows from matching. They are only
+    deleted by an explicit ``purge_stale``: during a rolling deploy, workers of both
+    versions share the file and must not delete each other's rows. The database runs in WAL mode with a busy timeout, which
+    lets several processes read concurrently while one writes. Entries live until
+    ``ttl_seconds`` (0 keeps them forever: an explanation of fixed inputs does not go stale).
+    """
+
+    def __init__(self, path: str, model: str, prompt_version: str, ttl_seconds: float = 0):
+        self.path = path
+        self.model = model
+        self.prompt_version = prompt_version
+        self.ttl_seconds = ttl_seconds
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS explanations ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " prompt_version TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        # For the entry count in stats(); without it every count scans the whole table
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS explanations_model_prompt ON explanations (model, prompt_version)"
+        )
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _digest(self, key: Sequence[str]) -> str:
+        payload = json.dumps([self.model, self.prompt_version, *key], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _fresh_after(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+
+    def get(self, key: Sequence[str]) -> Optional[str]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT text FROM explanations WHERE key = ? AND created_at >= ?",
+                    (self._digest(key), self._fresh_after())
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Explanation store read failed: {e}")
+            self.errors += 1
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def contains(self, key: Sequence[str]) -> bool:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT 1 FROM explanations WHERE key = ? AND created_at >= ?",
+                    (self._digest(key), self._fresh_after())
+                ).fetchone()
+        except sqlite3.Error:
+            return False
+        return row is not None
+
+    def put(self, key: Sequence[str], text: str) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO explanations (key, model, prompt_version, text, created_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (self._digest(key), self.model, self.prompt_version, text, time.time())
+                )
+            self.writes += 1
+        except sqlite3.Error as e:
+            # A locked or full database only costs a regeneration later
+            print(f"Explanation store write failed: {e}")
+            self.errors += 1
+
+    def purge_stale(self) -> int:
+        """Delete rows written for another model or prompt version, or past the TTL"""
+        try:
+            with self._lock:
+                cursor = self._conn.execute(
+                    "DELETE FROM explanations WHERE model != ? OR prompt_version != ? OR created_at < ?",
+                    (self.model, self.prompt_version, self._fresh_after())
+                )
+        except sqlite3.Error as e:
+            print(f"Explanation store purge failed: {e}")
+            self.errors += 1
+            return 0
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM explanations WHERE model = ? AND prompt_version = ?",
+                (self.model, self.prompt_version)
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def reopen(self) -> None:
+        """Open a fresh connection after ``close``; forked workers must not share the parent's"""
+        with self._lock:
+            self._conn = self._connect()
+
+    def stats(self) -> Dict[str, object]:
+        """Counters plus the entry count, which queries the database: call it off the event loop"""
+        return {
+            "path": self.path,
+            "model": self.model,
+            "prompt_version": self.prompt_version,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+        }
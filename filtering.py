@@ -0,0 +1,141 @@
+import csv
+import json
+import time
+from typing import AsyncIterator, List, Optional
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from models import EMAIL_SYNTAX
+
+FILTER_MODES = ("suppressed", "clean")
+FILTER_FORMATS = ("ndjson", "csv")
+
+
+async def iter_line_batches(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[List[Optional[bytes]]]:
+    """
+    Regroup an async stream of byte chunks into batches of complete lines.
+
+    Only the unterminated tail of the previous chunk is carried over, so memory stays
+    bounded by the chunk size plus ``max_line_bytes``. Lines longer than that are
+    skipped and reported as ``None`` so callers can count them.
+    """
+    carry = b""
+    discarding = False
+    async for chunk in chunks:
+        pending: List[Optional[bytes]] = []
+        if discarding:
+            newline = chunk.find(b"\n")
+            if newline < 0:
+                continue
+            chunk = chunk[newline + 1:]
+            discarding = False
+            pending.append(None)
+        lines = (carry + chunk).split(b"\n")
+        carry = lines.pop()
+        if len(carry) > max_line_bytes:
+            carry = b""
+            discarding = True
+        pending.extend(line if len(line) <= max_line_bytes else None for line in lines)
+        if pending:
+            yield pending
+    if discarding:
+        yield [None]
+    elif carry:
+        yield [carry]
+
+
+class RequestBodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body is produced while the request body is still being read.
+
+    The stock response polls ``receive`` for disconnects, which would steal the upload's
+    body messages; here only the request stream consumes them, and a client disconnect
+    surfaces from that stream instead.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+class MailingListFilter:
+    """Keeps the suppressed (or the clean) rows of an NDJSON or CSV recipient list"""
+
+    def __init__(self, suppression_service, mode: str, fmt: str, email_field: str = "email"):
+        if mode not in FILTER_MODES:
+            raise ValueError(f"mode must be one of {FILTER_MODES}")
+        if fmt not in FILTER_FORMATS:
+            raise ValueError(f"format must be one of {FILTER_FORMATS}")
+        self.suppression_service = suppression_service
+        self.keep_suppressed = mode == "suppressed"
+        self.format = fmt
+        self.email_field = email_field
+        self._email_column: Optional[int] = None
+        self.rows = 0
+        self.kept = 0
+        self.invalid = 0
+        self.started = time.perf_counter()
+
+    @staticmethod
+    def _csv_row(line: bytes) -> List[str]:
+        return next(csv.reader([line.decode("utf-8", "replace").rstrip("\r")]), [])
+
+    def _extract_email(self, line: bytes) -> Optional[str]:
+        if self.format == "ndjson":
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return None
+            value = record.get(self.email_field) if isinstance(record, dict) else None
+        else:
+            row = self._csv_row(line)
+            value = row[self._email_column] if self._email_column < len(row) else None
+        return value.strip().lower() if isinstance(value, str) else None
+
+    @property
+    def needs_header(self) -> bool:
+        """True for CSV input whose header row has not been read yet"""
+        return self.format == "csv" and self._email_column is None
+
+    def filter_lines(self, lines: List[Optional[bytes]]) -> List[bytes]:
+        """
+        Return the kept lines, newline-terminated, in input order.
+
+        Raises ValueError if the CSV header row has no ``email_field`` column.
+        """
+        output: List[bytes] = []
+        candidates = []
+        emails = []
+        for line in lines:
+            if line is not None and not line.strip():
+                continue
+            if self.format == "csv" and self._email_column is None and line is not None:
+                # The header row locates the address column and is always passed through
+                header = [column.strip().lower() for column in self._csv_row(line)]
+                field = self.email_field.lower()
+                if field not in header:
+                    raise ValueError(f"CSV header has no {self.email_field!r} column")
+                self._email_column = header.index(field)
+                output.append(line + b"\n")
+                continue
+            self.rows += 1
+            email = self._extract_email(line) if line is not None else None
+            if email is None or not EMAIL_SYNTAX.match(email):
+                self.invalid += 1
+                continue
+            candidates.append(line)
+            emails.append(email)
+
+        for line, info in zip(candidates, self.suppression_service.check_emails_suppression(emails)):
+            if (info is not None) == self.keep_suppressed:
+                output.append(line + b"\n")
+                self.kept += 1
+        return output
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows / elapsed if elapsed > 0 else 0.0
+        return (f"Filtered {self.rows:,} rows ({self.kept:,} kept, {self.invalid:,} invalid) "
+                f"in {elapsed:.2f}s ({rate:,.0f} rows/s)")
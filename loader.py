@@ -0,0 +1,238 @@
+import codecs
+import json
+import os
+from json.decoder import WHITESPACE
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from stores import parse_epoch
+
+SUMMARIES_KEY = "SuppressedDestinationSummaries"
+
+# A decode error this close to the end of the buffer may just be a value cut off by the
+# chunk boundary (a partial literal, number or escape), so more input is read first
+TRUNCATION_SLACK = 16
+
+# Called with (records_loaded, bytes_read, total_bytes)
+ProgressCallback = Callable[[int, int, int], None]
+
+
+def print_progress(records: int, bytes_read: int, total_bytes: int) -> None:
+    """Default progress reporter for the streaming loader"""
+    percent = (bytes_read / total_bytes * 100) if total_bytes else 100.0
+    print(f"Loaded {records:,} suppressed emails ({bytes_read / 1e6:,.1f} / {total_bytes / 1e6:,.1f} MB, {percent:.0f}%)")
+
+
+class IngestReport:
+    """What one load made of an export: row counts plus the first rejected rows"""
+
+    def __init__(self, source: str, max_samples: int = 20):
+        self.source = source
+        self.max_samples = max_samples
+        self.rows = 0
+        self.loaded = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def reject(self, index: int, item: Dict[str, Any], error: str) -> None:
+        self.invalid += 1
+        if len(self.errors) < self.max_samples:
+            self.errors.append({"index": index, "email": item.get("EmailAddress"), "error": error})
+
+    def summary(self) -> str:
+        first = "; ".join(f"row {error['index']}: {error['error']}" for error in self.errors[:3])
+        return f"{self.invalid:,} malformed row(s) in {self.source} ({first})"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "rows": self.rows,
+            "loaded": self.loaded,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "errors": self.errors,
+        }
+
+
+class IngestError(ValueError):
+    """Raised when an export is not valid JSON, or has more malformed rows than a load tolerates"""
+
+    def __init__(self, report: IngestReport, message: Optional[str] = None):
+        super().__init__(message or report.summary())
+        self.report = report
+
+
+class MalformedExportError(ValueError):
+    """Raised by the streaming reader for an export that is not valid JSON, such as a truncated file"""
+
+
+class _StreamingJSONReader:
+    """Incremental reader over a JSON document that keeps at most one chunk plus one value in memory"""
+
+    def __init__(self, file, chunk_size: int):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        # Characters dropped from the front of the buffer, for error positions
+        self._consumed = 0
+        self.bytes_read = 0
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer, dropping consumed text; False at EOF"""
+        if self._eof:
+            return False
+        raw = self._file.read(self._chunk_size)
+        self.bytes_read += len(raw)
+        if not raw:
+            self._eof = True
+        self._consumed += self._pos
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(raw, final=self._eof)
+        self._pos = 0
+        return not self._eof or bool(self._buffer)
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or not self._fill():
+                return
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at EOF)"""
+        self._skip_whitespace()
+        return self._buffer[self._pos] if self._pos < len(self._buffer) else ""
+
+    def expect(self, chars: str) -> str:
+        """Consume one of ``chars`` or raise MalformedExportError"""
+        char = self.peek()
+        if not char or char not in chars:
+            found = repr(char) if char else "end of file"
+            raise MalformedExportError(f"Malformed suppression export: expected one of {chars!r}, found {found}")
+        self._pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value, reading more input as needed"""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+                # A value touching the end of the buffer may be truncated, and a number cut
+                # inside its fraction or exponent decodes as a shorter number ("1." as 1)
+                cut = end == len(self._buffer) or (
+                    end >= len(self._buffer) - TRUNCATION_SLACK and self._buffer[end] in ".eE"
+                )
+                if not cut or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                # Only an error at the end of the buffer can be cured by reading on (a string
+                # still open there reports its opening quote). Anything else is a syntax
+                # error, raised now rather than pulling the rest of the file into the buffer.
+                truncated = e.pos >= len(self._buffer) - TRUNCATION_SLACK or e.msg.startswith("Unterminated string")
+                if self._eof or not truncated:
+                    # Some messages end in "at" already ("Unterminated string starting at")
+                    message = e.msg[:-3] if e.msg.endswith(" at") else e.msg
+                    raise MalformedExportError(
+                        f"Malformed suppression export: {message} at character {self._consumed + e.pos:,}"
+                    ) from None
+            if not self._fill():
+                raise MalformedExportError("Malformed suppression export: unexpected end of file")
+
+
+def iter_suppressed_destinations(
+    path: str,
+    chunk_size: int = 1 << 20,
+    progress: Optional[ProgressCallback] = None,
+    progress_every: int = 0,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the items of ``SuppressedDestinationSummaries`` from an SES export one at a time.
+
+    Other top-level keys are decoded and discarded, so peak memory is bounded by
+    ``chunk_size`` plus the largest single value rather than the size of the file.
+    """
+    total_bytes = os.path.getsize(path)
+    records = 0
+    with open(path, "rb") as file:
+        reader = _StreamingJSONReader(file, chunk_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            if key == SUMMARIES_KEY:
+                reader.expect("[")
+                if reader.peek() != "]":
+                    while True:
+                        try:
+                            item = reader.value()
+                        except MalformedExportError as e:
+                            raise MalformedExportError(f"{e} (row {records})") from None
+                        if not isinstance(item, dict):
+                            raise MalformedExportError(f"Malformed suppression export: expected an object, found {item!r}")
+                        yield item
+                        records += 1
+                        if progress and progress_every and records % progress_every == 0:
+                            progress(records, reader.bytes_read, total_bytes)
+                        if reader.expect(",]") == "]":
+                            break
+                else:
+                    reader.expect("]")
+            else:
+                reader.value()
+            if reader.expect(",}") == "}":
+                break
+    if progress and progress_every:
+        progress(records, total_bytes, total_bytes)
+
+
+
+def validate_destination(item: Dict[str, Any]) -> Tuple[str, str, str, int]:
+    """Check one export row; returns (email, reason, last update time, epoch) or raises ValueError"""
+    email_address = item.get("EmailAddress")
+    if not isinstance(email_address, str) or not email_address.strip():
+        raise ValueError("EmailAddress is missing or not a string")
+    reason = item.get("Reason")
+    if not isinstance(reason, str) or not reason:
+        raise ValueError("Reason is missing or not a string")
+    last_update_time = item.get("LastUpdateTime")
+    if not isinstance(last_update_time, str):
+        raise ValueError("LastUpdateTime is missing or not a string")
+    try:
+        epoch = parse_epoch(last_update_time)
+    except (ValueError, OverflowError):
+        raise ValueError(f"LastUpdateTime {last_update_time!r} is not an ISO-8601 timestamp")
+    return email_address, reason, last_update_time, epoch
+
+
+def iter_valid_destinations(
+    path: str,
+    report: IngestReport,
+    max_invalid: int = 0,
+    **kwargs: Any,
+) -> Iterator[Tuple[str, str, str, int]]:
+    """
+    Stream validated rows as (email, reason, last update time, epoch), counting them in ``report``.
+
+    Malformed rows are skipped and recorded. Once more than ``max_invalid`` have been
+    seen the load stops with IngestError, before the rest of the file is read. An
+    export that is not valid JSON (truncated, say) stops it with IngestError too.
+    """
+    try:
+        for index, item in enumerate(iter_suppressed_destinations(path, **kwargs)):
+            report.rows += 1
+            try:
+                row = validate_destination(item)
+            except ValueError as e:
+                report.reject(index, item, str(e))
+                if report.invalid > max_invalid:
+                    raise IngestError(report)
+                continue
+            yield row
+    except MalformedExportError as e:
+        raise IngestError(report, str(e)) from None
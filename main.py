@@ -1,14 +1,51 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import calendar
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 import uvicorn
-from models import EmailCheckRequest, EmailCheckResponse
+from datetime import datetime
+from typing import Literal, Optional
+from filtering import FILTER_FORMATS, MailingListFilter, RequestBodyStreamingResponse, iter_line_batches
+from models import (
+    EMAIL_SYNTAX, BatchEmailCheckRequest, BatchEmailCheckResponse, BatchEmailCheckResult,
+    EmailCheckRequest, EmailCheckResponse, SuppressionCountsResponse, SuppressionQueryResponse
+)
 from services import SuppressionService, OllamaService
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from deferred import DeferredExplanations
+from query_index import InvalidCursor, StaleCursor
+from metrics import MetricsRegistry, RequestMetricsMiddleware, StageTimer
+from streaming import sse_event
+from warmer import ExplanationWarmer
 from config import config
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    suppression_service.start_watching(config.SUPPRESSION_RELOAD_INTERVAL_SECONDS)
+    probe_task = warm_up_task = None
+    if config.OLLAMA_WARMUP_ON_STARTUP:
+        warm_up_task = asyncio.create_task(ollama_service.warm_up())
+    if config.OLLAMA_HEALTH_CHECK_INTERVAL_SECONDS > 0:
+        probe_task = asyncio.create_task(ollama_service.run_health_probe(config.OLLAMA_HEALTH_CHECK_INTERVAL_SECONDS))
+    if config.WARMER_ENABLED:
+        warmer.start()
+    yield
+    warmer.stop()
+    for task in (probe_task, warm_up_task):
+        if task is not None:
+            task.cancel()
+    await deferred_explanations.close()
+    suppression_service.stop_watching()
+
 app = FastAPI(
     title="Suppressed Email Checker API",
     description="API to check if an email address is suppressed and get human-readable explanations",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -20,9 +57,75 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-process metrics, exposed at /metrics
+metrics = MetricsRegistry()
+http_requests = metrics.counter("http_requests_total", "HTTP requests by handler, method and status",
+                                ("handler", "method", "status"))
+http_request_duration = metrics.histogram("http_request_duration_seconds", "HTTP request duration by handler",
+                                          ("handler",))
+check_email_stage_duration = metrics.histogram(
+    "check_email_stage_seconds", "Time spent in each /check-email stage (lookup, format, llm, defer, serialize)",
+    ("stage",)
+)
+suppression_lookups = metrics.counter("suppression_lookups_total", "Suppression lookups by endpoint and result",
+                                      ("endpoint", "result"))
+explanations_served = metrics.counter("explanations_served_total", "Explanations by mode and whether the template was served",
+                                      ("mode", "degraded"))
+if config.METRICS_ENABLED:
+    app.add_middleware(RequestMetricsMiddleware, requests=http_requests, duration=http_request_duration)
+
 # Initialize services
 suppression_service = SuppressionService()
 ollama_service = OllamaService()
+deferred_explanations = DeferredExplanations(
+    ollama_service,
+    ttl_seconds=config.DEFERRED_EXPLANATION_TTL_SECONDS,
+    max_entries=config.DEFERRED_EXPLANATION_MAX_ENTRIES,
+    callback_timeout=config.EXPLANATION_CALLBACK_TIMEOUT_SECONDS,
+    callback_allowed_hosts=config.EXPLANATION_CALLBACK_ALLOWED_HOSTS
+)
+warmer = ExplanationWarmer(
+    suppression_service,
+    ollama_service,
+    rate_per_second=config.WARMER_RATE_PER_SECOND,
+    priority=config.WARMER_PRIORITY,
+    max_entries=config.WARMER_MAX_ENTRIES
+)
+
+def _register_collectors():
+    """Expose counters the services already keep; read at scrape time, so the hot path pays nothing"""
+    def cache():
+        return ollama_service.explanation_cache
+    
+    gauge, counter = "gauge", "counter"
+    for name, kind, help, collect in (
+        ("explanation_fallbacks_total", counter, "Template explanations served instead of a model reply, by cause",
+         lambda: [("", {"cause": cause}, count) for cause, count in ollama_service.degraded.items()]),
+        ("explanation_cache_hits_total", counter, "Explanation cache hits by tier",
+         lambda: [("", {"tier": "memory"}, cache().hits), ("", {"tier": "store"}, cache().store_hits)]),
+        ("explanation_cache_misses_total", counter, "Explanation cache misses",
+         lambda: [("", {}, cache().misses)]),
+        ("explanation_cache_entries", gauge, "Explanations held in the in-memory cache",
+         lambda: [("", {}, len(cache()))]),
+        ("ollama_generations_total", counter, "Explanation generations started (coalesced requests excluded)",
+         lambda: [("", {}, ollama_service._inflight.leaders + ollama_service._inflight_async.leaders)]),
+        ("ollama_coalesced_total", counter, "Requests that joined an in-flight generation",
+         lambda: [("", {}, ollama_service._inflight.shared + ollama_service._inflight_async.shared)]),
+        ("ollama_in_flight", gauge, "Ollama generations holding a concurrency slot",
+         lambda: [("", {}, ollama_service.in_flight)]),
+        ("ollama_pending_generations", gauge, "Ollama generations running or waiting for a slot",
+         lambda: [("", {}, ollama_service.pending_generations)]),
+        ("ollama_circuit_state", gauge, "1 for the current circuit breaker state",
+         lambda: [("", {"state": state}, 1 if ollama_service.breaker.state == state else 0)
+                  for state in (CLOSED, OPEN, HALF_OPEN)]),
+        ("suppression_dataset_entries", gauge, "Entries in the dataset serving lookups",
+         lambda: [("", {}, len(suppression_service.suppressed_emails_index))]),
+        ("suppression_dataset_version", gauge, "Version of the dataset serving lookups",
+         lambda: [("", {}, suppression_service.dataset_version)]),
+    ):
+        metrics.collector(name, kind, help, collect)
+
+_register_collectors()
 
 @app.get("/")
 async def root():
@@ -30,7 +133,145 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "suppressed-email-checker"}
+    """
+    Liveness plus the Ollama circuit breaker state.
+    
+    Lookups keep working while Ollama is unavailable (explanations fall back to the
+    template), so an open circuit reports "degraded" rather than failing the check.
+    """
+    ollama_health = ollama_service.health()
+    status = "healthy" if ollama_health["circuit"]["state"] == CLOSED else "degraded"
+    return {"status": status, "service": "suppressed-email-checker", "ollama": ollama_health}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Counters, histograms and gauges of this worker in the Prometheus text format"""
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/dataset")
+async def dataset_info():
+    """Version, size and load statistics of the suppression dataset serving lookups in this worker"""
+    info = suppression_service.dataset_info()
+    info["worker_pid"] = os.getpid()
+    return info
+
+@app.get("/admin/explanation-cache")
+async def explanation_cache_stats():
+    """Size and hit/miss counters of the explanation cache, plus coalesced generations"""
+    # Counting the persistent store's entries is a database query
+    stats = await run_in_threadpool(ollama_service.explanation_stats)
+    stats["deferred"] = deferred_explanations.stats()
+    return stats
+
+@app.post("/admin/explanation-store/purge")
+async def purge_explanation_store():
+    """
+    Delete persisted explanations of other models or prompt versions, and rows past the TTL.
+    
+    Never run automatically: during a rolling deploy old and new workers share the file
+    and would delete each other's rows. Call it once every worker runs the current version.
+    """
+    store = ollama_service.explanation_cache.store
+    if store is None:
+        raise HTTPException(status_code=404, detail="No explanation store is configured")
+    purged = await run_in_threadpool(store.purge_stale)
+    return {"purged": purged, "model": store.model, "prompt_version": store.prompt_version}
+
+@app.get("/admin/warmer")
+async def warmer_status():
+    """Progress of background explanation pre-generation"""
+    return warmer.status()
+
+@app.post("/admin/warmer/{action}")
+async def control_warmer(action: str, rate: Optional[float] = None, priority: Optional[str] = None):
+    """
+    Control the explanation warmer: action is start, pause, resume or stop.
+    
+    rate (generations per second) and priority (recent, hot, dataset) can be changed with
+    any action and take effect immediately; a priority change re-plans the current pass.
+    """
+    if action not in ("start", "pause", "resume", "stop"):
+        raise HTTPException(status_code=404, detail=f"Unknown warmer action: {action}")
+    try:
+        warmer.set_controls(rate, priority)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    getattr(warmer, action)()
+    return warmer.status()
+
+@app.post("/admin/reload")
+async def reload_dataset(force: bool = False, wait: bool = False):
+    """
+    Reload the suppression list from its source and swap it in atomically.
+    
+    By default the reload runs in the background and the call returns 202 immediately;
+    pass wait=true to block until the new dataset is live. Unless force=true, nothing
+    happens when the source files are unchanged.
+    """
+    if wait:
+        reloaded = await run_in_threadpool(suppression_service.reload, force)
+        return {"reloaded": reloaded, "dataset": suppression_service.dataset_info()}
+    
+    started = suppression_service.reload_in_background(force)
+    return JSONResponse(
+        status_code=202,
+        content={"started": started, "dataset": suppression_service.dataset_info()}
+    )
+
+def _epoch(value: Optional[datetime]) -> Optional[int]:
+    """Seconds since the Unix epoch; datetimes without a time zone are taken as UTC"""
+    if value is None:
+        return None
+    return calendar.timegm(value.utctimetuple())
+
+def _query_index():
+    index = suppression_service.query_index
+    if index is None:
+        raise HTTPException(status_code=404, detail="Suppression queries are disabled")
+    return index
+
+@app.get("/suppressions", response_model=SuppressionQueryResponse)
+def query_suppressions(reason: Optional[str] = None, since: Optional[datetime] = None,
+                       until: Optional[datetime] = None, limit: int = 100, cursor: Optional[str] = None,
+                       order: Literal["asc", "desc"] = "asc"):
+    """
+    List suppressions by reason and LastUpdateTime range [since, until), ordered by update time
+    
+    Served from the secondary indexes, so a page costs the same on any dataset size. Pass
+    next_cursor back as cursor with the same filters for the next page; a cursor from an
+    earlier dataset version (before a reload) gets 409.
+    """
+    if not 1 <= limit <= config.SUPPRESSION_QUERY_MAX_LIMIT:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {config.SUPPRESSION_QUERY_MAX_LIMIT}")
+    index = _query_index()
+    try:
+        page = index.query(reason, _epoch(since), _epoch(until), limit, cursor, descending=order == "desc")
+    except StaleCursor as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SuppressionQueryResponse(
+        dataset_version=index.version,
+        total=page.total,
+        items=page.items,
+        next_cursor=page.next_cursor
+    )
+
+@app.get("/suppressions/counts", response_model=SuppressionCountsResponse)
+def count_suppressions(reason: Optional[str] = None, since: Optional[datetime] = None,
+                       until: Optional[datetime] = None, interval: Literal["hour", "day"] = "day"):
+    """
+    Count suppressions per reason in hourly or daily UTC buckets of [since, until)
+    
+    Without since/until the range spans the whole dataset. At most 10000 buckets are
+    returned per call; empty buckets are left out.
+    """
+    try:
+        return _query_index().counts(reason, _epoch(since), _epoch(until), interval)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 @app.post("/check-email", response_model=EmailCheckResponse)
 async def check_email_suppression(request: EmailCheckRequest):
@@ -41,50 +282,258 @@ async def check_email_suppression(request: EmailCheckRequest):
     - is_suppressed: Boolean indicating if email is suppressed
     - reason: Reason for suppression (if suppressed)
     - last_update_time: When the suppression was last updated (if suppressed)
+    - matched_rule: The domain rule that matched, e.g. *@olddomain.net (absent for entries of the address itself)
     - human_readable_explanation: AI-generated human-readable explanation (if suppressed)
+    - explanation_degraded: True if the template was served because the model missed its budget
+    
+    With explanation_mode "deferred" the lookup is answered immediately and the explanation
+    is generated in the background: explanation_id and explanation_url identify it, and it
+    is also POSTed to callback_url when one is given. "none" skips the explanation.
     """
+    if request.explanation_mode == "deferred" and not config.DEFERRED_EXPLANATIONS_ENABLED:
+        raise HTTPException(status_code=422, detail="explanation_mode 'deferred' is disabled on this server")
+    if request.callback_url is not None and not deferred_explanations.accepts_callback(str(request.callback_url)):
+        raise HTTPException(status_code=422, detail="callback_url host is not in EXPLANATION_CALLBACK_ALLOWED_HOSTS")
     try:
+        timer = StageTimer()
         email = request.email.lower()
         
         # Check if email is suppressed
         suppression_info = suppression_service.check_email_suppression(email)
+        timer.mark("lookup")
         
         if not suppression_info:
-            return EmailCheckResponse(
-                email=email,
-                is_suppressed=False
-            )
+            suppression_lookups.inc("check_email", "miss")
+            return _timed_response(EmailCheckResponse(email=email, is_suppressed=False), timer)
         
-        # Format datetime for human readability
-        formatted_time = suppression_service._format_datetime_human_readable(
-            suppression_info.last_update_time
-        )
+        suppression_lookups.inc("check_email", "hit")
+        warmer.record_hit(email)
         
-        # Get reason explanation
-        reason_explanation = suppression_service._get_reason_explanation(
-            suppression_info.reason
+        result = EmailCheckResponse(
+            email=email,
+            is_suppressed=True,
+            reason=suppression_info.reason,
+            last_update_time=suppression_info.last_update_time,
+            matched_rule=suppression_info.matched_rule
         )
+        if request.explanation_mode == "none":
+            explanations_served.inc("none", "false")
+            return _timed_response(result, timer)
         
-        # Generate human-readable explanation using Ollama
-        human_explanation = ollama_service.generate_human_explanation(
+        # Display strings were derived when the entry was loaded
+        formatted_time = suppression_info.formatted_time
+        reason_explanation = suppression_info.reason_explanation
+        timer.mark("format")
+        
+        if request.explanation_mode == "deferred":
+            result.explanation_id = deferred_explanations.submit(
+                email=email,
+                reason=suppression_info.reason,
+                last_update_time=suppression_info.last_update_time,
+                formatted_time=formatted_time,
+                reason_explanation=reason_explanation,
+                callback_url=str(request.callback_url) if request.callback_url else None
+            )
+            result.explanation_url = app.url_path_for("get_explanation", explanation_id=result.explanation_id)
+            timer.mark("defer")
+            explanations_served.inc("deferred", "false")
+            return _timed_response(result, timer)
+        
+        # Generate human-readable explanation using Ollama, within the latency budget
+        explanation = await ollama_service.agenerate_explanation(
             email=email,
             reason=suppression_info.reason,
             last_update_time=suppression_info.last_update_time,
             formatted_time=formatted_time,
-            reason_explanation=reason_explanation
+            reason_explanation=reason_explanation,
+            budget_seconds=request.explanation_budget_ms / 1000 if request.explanation_budget_ms else None
         )
         
-        return EmailCheckResponse(
+        timer.mark("llm")
+        explanations_served.inc("inline", "true" if explanation.degraded else "false")
+        
+        result.human_readable_explanation = explanation.text
+        result.explanation_degraded = explanation.degraded
+        return _timed_response(result, timer)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def _timed_response(result: EmailCheckResponse, timer: StageTimer) -> Response:
+    """Serialize the response ourselves so that stage is timed too, then record every stage"""
+    body = result.model_dump_json()
+    timer.mark("serialize")
+    headers = None
+    if config.METRICS_ENABLED:
+        timer.observe(check_email_stage_duration)
+        if config.SERVER_TIMING_ENABLED:
+            headers = {"Server-Timing": timer.server_timing()}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/explanations/{explanation_id}")
+async def get_explanation(explanation_id: str, wait_ms: int = 0):
+    """
+    Fetch a deferred explanation by the explanation_id returned from /check-email
+    
+    status is "pending" until the explanation is generated, then "ready". Pass wait_ms
+    (up to 30000) to long-poll until it is ready. Handles expire
+    DEFERRED_EXPLANATION_TTL_SECONDS after completion and then return 404.
+    """
+    if not 0 <= wait_ms <= 30000:
+        raise HTTPException(status_code=422, detail="wait_ms must be between 0 and 30000")
+    explanation = await deferred_explanations.wait(explanation_id, timeout=wait_ms / 1000)
+    if explanation is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired explanation_id")
+    return explanation
+
+@app.post("/check-email/stream")
+async def check_email_suppression_stream(request: EmailCheckRequest):
+    """
+    Server-sent-events variant of /check-email
+    
+    Emits a "result" event with the lookup as soon as it is known, then "token" events
+    carrying explanation text as the model produces it, then a "done" event with the
+    complete human_readable_explanation and explanation_degraded. If the done text
+    differs from the streamed tokens (the model failed mid-stream), the done text wins.
+    """
+    try:
+        email = request.email.lower()
+        suppression_info = suppression_service.check_email_suppression(email)
+        suppression_lookups.inc("check_email_stream", "hit" if suppression_info else "miss")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    
+    async def events():
+        result = EmailCheckResponse(email=email, is_suppressed=suppression_info is not None)
+        if suppression_info:
+            result.reason = suppression_info.reason
+            result.last_update_time = suppression_info.last_update_time
+            result.matched_rule = suppression_info.matched_rule
+        yield sse_event("result", result.model_dump(exclude_none=True))
+        if not suppression_info:
+            yield sse_event("done", {"human_readable_explanation": None, "explanation_degraded": None})
+            return
+        
+        warmer.record_hit(email)
+        formatted_time = suppression_info.formatted_time
+        reason_explanation = suppression_info.reason_explanation
+        async for kind, payload in ollama_service.astream_explanation(
             email=email,
-            is_suppressed=True,
             reason=suppression_info.reason,
             last_update_time=suppression_info.last_update_time,
-            human_readable_explanation=human_explanation
-        )
+            formatted_time=formatted_time,
+            reason_explanation=reason_explanation,
+            budget_seconds=request.explanation_budget_ms / 1000 if request.explanation_budget_ms else None
+        ):
+            if kind == "token":
+                yield sse_event("token", {"text": payload})
+            else:
+                yield sse_event("done", {"human_readable_explanation": payload.text, "explanation_degraded": payload.degraded})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/check-emails", response_model=BatchEmailCheckResponse, response_model_exclude_none=True)
+def check_emails_suppression(request: BatchEmailCheckRequest):
+    """
+    Check up to BATCH_MAX_EMAILS addresses in one request
+    
+    Addresses get a cheap syntax check instead of full validation; malformed ones are
+    reported per item with an error rather than failing the batch. Explanations, when
+    requested, use the deterministic template so a batch never waits on Ollama.
+    Runs in the threadpool so large batches do not block the event loop.
+    """
+    try:
+        emails = [email.strip().lower() for email in request.emails]
+        valid = [email for email in emails if EMAIL_SYNTAX.match(email)]
+        found = dict(zip(valid, suppression_service.check_emails_suppression(valid)))
         
+        results = []
+        suppressed = invalid = 0
+        for email in emails:
+            if email not in found:
+                invalid += 1
+                results.append(BatchEmailCheckResult(email=email, is_suppressed=False, error="invalid email address"))
+                continue
+            info = found[email]
+            if info is None:
+                results.append(BatchEmailCheckResult(email=email, is_suppressed=False))
+                continue
+            suppressed += 1
+            explanation = None
+            if request.include_explanations:
+                explanation = OllamaService.template_explanation(email, info.formatted_time, info.reason_explanation)
+            results.append(BatchEmailCheckResult(
+                email=email,
+                is_suppressed=True,
+                reason=info.reason,
+                last_update_time=info.last_update_time,
+                matched_rule=info.matched_rule,
+                explanation=explanation
+            ))
+        
+        suppression_lookups.inc("check_emails", "hit", amount=suppressed)
+        suppression_lookups.inc("check_emails", "miss", amount=len(emails) - suppressed - invalid)
+        return BatchEmailCheckResponse(
+            total=len(emails),
+            suppressed=suppressed,
+            invalid=invalid,
+            results=results
+        )
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/filter-emails")
+async def filter_emails(request: Request, keep: str = "clean", format: Optional[str] = None, email_field: str = "email"):
+    """
+    Filter an uploaded mailing list, streaming back only the clean (or only the suppressed) rows
+    
+    The body is NDJSON (one object per line, address under email_field) or CSV (header row
+    naming the email_field column; the header is echoed back, and a header without that
+    column is rejected with 422). The format comes from the
+    format parameter or the Content-Type header. Rows are read and written chunk by chunk,
+    so memory stays flat however large the upload is. Rows without a valid address are
+    dropped from both outputs. CSV fields must not contain embedded newlines.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+    if format not in FILTER_FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of {FILTER_FORMATS}")
+    try:
+        mailing_list_filter = MailingListFilter(suppression_service, keep, format, email_field)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    batches = iter_line_batches(request.stream(), config.FILTER_MAX_LINE_BYTES)
+    # The CSV header decides which column is checked; read it before the response starts so a
+    # missing column is a 422 rather than a filter over the wrong data
+    head = []
+    try:
+        while mailing_list_filter.needs_header:
+            lines = await batches.__anext__()
+            head.extend(mailing_list_filter.filter_lines(lines))
+    except StopAsyncIteration:
+        pass
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    async def filtered_rows():
+        if head:
+            yield b"".join(head)
+        async for lines in batches:
+            kept = mailing_list_filter.filter_lines(lines)
+            if kept:
+                yield b"".join(kept)
+        print(mailing_list_filter.summary())
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return RequestBodyStreamingResponse(filtered_rows(), media_type=media_type)
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -1,9 +1,26 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+import re
+from pydantic import BaseModel, EmailStr, Field, HttpUrl, model_validator
+from typing import Dict, Literal, Optional, List
 from datetime import datetime
+from config import config
+
+# Cheap syntactic check used for batch items instead of full EmailStr validation
+EMAIL_SYNTAX = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 
 class EmailCheckRequest(BaseModel):
     email: EmailStr
+    # Optional tighter latency budget for the explanation; capped by EXPLANATION_BUDGET_SECONDS
+    explanation_budget_ms: Optional[int] = Field(None, gt=0)
+    # inline: wait for the explanation; deferred: return a handle to fetch it later; none: lookup only
+    explanation_mode: Literal["inline", "deferred", "none"] = "inline"
+    # Deferred mode only: the finished explanation is also POSTed here
+    callback_url: Optional[HttpUrl] = None
+
+    @model_validator(mode="after")
+    def _callback_needs_deferred(self):
+        if self.callback_url is not None and self.explanation_mode != "deferred":
+            raise ValueError("callback_url requires explanation_mode 'deferred'")
+        return self
 
 class SuppressionInfo(BaseModel):
     email_address: str
@@ -15,4 +32,53 @@ class EmailCheckResponse(BaseModel):
     is_suppressed: bool
     reason: Optional[str] = None
     last_update_time: Optional[str] = None
+    # Domain rule that matched, e.g. "*@olddomain.net"; None when the address has its own entry
+    matched_rule: Optional[str] = None
     human_readable_explanation: Optional[str] = None
+    # True when the template explanation was served because the model was too slow or busy
+    explanation_degraded: Optional[bool] = None
+    # Deferred mode: handle and path to GET the explanation once it is generated
+    explanation_id: Optional[str] = None
+    explanation_url: Optional[str] = None
+
+class BatchEmailCheckRequest(BaseModel):
+    emails: List[str] = Field(..., min_length=1, max_length=config.BATCH_MAX_EMAILS)
+    include_explanations: bool = False
+
+class BatchEmailCheckResult(BaseModel):
+    email: str
+    is_suppressed: bool
+    reason: Optional[str] = None
+    last_update_time: Optional[str] = None
+    matched_rule: Optional[str] = None
+    explanation: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchEmailCheckResponse(BaseModel):
+    total: int
+    suppressed: int
+    invalid: int
+    results: List[BatchEmailCheckResult]
+
+class SuppressionQueryResponse(BaseModel):
+    dataset_version: int
+    # Entries matching the filters across all pages
+    total: int
+    items: List[SuppressionInfo]
+    # Pass back as cursor (with the same filters) for the next page; null on the last page
+    next_cursor: Optional[str] = None
+
+class SuppressionCountBucket(BaseModel):
+    start: str
+    total: int
+    by_reason: Dict[str, int]
+
+class SuppressionCountsResponse(BaseModel):
+    dataset_version: int
+    interval: str
+    since: str
+    until: str
+    total: int
+    by_reason: Dict[str, int]
+    # Non-empty buckets only, oldest first
+    buckets: List[SuppressionCountBucket]
@@ -0,0 +1,227 @@
+import base64
+import binascii
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from stores import INVALID_EPOCH, SuppressionRecord, SuppressionStore, format_epoch
+
+# Bucket widths accepted by SuppressionQueryIndex.counts
+INTERVALS = {"hour": 3600, "day": 86400}
+
+# Most buckets one counts() call may return
+MAX_BUCKETS = 10000
+
+
+class InvalidCursor(ValueError):
+    """Raised for a pagination cursor that was not issued by this service"""
+
+
+class StaleCursor(InvalidCursor):
+    """Raised for a cursor issued against a dataset version that has since been replaced"""
+
+
+class QueryPage(NamedTuple):
+    total: int
+    items: List[SuppressionRecord]
+    next_cursor: Optional[str]
+
+
+def _time_order(epochs: Sequence[int]) -> array:
+    """
+    Row numbers ordered by (epoch, row), without building a Python object per row.
+
+    Rows are first distributed into per-day buckets with a counting pass, then each
+    bucket is sorted on its own, so the transient memory is bounded by the largest day.
+    Rows without a valid timestamp sort first.
+    """
+    count = len(epochs)
+    order = array("I", bytes(4 * count))
+    first = min((epoch for epoch in epochs if epoch != INVALID_EPOCH), default=None)
+    if first is None:
+        for row in range(count):
+            order[row] = row
+        return order
+    day = INTERVALS["day"]
+    # Bucket 0 holds invalid timestamps, bucket 1 + n the n-th day from ``first``
+    buckets = array("I", (0 if epoch == INVALID_EPOCH else 1 + (epoch - first) // day for epoch in epochs))
+    starts = [0] * (max(buckets) + 2)
+    for bucket in buckets:
+        starts[bucket + 1] += 1
+    for bucket in range(1, len(starts)):
+        starts[bucket] += starts[bucket - 1]
+    ends = starts[1:]
+    fill = starts[:-1]
+    for row, bucket in enumerate(buckets):
+        order[fill[bucket]] = row
+        fill[bucket] += 1
+    del buckets, fill
+    key = epochs.__getitem__
+    for start, end in zip(starts, ends):
+        if end - start > 1:
+            chunk = order[start:end]
+            # Rows were placed in row order, so sorting by epoch alone keeps ties by row
+            order[start:end] = array("I", sorted(chunk, key=key))
+    return order
+
+
+class SuppressionQueryIndex:
+    """
+    Secondary indexes over one dataset version, for listing and counting entries by
+    reason and last update time without scanning the store.
+
+    ``order`` lists row numbers sorted by last update time and ``epochs`` their
+    timestamps in that order, so a time range is two bisections. ``postings`` hold, per
+    reason code, the positions in ``order`` of that reason's rows; they are ascending and
+    therefore also time-sorted, so reason + time range is two bisections as well. All of
+    it lives in flat arrays (16 bytes per entry) and never creates per-entry objects.
+    """
+
+    def __init__(self, store: SuppressionStore, version: int):
+        self.store = store
+        self.version = version
+        reason_codes, reason_names, epochs = store.index_columns()
+        self.reasons: List[str] = list(reason_names)
+        self._reason_lookup: Dict[str, int] = {}
+        for code, name in enumerate(self.reasons):
+            self._reason_lookup.setdefault(name.upper(), code)
+        self.order = _time_order(epochs)
+        self.epochs = array("q", map(epochs.__getitem__, self.order))
+        self.postings = [array("I") for _ in self.reasons]
+        appends = [posting.append for posting in self.postings]
+        for position, row in enumerate(self.order):
+            appends[reason_codes[row]](position)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(sys.getsizeof(column) for column in (self.order, self.epochs, *self.postings))
+
+    def reason_code(self, reason: str) -> Optional[int]:
+        """Code of ``reason`` (case-insensitive), or None if no entry has it"""
+        return self._reason_lookup.get(reason.upper())
+
+    def _bounds(self, code: Optional[int], since: Optional[int], until: Optional[int]):
+        """The position list to walk (``order`` positions, or a posting) and its [start, end) slice"""
+        if code is None:
+            positions = range(len(self.order))
+            start = bisect_left(self.epochs, since) if since is not None else 0
+            end = bisect_left(self.epochs, until) if until is not None else len(positions)
+        else:
+            positions = self.postings[code]
+            key = self.epochs.__getitem__
+            start = bisect_left(positions, since, key=key) if since is not None else 0
+            end = bisect_left(positions, until, key=key) if until is not None else len(positions)
+        return positions, start, max(start, end)
+
+    def _encode_cursor(self, position: int) -> str:
+        return base64.urlsafe_b64encode(f"{self.version}:{position}".encode()).decode().rstrip("=")
+
+    def _decode_cursor(self, cursor: str) -> int:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            version, position = (int(part) for part in raw.split(":"))
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            raise InvalidCursor("Malformed cursor")
+        if version != self.version:
+            raise StaleCursor(f"Cursor belongs to dataset version {version}, now serving {self.version}; "
+                              "restart the query")
+        if position < 0:
+            raise InvalidCursor("Malformed cursor")
+        return position
+
+    def query(self, reason: Optional[str] = None, since: Optional[int] = None, until: Optional[int] = None,
+              limit: int = 100, cursor: Optional[str] = None, descending: bool = False) -> QueryPage:
+        """
+        One page of entries with ``reason`` updated in [since, until), ordered by update time.
+
+        ``total`` counts every match, not just this page. Pass ``next_cursor`` back with the
+        same filters to continue; cursors are tied to the dataset version.
+        """
+        code = None
+        if reason is not None:
+            code = self.reason_code(reason)
+            if code is None:
+                return QueryPage(0, [], None)
+        positions, start, end = self._bounds(code, since, until)
+        total = end - start
+        if cursor is not None:
+            if descending:
+                end = min(end, self._decode_cursor(cursor))
+            else:
+                start = max(start, self._decode_cursor(cursor))
+        if descending:
+            stop = max(start, end - limit)
+            page = range(end - 1, stop - 1, -1)
+            next_position = stop if stop > start else None
+        else:
+            stop = min(end, start + limit)
+            page = range(start, stop)
+            next_position = stop if stop < end else None
+        order = self.order
+        record_at = self.store.record_at
+        items = [record_at(order[positions[i]]) for i in page]
+        return QueryPage(total, items, self._encode_cursor(next_position) if next_position is not None else None)
+
+    def counts(self, reason: Optional[str] = None, since: Optional[int] = None, until: Optional[int] = None,
+               interval: str = "day") -> Dict:
+        """
+        Entries per reason in each ``interval`` bucket of [since, until), aligned to UTC.
+
+        Each bucket costs one bisection per reason, so the cost depends on the number of
+        buckets rather than the number of entries. Empty buckets are omitted.
+        """
+        step = INTERVALS[interval]
+        if reason is not None:
+            code = self.reason_code(reason)
+            codes = [code] if code is not None else []
+        else:
+            codes = list(range(len(self.reasons)))
+        # Default to the span of valid timestamps
+        first_valid = bisect_left(self.epochs, INVALID_EPOCH + 1)
+        if since is None:
+            since = self.epochs[first_valid] if first_valid < len(self.epochs) else 0
+        if until is None:
+            until = self.epochs[-1] + 1 if first_valid < len(self.epochs) else since
+        bucket_start = since - since % step
+        buckets = -(-(until - bucket_start) // step) if until > since else 0
+        if buckets > MAX_BUCKETS:
+            raise ValueError(f"{buckets} {interval} buckets requested; narrow the range to at most {MAX_BUCKETS}")
+
+        bounds = [since] + [bucket_start + k * step for k in range(1, buckets)] + [until]
+        by_reason = {}
+        for code in codes:
+            positions = self.postings[code]
+            key = self.epochs.__getitem__
+            cuts = []
+            low = 0
+            for bound in bounds:
+                low = bisect_left(positions, bound, low, key=key)
+                cuts.append(low)
+            by_reason[self.reasons[code]] = cuts
+
+        result_buckets = []
+        totals = {name: 0 for name in by_reason}
+        for k in range(buckets):
+            counts = {}
+            for name, cuts in by_reason.items():
+                count = cuts[k + 1] - cuts[k]
+                if count:
+                    counts[name] = count
+                    totals[name] += count
+            if counts:
+                result_buckets.append({"start": format_epoch(bucket_start + k * step),
+                                       "total": sum(counts.values()), "by_reason": counts})
+        totals = {name: count for name, count in totals.items() if count}
+        return {
+            "dataset_version": self.version,
+            "interval": interval,
+            "since": format_epoch(since),
+            "until": format_epoch(until),
+            "total": sum(totals.values()),
+            "by_reason": totals,
+            "buckets": result_buckets,
+        }
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Production launcher: load the suppression index once, then fork workers that share it.
+
+``uvicorn main:app --workers N`` starts N fresh interpreters and each of them parses the
+export into its own copy of the index. This launcher prepares the index in the parent
+process and forks the workers afterwards, so there is a single copy in memory:
+
+- snapshot (default): the export is compiled into a binary snapshot, rebuilt when it is
+  missing or older than the JSON, and mapped read-only. Every worker serves lookups from
+  the same page-cache pages. When the export changes, the first worker to reload rebuilds
+  the snapshot under a lock file and the others map the result.
+- preload: the configured in-memory store is loaded in the parent and its heap is frozen
+  out of the garbage collector before forking, so the workers share it copy-on-write.
+  Pages are only copied as lookups update the reference counts of the entries they touch.
+
+All workers accept connections on one listening socket. The parent restarts workers that
+exit unexpectedly and forwards SIGINT/SIGTERM to them for a graceful shutdown. Deferred
+explanations are refused with more than one worker, since a handle is only known to the
+worker that issued it.
+
+Usage:
+    python serve.py [--workers 4] [--host 0.0.0.0] [--port 8000] [--shared-index snapshot|preload]
+                    [--no-access-log]
+"""
+
+import argparse
+import gc
+import os
+import signal
+import sys
+import time
+from typing import Dict, List, Optional
+
+import uvicorn
+
+from config import config
+from snapshot import refresh_snapshot
+
+SHARED_INDEX_MODES = ("snapshot", "preload")
+
+# Pause before restarting a worker that died, so a crashing worker cannot spin the CPU
+RESTART_DELAY_SECONDS = 1.0
+
+
+def snapshot_path() -> str:
+    """Snapshot shared by the workers: the configured one, else next to the JSON export"""
+    if config.SUPPRESSION_SNAPSHOT_PATH:
+        return config.SUPPRESSION_SNAPSHOT_PATH
+    return os.path.splitext(config.SUPPRESSED_EMAILS_JSON_PATH)[0] + ".snap"
+
+
+def prepare_snapshot(path: str) -> bool:
+    """Build ``path`` from the JSON export if it is missing or older; False if no snapshot is usable"""
+    json_path = config.SUPPRESSED_EMAILS_JSON_PATH
+    if not os.path.exists(json_path):
+        if os.path.exists(path):
+            return True
+        print(f"Cannot build snapshot {path}: {json_path} not found")
+        return False
+    try:
+        refresh_snapshot(json_path, path, progress_every=config.SUPPRESSION_LOAD_PROGRESS_EVERY,
+                         max_invalid=config.SUPPRESSION_MAX_INVALID_ROWS)
+    except Exception as e:
+        print(f"Error building snapshot {path}, workers will share the preloaded index instead: {e}")
+        return False
+    return True
+
+
+def load_app(shared_index: str):
+    """Import the application with its index loaded, ready to be forked"""
+    if shared_index == "snapshot":
+        path = snapshot_path()
+        if prepare_snapshot(path):
+            config.SUPPRESSION_SNAPSHOT_PATH = path
+
+    import main
+
+    # SQLite connections must not cross a fork; each worker opens its own
+    store = main.ollama_service.explanation_cache.store
+    if store is not None:
+        store.close()
+
+    # Objects that exist now are never scanned by the collector again, so the collector
+    # does not write to (and copy) the pages the workers share
+    gc.collect()
+    gc.freeze()
+    return main
+
+
+def run_worker(main, sock, index: int, host: str, port: int, access_log: bool) -> None:
+    """Serve ``main.app`` on the inherited socket; runs in the forked child and never returns"""
+    status = 1
+    try:
+        # Signals reach the workers through the parent, not the terminal's process group
+        os.setpgid(0, 0)
+        # Only the first worker pre-generates explanations; the others would repeat its work
+        if index:
+            config.WARMER_ENABLED = False
+        store = main.ollama_service.explanation_cache.store
+        if store is not None:
+            store.reopen()
+        server = uvicorn.Server(uvicorn.Config(main.app, host=host, port=port, access_log=access_log))
+        server.run(sockets=[sock])
+        status = 0
+    finally:
+        os._exit(status)
+
+
+def serve(workers: int, host: str, port: int, shared_index: str, access_log: bool = True) -> int:
+    # A deferred handle lives in the worker that issued it, and the next request may reach another one
+    if workers > 1 and config.DEFERRED_EXPLANATIONS_ENABLED:
+        print("Deferred explanations are disabled with more than one worker")
+        config.DEFERRED_EXPLANATIONS_ENABLED = False
+    main = load_app(shared_index)
+    info = main.suppression_service.dataset_info()
+    sock = uvicorn.Config(main.app, host=host, port=port).bind_socket()
+    print(f"Serving {info['entries']:,} suppressed emails ({info['backend']} backend) "
+          f"from {workers} worker(s) on {host}:{port}")
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            run_worker(main, sock, index, host, port, access_log)
+        children[pid] = index
+        print(f"Started worker {index} (pid {pid})")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+        print(f"Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+        time.sleep(RESTART_DELAY_SECONDS)
+        if not stopping:
+            spawn(index)
+    sock.close()
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=config.API_WORKERS)
+    parser.add_argument("--host", default=config.API_HOST)
+    parser.add_argument("--port", type=int, default=config.API_PORT)
+    parser.add_argument("--shared-index", choices=SHARED_INDEX_MODES, default=config.WORKER_SHARED_INDEX)
+    parser.add_argument("--no-access-log", action="store_true", help="do not log every request")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    return serve(args.workers, args.host, args.port, args.shared_index, access_log=not args.no_access_log)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
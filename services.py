@@ -1,111 +1,932 @@
+import asyncio
+import hashlib
 import json
 import os
-from typing import Optional, List
-from datetime import datetime
-from dateutil import parser
+import re
+import threading
+import time
+from typing import Optional, List, Dict, Any, AsyncIterator, Awaitable, Callable, NamedTuple, Tuple
+from datetime import datetime, timezone
 import ollama
-from models import SuppressionInfo
 from config import config
+from loader import IngestError, IngestReport, iter_valid_destinations, print_progress
+from stores import (
+    DictSuppressionStore, SuppressionRecord, SuppressionStore, create_store, format_human, parse_epoch,
+    reason_explanation
+)
+from snapshot import SnapshotError, open_snapshot, refresh_snapshot, snapshot_is_stale
+from bloom import BloomFilter
+from query_index import SuppressionQueryIndex
+from domain_rules import DomainRuleTrie, load_domain_rules
+from explanation_cache import ExplanationCache
+from explanation_store import ExplanationStore
+from singleflight import AsyncSingleFlight, SingleFlight
+from circuit_breaker import CircuitBreaker
+from streaming import ThinkTagStripper
+
+class SuppressionDataset:
+    """Everything a lookup needs, bundled so a reload can swap it in with one reference assignment"""
+    
+    __slots__ = ("store", "negative_filter", "query_index", "domain_rules", "version", "source_signature",
+                 "loaded_at", "load_duration", "diff", "ingest")
+    
+    def __init__(self, store: SuppressionStore, negative_filter: Optional[BloomFilter], version: int,
+                 source_signature: Tuple, loaded_at: float, load_duration: float, diff: Dict[str, int],
+                 ingest: Optional[IngestReport] = None, query_index: Optional[SuppressionQueryIndex] = None,
+                 domain_rules: Optional[DomainRuleTrie] = None):
+        self.store = store
+        self.negative_filter = negative_filter
+        self.query_index = query_index
+        self.domain_rules = domain_rules
+        self.version = version
+        self.source_signature = source_signature
+        self.loaded_at = loaded_at
+        self.load_duration = load_duration
+        self.diff = diff
+        self.ingest = ingest
 
 class SuppressionService:
     def __init__(self):
-        self.suppressed_emails_data = self._load_suppressed_emails()
-    
-    def _load_suppressed_emails(self) -> List[SuppressionInfo]:
-        """Load suppressed emails data from JSON file"""
+        self._reload_lock = threading.Lock()
+        self._query_index_lock = threading.Lock()
+        self._watch_stop = threading.Event()
+        self._watch_thread: Optional[threading.Thread] = None
+        self.last_reload_error: Optional[str] = None
+        
+        started = time.perf_counter()
         try:
-            if not os.path.exists(config.SUPPRESSED_EMAILS_JSON_PATH):
-                raise FileNotFoundError(f"Suppressed emails file not found: {config.SUPPRESSED_EMAILS_JSON_PATH}")
-            
-            with open(config.SUPPRESSED_EMAILS_JSON_PATH, 'r') as file:
-                data = json.load(file)
-                
-            suppressed_emails = []
-            for item in data.get("SuppressedDestinationSummaries", []):
-                suppressed_emails.append(SuppressionInfo(
-                    email_address=item["EmailAddress"],
-                    reason=item["Reason"],
-                    last_update_time=item["LastUpdateTime"]
-                ))
-            
-            return suppressed_emails
+            self._refresh_snapshot()
+            signature = self._source_signature()
+            store, diff, ingest = self._read_suppressed_emails()
+        except IngestError as e:
+            # Serving an empty list would report every address as not suppressed; refuse to start
+            print(f"Error loading suppressed emails data, not starting: {e}")
+            raise
         except Exception as e:
+            self.last_reload_error = str(e)
             print(f"Error loading suppressed emails data: {e}")
-            return []
+            signature = self._source_signature()
+            store, diff, ingest = create_store(config.SUPPRESSION_STORE_BACKEND), {}, None
+        try:
+            domain_rules = self._read_domain_rules()
+        except Exception as e:
+            self.last_reload_error = str(e)
+            print(f"Error loading domain rules: {e}")
+            domain_rules = None
+        self._dataset = self._build_dataset(store, diff, 1, signature, started, ingest, domain_rules)
+    
+    @property
+    def suppressed_emails_index(self) -> SuppressionStore:
+        return self._dataset.store
+    
+    @property
+    def negative_filter(self) -> Optional[BloomFilter]:
+        return self._dataset.negative_filter
+    
+    @property
+    def query_index(self) -> Optional[SuppressionQueryIndex]:
+        """
+        Secondary indexes of the current dataset; carries its own store and version.
+        
+        Built on first use rather than with the dataset, so loads (and snapshot cold starts)
+        do not pay for them unless /suppressions is actually queried.
+        """
+        dataset = self._dataset
+        if dataset.query_index is None and config.SUPPRESSION_QUERY_INDEX_ENABLED:
+            with self._query_index_lock:
+                if dataset.query_index is None:
+                    started = time.perf_counter()
+                    dataset.query_index = SuppressionQueryIndex(dataset.store, dataset.version)
+                    print(f"Built query index for version {dataset.version} in {time.perf_counter() - started:.2f}s")
+        return dataset.query_index
+    
+    @property
+    def dataset_version(self) -> int:
+        return self._dataset.version
+    
+    @property
+    def suppressed_emails_data(self) -> List[SuppressionRecord]:
+        """All loaded suppression entries (first entry per address), in file order"""
+        return list(self.suppressed_emails_index)
+    
+    @staticmethod
+    def _normalize_email(email: str) -> str:
+        """Normalize an email address into its lookup key"""
+        return email.lower()
+    
+    def _read_suppressed_emails(
+        self, previous: Optional[SuppressionStore] = None
+    ) -> Tuple[SuppressionStore, Dict[str, int], Optional[IngestReport]]:
+        """Map the binary snapshot if one is configured, else stream the JSON file into the configured store"""
+        if config.SUPPRESSION_SNAPSHOT_PATH:
+            try:
+                snapshot = open_snapshot(config.SUPPRESSION_SNAPSHOT_PATH)
+                if snapshot is not None:
+                    # Only if the export changed again since _refresh_snapshot; never serve old data
+                    if not snapshot_is_stale(config.SUPPRESSED_EMAILS_JSON_PATH, config.SUPPRESSION_SNAPSHOT_PATH):
+                        return snapshot, {}, None
+                    snapshot.close()
+                    print(f"Snapshot {config.SUPPRESSION_SNAPSHOT_PATH} is older than {config.SUPPRESSED_EMAILS_JSON_PATH}, falling back to JSON")
+                else:
+                    print(f"Snapshot not found: {config.SUPPRESSION_SNAPSHOT_PATH}, falling back to JSON")
+            except SnapshotError as e:
+                print(f"Error mapping suppression snapshot, falling back to JSON: {e}")
+        
+        return self._load_suppressed_emails(previous)
+    
+    @staticmethod
+    def _read_domain_rules() -> Optional[DomainRuleTrie]:
+        """Load the domain and wildcard rules file, if one is configured and it has any rules"""
+        path = config.SUPPRESSION_DOMAIN_RULES_PATH
+        if not path:
+            return None
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Domain rules file not found: {path}")
+        rules = load_domain_rules(path)
+        print(f"Loaded {len(rules):,} domain rules from {path}")
+        return rules if len(rules) else None
+    
+    def _load_suppressed_emails(
+        self, previous: Optional[SuppressionStore] = None
+    ) -> Tuple[SuppressionStore, Dict[str, int], IngestReport]:
+        """
+        Stream the JSON file into a new store, diffing it against ``previous`` when reloading.
+        
+        Entries that are unchanged since ``previous`` are carried over as-is where the
+        backends allow it, so a reload only pays for the rows that actually changed.
+        Every row is validated and its timestamp parsed here, once; more than
+        SUPPRESSION_MAX_INVALID_ROWS malformed rows reject the whole load with IngestError.
+        """
+        if not os.path.exists(config.SUPPRESSED_EMAILS_JSON_PATH):
+            raise FileNotFoundError(f"Suppressed emails file not found: {config.SUPPRESSED_EMAILS_JSON_PATH}")
+        
+        store = create_store(config.SUPPRESSION_STORE_BACKEND)
+        reuse = isinstance(previous, DictSuppressionStore) and isinstance(store, DictSuppressionStore)
+        diff = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0}
+        report = IngestReport(config.SUPPRESSED_EMAILS_JSON_PATH)
+        for email_address, reason, last_update_time, epoch in iter_valid_destinations(
+            config.SUPPRESSED_EMAILS_JSON_PATH,
+            report,
+            max_invalid=config.SUPPRESSION_MAX_INVALID_ROWS,
+            chunk_size=config.SUPPRESSION_LOAD_CHUNK_SIZE,
+            progress=print_progress,
+            progress_every=config.SUPPRESSION_LOAD_PROGRESS_EVERY
+        ):
+            key = self._normalize_email(email_address)
+            status = None
+            if previous is not None:
+                status = previous.matches(key, email_address, reason, last_update_time, epoch)
+            # The store keeps the first entry for duplicate addresses, matching the old scan order
+            if status and reuse:
+                inserted = store.add_existing(key, previous.get(key))
+            else:
+                inserted = store.add(key, email_address, reason, last_update_time, epoch)
+            if inserted:
+                report.loaded += 1
+                diff["added" if status is None else "unchanged" if status else "changed"] += 1
+            else:
+                report.duplicates += 1
+        if report.invalid:
+            print(f"Skipped {report.summary()}")
+        
+        if previous is None:
+            return store, {}, report
+        diff["removed"] = len(previous) - diff["unchanged"] - diff["changed"]
+        return store, diff, report
+    
+    def _build_dataset(self, store: SuppressionStore, diff: Dict[str, int], version: int,
+                       signature: Tuple, started: float, ingest: Optional[IngestReport] = None,
+                       domain_rules: Optional[DomainRuleTrie] = None) -> SuppressionDataset:
+        """Wrap a freshly loaded store, with its negative filter, as the given dataset version"""
+        negative_filter = self._build_negative_filter(store)
+        return SuppressionDataset(
+            store=store,
+            negative_filter=negative_filter,
+            domain_rules=domain_rules,
+            version=version,
+            source_signature=signature,
+            loaded_at=time.time(),
+            load_duration=time.perf_counter() - started,
+            diff=diff,
+            ingest=ingest
+        )
+    
+    @staticmethod
+    def _build_negative_filter(store: SuppressionStore) -> Optional[BloomFilter]:
+        """Build the optional Bloom filter that answers definite misses without touching the store"""
+        if not config.SUPPRESSION_BLOOM_FILTER_ENABLED:
+            return None
+        return BloomFilter.from_keys(
+            store.iter_keys(),
+            capacity=len(store),
+            false_positive_rate=config.SUPPRESSION_BLOOM_FALSE_POSITIVE_RATE
+        )
+    
+    @staticmethod
+    def _refresh_snapshot() -> None:
+        """
+        Rebuild the configured snapshot when the JSON export is newer, so a stale snapshot
+        is never served. Raises IngestError (or OSError) if the new export cannot be built.
+        """
+        path = config.SUPPRESSION_SNAPSHOT_PATH
+        if path and os.path.exists(path) and snapshot_is_stale(config.SUPPRESSED_EMAILS_JSON_PATH, path):
+            refresh_snapshot(config.SUPPRESSED_EMAILS_JSON_PATH, path,
+                             progress_every=config.SUPPRESSION_LOAD_PROGRESS_EVERY,
+                             max_invalid=config.SUPPRESSION_MAX_INVALID_ROWS)
+    
+    @staticmethod
+    def _source_signature() -> Tuple:
+        """Identify the current contents of the data source files by path, mtime and size"""
+        signature = []
+        for path in (config.SUPPRESSION_SNAPSHOT_PATH, config.SUPPRESSED_EMAILS_JSON_PATH,
+                     config.SUPPRESSION_DOMAIN_RULES_PATH):
+            if path and os.path.exists(path):
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+    
+    def reload(self, force: bool = False) -> bool:
+        """
+        Rebuild the dataset from the data source and swap it in atomically.
+        
+        Lookups keep using the previous dataset until the new one is complete, and a
+        failed reload leaves it in place. Returns True if a new dataset was installed.
+        """
+        with self._reload_lock:
+            previous = self._dataset
+            started = time.perf_counter()
+            try:
+                self._refresh_snapshot()
+                signature = self._source_signature()
+                if not force and signature == previous.source_signature:
+                    return False
+                store, diff, ingest = self._read_suppressed_emails(previous.store)
+                domain_rules = self._read_domain_rules()
+            except Exception as e:
+                self.last_reload_error = str(e)
+                print(f"Error reloading suppressed emails data, keeping version {previous.version}: {e}")
+                return False
+            self._dataset = self._build_dataset(store, diff, previous.version + 1, signature, started, ingest,
+                                                domain_rules)
+            self.last_reload_error = None
+            print(f"Reloaded suppressed emails: version {self._dataset.version}, {len(store):,} entries in {self._dataset.load_duration:.2f}s {diff}")
+            return True
+    
+    def reload_in_background(self, force: bool = False) -> bool:
+        """Start a reload on a background thread; returns False if one is already running"""
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, kwargs={"force": force}, name="suppression-reload", daemon=True).start()
+        return True
     
-    def check_email_suppression(self, email: str) -> Optional[SuppressionInfo]:
-        """Check if an email is suppressed"""
-        for suppressed_email in self.suppressed_emails_data:
-            if suppressed_email.email_address.lower() == email.lower():
-                return suppressed_email
+    def start_watching(self, interval: float) -> None:
+        """Poll the data source every ``interval`` seconds and reload when it changes"""
+        if self._watch_thread is not None or interval <= 0:
+            return
+        self._watch_stop.clear()
+        
+        def watch():
+            while not self._watch_stop.wait(interval):
+                if self._source_signature() != self._dataset.source_signature:
+                    self.reload()
+        
+        self._watch_thread = threading.Thread(target=watch, name="suppression-watch", daemon=True)
+        self._watch_thread.start()
+    
+    def stop_watching(self) -> None:
+        if self._watch_thread is None:
+            return
+        self._watch_stop.set()
+        self._watch_thread.join()
+        self._watch_thread = None
+    
+    def dataset_info(self) -> Dict[str, Any]:
+        """Describe the dataset currently serving lookups"""
+        dataset = self._dataset
+        return {
+            "version": dataset.version,
+            "backend": dataset.store.backend,
+            "entries": len(dataset.store),
+            "domain_rules": len(dataset.domain_rules) if dataset.domain_rules is not None else 0,
+            "loaded_at": datetime.fromtimestamp(dataset.loaded_at, timezone.utc).isoformat(),
+            "load_duration_seconds": round(dataset.load_duration, 6),
+            "sources": [{"path": path, "mtime_ns": mtime, "size": size} for path, mtime, size in dataset.source_signature],
+            "diff": dataset.diff,
+            "ingest": dataset.ingest.as_dict() if dataset.ingest is not None else None,
+            "reloading": self._reload_lock.locked(),
+            "last_reload_error": self.last_reload_error
+        }
+    
+    def memory_footprint(self) -> Dict[str, Any]:
+        """Report the approximate memory held by the suppression store"""
+        dataset = self._dataset
+        store = dataset.store
+        total = store.memory_footprint()
+        return {
+            "backend": store.backend,
+            "entries": len(store),
+            "bytes": total,
+            "bytes_per_entry": total // len(store) if len(store) else 0,
+            "negative_filter_bytes": dataset.negative_filter.size_bytes if dataset.negative_filter else 0,
+            "query_index_bytes": dataset.query_index.size_bytes if dataset.query_index else 0
+        }
+    
+    def check_email_suppression(self, email: str) -> Optional[SuppressionRecord]:
+        """
+        Check if an email is suppressed, by its own entry or else by the most specific domain rule.
+        
+        A rule match returns the rule's record, whose email_address is the rule pattern.
+        """
+        key = self._normalize_email(email)
+        # Read the dataset once so a concurrent reload cannot mix filter, store and rule versions
+        dataset = self._dataset
+        if dataset.negative_filter is None or key in dataset.negative_filter:
+            info = dataset.store.get(key)
+            if info is not None:
+                return info
+        if dataset.domain_rules is not None:
+            return dataset.domain_rules.match(key)
         return None
     
+    def check_emails_suppression(self, emails: List[str]) -> List[Optional[SuppressionRecord]]:
+        """Check many emails against one consistent dataset version"""
+        dataset = self._dataset
+        negative_filter = dataset.negative_filter
+        domain_rules = dataset.domain_rules
+        get = dataset.store.get
+        normalize = self._normalize_email
+        if negative_filter is None and domain_rules is None:
+            return [get(normalize(email)) for email in emails]
+        results = []
+        for email in emails:
+            key = normalize(email)
+            info = get(key) if negative_filter is None or key in negative_filter else None
+            if info is None and domain_rules is not None:
+                info = domain_rules.match(key)
+            results.append(info)
+        return results
+    
     def _format_datetime_human_readable(self, iso_datetime: str) -> str:
-        """Convert ISO datetime to human readable format with timezone"""
+        """
+        Convert an ISO datetime string to the human readable UTC format.
+        
+        Loaded entries already carry this as ``SuppressionRecord.formatted_time``; this is
+        for timestamps from elsewhere. Unparseable values are returned unchanged.
+        """
         try:
-            dt = parser.parse(iso_datetime)
-            return dt.strftime("%B %d, %Y at %I:%M %p UTC")
-        except Exception:
+            return format_human(parse_epoch(iso_datetime))
+        except (ValueError, OverflowError):
             return iso_datetime
     
     def _get_reason_explanation(self, reason: str) -> str:
         """Get human readable explanation for suppression reason"""
-        reason_map = {
-            "COMPLAINT": "the recipient marked emails from this sender as spam or complained about receiving them",
-            "BOUNCE": "emails to this address consistently bounce back, indicating the email address may be invalid or the mailbox is full",
-            "UNSUBSCRIBE": "the recipient has unsubscribed from receiving emails",
-            "REPUTATION": "the sender's reputation has been negatively affected due to poor email practices"
-        }
-        return reason_map.get(reason.upper(), f"the email was suppressed due to {reason.lower()}")
+        return reason_explanation(reason)
+
+EXPLANATION_SYSTEM_PROMPT = """You are an email suppression status assistant. Provide a clear, concise explanation in 1-2 sentences.
+
+The user message lists the email address, its status, the suppression reason, when it was last updated and what the reason means. Write a professional explanation that combines all this information into a natural, human-readable response. Do not include any additional text, headers, formatting, thinking process, or reasoning - just provide the final explanation directly."""
+
+BATCH_SYSTEM_PROMPT = """You are an email suppression status assistant. For each record in the user message, write a clear, concise explanation in 1-2 sentences that combines the email address, status (suppressed), reason, last update time and reason explanation into a natural, professional, human-readable response. Do not include headers, formatting, thinking process, or reasoning.
+
+Respond with JSON only, in the form {"explanations": [{"id": <record id>, "explanation": "<text>"}]}, with exactly one entry per record id."""
+
+# Record fields of the explanation prompt, least specific first and the email address last
+EXPLANATION_USER_PROMPT = """Status: Suppressed
+Reason: {reason}
+Reason Explanation: {reason_explanation}
+Last Updated: {formatted_time}
+Email: {email}"""
+
+# Thinking blocks in a model reply; an unclosed one runs to the end, as ThinkTagStripper drops it
+THINK_BLOCK = re.compile(r'<think>.*?(?:</think>|\Z)|<thinking>.*?(?:</thinking>|\Z)', re.DOTALL)
+
+# Changes whenever a prompt does, so persisted explanations from older prompts stop matching
+PROMPT_VERSION = hashlib.sha256(
+    "\x00".join((EXPLANATION_SYSTEM_PROMPT, EXPLANATION_USER_PROMPT, BATCH_SYSTEM_PROMPT)).encode("utf-8")
+).hexdigest()[:12]
+
+class ExplanationResult(NamedTuple):
+    text: str
+    # True when the template was served instead of a model reply
+    degraded: bool = False
 
 class OllamaService:
     def __init__(self):
-        self.client = ollama.Client(host=config.OLLAMA_BASE_URL)
+        self.client = ollama.Client(host=config.OLLAMA_BASE_URL, timeout=config.OLLAMA_TIMEOUT_SECONDS)
+        self.base_url = config.OLLAMA_BASE_URL
         self.model = config.OLLAMA_MODEL
+        self.max_concurrency = max(1, config.OLLAMA_MAX_CONCURRENCY)
+        self.max_queue = max(0, config.OLLAMA_MAX_QUEUE)
+        self.budget_seconds = config.EXPLANATION_BUDGET_SECONDS
+        self.in_flight = 0
+        # Distinct generations running or waiting for a concurrency slot
+        self.pending_generations = 0
+        self.degraded = {"timeout": 0, "queue_full": 0, "circuit_open": 0, "error": 0}
+        self.breaker = CircuitBreaker(
+            failure_threshold=config.OLLAMA_BREAKER_FAILURE_THRESHOLD,
+            recovery_seconds=config.OLLAMA_BREAKER_RECOVERY_SECONDS
+        )
+        self.last_probe: Optional[Dict[str, Any]] = None
+        # The async client and semaphore belong to one event loop; built lazily on first use
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_client: Optional[ollama.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        store = None
+        if config.EXPLANATION_STORE_PATH and config.EXPLANATION_CACHE_MODE != "off":
+            store = ExplanationStore(
+                config.EXPLANATION_STORE_PATH,
+                model=self.model,
+                prompt_version=PROMPT_VERSION,
+                ttl_seconds=config.EXPLANATION_STORE_TTL_SECONDS
+            )
+            print(f"Explanation store {config.EXPLANATION_STORE_PATH} for {self.model} (prompt {PROMPT_VERSION})")
+        self.explanation_cache = ExplanationCache(
+            max_entries=config.EXPLANATION_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.EXPLANATION_CACHE_TTL_SECONDS,
+            mode=config.EXPLANATION_CACHE_MODE,
+            store=store
+        )
+        # Concurrent requests for the same explanation share one generation
+        self._inflight = SingleFlight()
+        self._inflight_async = AsyncSingleFlight()
+        self.batch_size = max(1, config.OLLAMA_BATCH_SIZE)
+        self.batch_fallbacks = 0
+        self.keep_alive = self._keep_alive_value(config.OLLAMA_KEEP_ALIVE)
+        self.last_warm_up: Optional[Dict[str, Any]] = None
+    
+    @staticmethod
+    def _keep_alive_value(value: str) -> Optional[Any]:
+        """OLLAMA_KEEP_ALIVE as Ollama expects it: seconds as a number, a duration string, or None"""
+        value = value.strip()
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    
+    def _build_messages(self, email: str, reason: str, formatted_time: str, reason_explanation: str) -> List[Dict[str, str]]:
+        # The instructions are a fixed system message so Ollama can reuse its cached prefill
+        # across requests; only the short record in the user message varies
+        record = EXPLANATION_USER_PROMPT.format(
+            email=email, reason=reason, formatted_time=formatted_time, reason_explanation=reason_explanation
+        )
+        return [
+            {
+                'role': 'system',
+                'content': EXPLANATION_SYSTEM_PROMPT,
+            },
+            {
+                'role': 'user',
+                'content': record,
+            }
+        ]
+    
+    @staticmethod
+    def _clean_content(content: str) -> str:
+        """Strip thinking tags and collapse whitespace in a model reply"""
+        return ' '.join(THINK_BLOCK.sub('', content).split())
     
     def generate_human_explanation(self, email: str, reason: str, last_update_time: str, 
                                  formatted_time: str, reason_explanation: str) -> str:
         """Generate human-readable explanation using Ollama"""
-        prompt = f"""You are an email suppression status assistant. Provide a clear, concise explanation in 1-2 sentences.
-
-Email: {email}
-Status: Suppressed
-Reason: {reason}
-Last Updated: {formatted_time}
-Reason Explanation: {reason_explanation}
-
-Write a professional explanation that combines all this information into a natural, human-readable response. Do not include any additional text, headers, formatting, thinking process, or reasoning - just provide the final explanation directly."""
-
+        cached = self.explanation_cache.get(email, reason, formatted_time)
+        if cached is not None:
+            return cached
+        try:
+            return self._inflight.do(
+                (email, reason, formatted_time),
+                lambda: self._generate(email, reason, formatted_time, reason_explanation)
+            )
+        except Exception as e:
+            print(f"Error generating explanation with Ollama: {e}")
+            return self.template_explanation(email, formatted_time, reason_explanation)
+    
+    def _generate(self, email: str, reason: str, formatted_time: str, reason_explanation: str) -> str:
+        if not self.breaker.allow_request():
+            raise RuntimeError("Ollama circuit breaker is open")
         try:
-            messages = [
-                {
-                    'role': 'user',
-                    'content': prompt,
-                }
-            ]
-            
             # Use think=False to disable thinking mode for faster responses
             response = self.client.chat(
                 model=self.model,
-                messages=messages,
+                messages=self._build_messages(email, reason, formatted_time, reason_explanation),
                 stream=False,
-                think=False
+                think=False,
+                keep_alive=self.keep_alive
             )
-            
-            # Clean the response to remove any thinking tags or unwanted content
-            content = response['message']['content'].strip()
-            
-            # Remove thinking tags if they appear
-            import re
-            content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL)
-            content = re.sub(r'<thinking>.*?</thinking>', '', content, flags=re.DOTALL)
-            
-            # Clean up any extra whitespace
-            content = ' '.join(content.split())
-            
-            return content
+        except Exception as e:
+            self.breaker.record_failure(e)
+            raise
+        self.breaker.record_success()
+        content = self._clean_content(response['message']['content'])
+        self.explanation_cache.put(email, reason, formatted_time, content)
+        return content
+    
+    def _async_resources(self) -> Tuple[ollama.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._async_client = ollama.AsyncClient(host=self.base_url, timeout=config.OLLAMA_TIMEOUT_SECONDS)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._async_client, self._semaphore
+    
+    async def agenerate_human_explanation(self, email: str, reason: str, last_update_time: str,
+                                          formatted_time: str, reason_explanation: str) -> str:
+        """Event-loop friendly generate_human_explanation"""
+        result = await self.agenerate_explanation(email, reason, last_update_time, formatted_time, reason_explanation)
+        return result.text
+    
+    async def agenerate_explanation(self, email: str, reason: str, last_update_time: str, formatted_time: str,
+                                    reason_explanation: str, budget_seconds: Optional[float] = None) -> ExplanationResult:
+        """
+        Explanation for a suppressed hit within a latency budget.
+        
+        At most OLLAMA_MAX_CONCURRENCY generations run at once per worker and at most
+        OLLAMA_MAX_QUEUE more wait for a slot. A request that would exceed the queue, that
+        finds the circuit breaker open, or whose budget (EXPLANATION_BUDGET_SECONDS, or a
+        tighter budget_seconds) runs out, gets the template explanation marked degraded. A generation that outlives its
+        caller's budget keeps running and still fills the cache. budget_seconds=0 waits without
+        a budget, for callers that answered their client already.
+        """
+        cached = await self.explanation_cache.aget(email, reason, formatted_time)
+        if cached is not None:
+            return ExplanationResult(cached)
         
+        key = (email, reason, formatted_time)
+        # No await from the queue check to the slot being taken, so a burst cannot overfill it
+        if key not in self._inflight_async:
+            if self.pending_generations >= self.max_concurrency + self.max_queue:
+                return self._degraded("queue_full", email, formatted_time, reason_explanation)
+            if not self.breaker.allow_request():
+                return self._degraded("circuit_open", email, formatted_time, reason_explanation)
+        task = self._start_generation(key, lambda: self._agenerate(email, reason, formatted_time, reason_explanation))
+        
+        budget = self._effective_budget(budget_seconds)
+        try:
+            text = await asyncio.wait_for(asyncio.shield(task), timeout=budget if budget > 0 else None)
+        except asyncio.TimeoutError:
+            return self._degraded("timeout", email, formatted_time, reason_explanation)
         except Exception as e:
             print(f"Error generating explanation with Ollama: {e}")
-            # Fallback explanation
-            return f"The email address {email} is suppressed because {reason_explanation}. This suppression was last updated on {formatted_time}."
+            return self._degraded("error", email, formatted_time, reason_explanation)
+        return ExplanationResult(text)
+    
+    def _start_generation(self, key: Tuple[str, str, str], func: Callable[[], Awaitable[str]]) -> asyncio.Future:
+        """Join the generation for key, or start it holding a pending slot until it ends"""
+        task, started = self._inflight_async.start(key, func)
+        if started:
+            self.pending_generations += 1
+            task.add_done_callback(self._release_generation)
+        return task
+    
+    def _release_generation(self, task: asyncio.Future) -> None:
+        self.pending_generations -= 1
+    
+    def _effective_budget(self, budget_seconds: Optional[float]) -> float:
+        if budget_seconds is None:
+            return self.budget_seconds
+        return min(self.budget_seconds, budget_seconds) if self.budget_seconds > 0 else budget_seconds
+    
+    def _degraded(self, cause: str, email: str, formatted_time: str, reason_explanation: str) -> ExplanationResult:
+        self.degraded[cause] += 1
+        return ExplanationResult(self.template_explanation(email, formatted_time, reason_explanation), degraded=True)
+    
+    async def astream_explanation(self, email: str, reason: str, last_update_time: str, formatted_time: str,
+                                  reason_explanation: str, budget_seconds: Optional[float] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream an explanation as ("token", text) items followed by one ("done", ExplanationResult).
+        
+        Tokens are cleaned incrementally as they arrive. The same admission rules as
+        agenerate_explanation apply, with the budget covering the wait for the first model
+        chunk. The done item always carries the authoritative text: if the model fails
+        mid-stream it holds the degraded template, replacing tokens already sent.
+        """
+        cached = await self.explanation_cache.aget(email, reason, formatted_time)
+        if cached is not None:
+            yield "token", cached
+            yield "done", ExplanationResult(cached)
+            return
+        
+        loop = asyncio.get_running_loop()
+        budget = self._effective_budget(budget_seconds)
+        deadline = loop.time() + budget if budget > 0 else None
+        
+        def remaining() -> Optional[float]:
+            return None if deadline is None else max(0.0, deadline - loop.time())
+        
+        parts: List[str] = []
+        fallback: Optional[ExplanationResult] = None
+        if self.pending_generations >= self.max_concurrency + self.max_queue:
+            fallback = self._degraded("queue_full", email, formatted_time, reason_explanation)
+        else:
+            # Taken before the first await, as in agenerate_explanation
+            self.pending_generations += 1
+            client, semaphore = self._async_resources()
+            acquired = trial_open = False
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=remaining())
+                acquired = True
+                self.in_flight += 1
+                if not self.breaker.allow_request():
+                    fallback = self._degraded("circuit_open", email, formatted_time, reason_explanation)
+                else:
+                    trial_open = True
+                    stripper = ThinkTagStripper()
+                    stream = await asyncio.wait_for(client.chat(
+                        model=self.model,
+                        messages=self._build_messages(email, reason, formatted_time, reason_explanation),
+                        stream=True,
+                        think=False,
+                        keep_alive=self.keep_alive
+                    ), timeout=remaining())
+                    chunks = stream.__aiter__()
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining())
+                    while True:
+                        text = stripper.feed(chunk['message']['content'])
+                        if text:
+                            parts.append(text)
+                            yield "token", text
+                        try:
+                            chunk = await chunks.__anext__()
+                        except StopAsyncIteration:
+                            break
+                    text = stripper.flush()
+                    if text:
+                        parts.append(text)
+                        yield "token", text
+                    trial_open = False
+                    self.breaker.record_success()
+            except asyncio.TimeoutError:
+                fallback = self._degraded("timeout", email, formatted_time, reason_explanation)
+            except StopAsyncIteration:
+                trial_open = False
+                self.breaker.record_success()
+            except Exception as e:
+                print(f"Error streaming explanation from Ollama: {e}")
+                trial_open = False
+                self.breaker.record_failure(e)
+                fallback = self._degraded("error", email, formatted_time, reason_explanation)
+            finally:
+                if trial_open:
+                    # Timed out or the client went away before the model answered
+                    self.breaker.release_trial()
+                if acquired:
+                    self.in_flight -= 1
+                    semaphore.release()
+                self.pending_generations -= 1
+        
+        if fallback is not None:
+            if not parts:
+                yield "token", fallback.text
+            yield "done", fallback
+            return
+        content = "".join(parts)
+        await self.explanation_cache.aput(email, reason, formatted_time, content)
+        yield "done", ExplanationResult(content)
+    
+    async def _agenerate(self, email: str, reason: str, formatted_time: str, reason_explanation: str) -> str:
+        """One generation; run through _start_generation, which holds its pending slot"""
+        client, semaphore = self._async_resources()
+        async with semaphore:
+            self.in_flight += 1
+            try:
+                response = await client.chat(
+                    model=self.model,
+                    messages=self._build_messages(email, reason, formatted_time, reason_explanation),
+                    stream=False,
+                    think=False,
+                    keep_alive=self.keep_alive
+                )
+            except Exception as e:
+                self.breaker.record_failure(e)
+                raise
+            finally:
+                self.in_flight -= 1
+        self.breaker.record_success()
+        content = self._clean_content(response['message']['content'])
+        await self.explanation_cache.aput(email, reason, formatted_time, content)
+        return content
+    
+    def _build_batch_messages(self, items: List[Tuple[str, str, str, str, str]]) -> List[Dict[str, str]]:
+        records = [
+            {"id": index, "email": email, "reason": reason, "last_updated": formatted_time, "reason_explanation": reason_explanation}
+            for index, (email, reason, _, formatted_time, reason_explanation) in enumerate(items)
+        ]
+        return [
+            {
+                'role': 'system',
+                'content': BATCH_SYSTEM_PROMPT,
+            },
+            {
+                'role': 'user',
+                'content': f"Records:\n{json.dumps(records)}",
+            }
+        ]
+    
+    @classmethod
+    def _parse_batch_reply(cls, content: str, count: int) -> Dict[int, str]:
+        """Explanations by record id from a batched reply; malformed entries are left out"""
+        content = THINK_BLOCK.sub('', content).strip()
+        if content.startswith("```"):
+            content = content.strip("`").split("\n", 1)[-1]
+        try:
+            entries = json.loads(content).get("explanations")
+        except (ValueError, AttributeError):
+            return {}
+        parsed = {}
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            index, text = entry.get("id"), entry.get("explanation")
+            if isinstance(index, int) and 0 <= index < count and isinstance(text, str) and text.strip():
+                parsed[index] = cls._clean_content(text)
+        return parsed
+    
+    async def _agenerate_batch(self, items: List[Tuple[str, str, str, str, str]]) -> Dict[int, str]:
+        client, semaphore = self._async_resources()
+        async with semaphore:
+            self.in_flight += 1
+            try:
+                response = await client.chat(
+                    model=self.model,
+                    messages=self._build_batch_messages(items),
+                    stream=False,
+                    think=False,
+                    keep_alive=self.keep_alive,
+                    format="json"
+                )
+            except Exception as e:
+                self.breaker.record_failure(e)
+                raise
+            finally:
+                self.in_flight -= 1
+        self.breaker.record_success()
+        return self._parse_batch_reply(response['message']['content'], len(items))
+    
+    async def agenerate_batch(self, items: List[Tuple[str, str, str, str, str]],
+                              budget_seconds: Optional[float] = None) -> List[ExplanationResult]:
+        """
+        Explanations for many suppressed records, packing up to OLLAMA_BATCH_SIZE per prompt.
+        
+        ``items`` are (email, reason, last_update_time, formatted_time, reason_explanation)
+        tuples. Cached records are answered from the cache. The instructions are sent once
+        per batch instead of once per record. Records the model leaves out, answers
+        malformed or answers with text that does not name their address (a swapped or
+        mislabelled id), or a batch that fails entirely, fall back one by one to
+        agenerate_explanation. One budget, as in agenerate_explanation, covers the batched
+        prompts and the fallbacks together; budget_seconds=0 waits without one.
+        """
+        loop = asyncio.get_running_loop()
+        budget = self._effective_budget(budget_seconds)
+        deadline = loop.time() + budget if budget > 0 else None
+        
+        def remaining() -> Optional[float]:
+            return None if deadline is None else max(0.0, deadline - loop.time())
+        
+        results: List[Optional[ExplanationResult]] = [None] * len(items)
+        pending = []
+        for index, (email, reason, _, formatted_time, _) in enumerate(items):
+            cached = await self.explanation_cache.aget(email, reason, formatted_time)
+            if cached is not None:
+                results[index] = ExplanationResult(cached)
+            else:
+                pending.append(index)
+        
+        for start in range(0, len(pending), self.batch_size):
+            chunk = pending[start:start + self.batch_size]
+            parsed: Dict[int, str] = {}
+            if len(chunk) > 1 and self.breaker.allow_request():
+                self.pending_generations += 1
+                trial_open = True
+                try:
+                    parsed = await asyncio.wait_for(self._agenerate_batch([items[index] for index in chunk]),
+                                                    timeout=remaining())
+                    trial_open = False
+                except asyncio.TimeoutError:
+                    print("Batched explanations from Ollama ran out of budget")
+                except Exception as e:
+                    trial_open = False
+                    print(f"Error generating batched explanations with Ollama: {e!r}")
+                finally:
+                    if trial_open:
+                        # Timed out or cancelled before the model answered, as in astream_explanation
+                        self.breaker.release_trial()
+                    self.pending_generations -= 1
+            fallbacks = []
+            for offset, index in enumerate(chunk):
+                email, reason, _, formatted_time, _ = items[index]
+                text = parsed.get(offset)
+                # Ids are only the model's word; an explanation must at least name its own address
+                if text is not None and email.lower() in text.lower():
+                    await self.explanation_cache.aput(email, reason, formatted_time, text)
+                    results[index] = ExplanationResult(text)
+                else:
+                    fallbacks.append(index)
+            self.batch_fallbacks += len(fallbacks) if len(chunk) > 1 else 0
+            left = remaining()
+            if left == 0:
+                singles = [self._degraded("timeout", items[index][0], items[index][3], items[index][4])
+                           for index in fallbacks]
+            else:
+                singles = await asyncio.gather(*(
+                    self.agenerate_explanation(*items[index], budget_seconds=left or 0) for index in fallbacks
+                ))
+            for index, result in zip(fallbacks, singles):
+                results[index] = result
+        return results
+    
+    async def warm_explanation(self, email: str, reason: str, formatted_time: str, reason_explanation: str) -> bool:
+        """
+        Generate and cache an explanation ahead of demand, with no latency budget.
+        
+        Returns False when it was already cached (or caching is off) and True once a new
+        one is stored; model errors propagate to the caller.
+        """
+        if not self.explanation_cache.enabled or await self.explanation_cache.acontains(email, reason, formatted_time):
+            return False
+        key = (email, reason, formatted_time)
+        if key not in self._inflight_async and not self.breaker.allow_request():
+            raise RuntimeError("Ollama circuit breaker is open")
+        await asyncio.shield(self._start_generation(
+            key, lambda: self._agenerate(email, reason, formatted_time, reason_explanation)
+        ))
+        return True
+    
+    async def probe(self, timeout: float = 5.0) -> bool:
+        """Ask Ollama for its model list and feed the outcome to the circuit breaker"""
+        client, _ = self._async_resources()
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(client.list(), timeout=timeout)
+            models = [getattr(model, "model", None) for model in getattr(response, "models", None) or []]
+            self.last_probe = {"ok": True, "model_available": self.model in models, "error": None}
+        except Exception as e:
+            self.last_probe = {"ok": False, "model_available": None, "error": repr(e)}
+        self.last_probe["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        self.last_probe["at"] = time.time()
+        self.breaker.record_probe(self.last_probe["ok"])
+        return self.last_probe["ok"]
+    
+    async def warm_up(self) -> bool:
+        """
+        Load the model and prefill the system prompt so the first real request pays for neither.
+        
+        Sends one sample record asking for a single token. Failures are only logged: the
+        health probe owns the circuit breaker, and requests fall back as usual.
+        """
+        client, _ = self._async_resources()
+        start = time.perf_counter()
+        try:
+            await client.chat(
+                model=self.model,
+                messages=self._build_messages("warm-up@example.com", "BOUNCE", "January 1, 2024 at 12:00 AM UTC",
+                                              "emails consistently bounce back"),
+                stream=False,
+                think=False,
+                keep_alive=self.keep_alive,
+                options={"num_predict": 1}
+            )
+            self.last_warm_up = {"ok": True, "error": None}
+        except Exception as e:
+            print(f"Ollama warm-up failed: {e}")
+            self.last_warm_up = {"ok": False, "error": repr(e)}
+        self.last_warm_up["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        self.last_warm_up["at"] = time.time()
+        if self.last_warm_up["ok"]:
+            print(f"Ollama model {self.model} warmed up in {self.last_warm_up['duration_ms']:.0f} ms")
+        return self.last_warm_up["ok"]
+    
+    async def run_health_probe(self, interval: float) -> None:
+        """Probe Ollama every ``interval`` seconds until cancelled"""
+        while True:
+            await self.probe(timeout=min(5.0, interval))
+            await asyncio.sleep(interval)
+    
+    def health(self) -> Dict[str, Any]:
+        """Circuit breaker state and the latest health probe, for /health"""
+        return {
+            "base_url": self.base_url,
+            "model": self.model,
+            "circuit": self.breaker.stats(),
+            "last_probe": self.last_probe,
+            "keep_alive": self.keep_alive,
+            "last_warm_up": self.last_warm_up,
+            "in_flight": self.in_flight,
+            "pending_generations": self.pending_generations,
+        }
+    
+    def explanation_stats(self) -> Dict[str, Any]:
+        """Explanation cache counters plus how many requests joined an in-flight generation"""
+        stats = self.explanation_cache.stats()
+        stats["generations"] = self._inflight.leaders + self._inflight_async.leaders
+        stats["coalesced"] = self._inflight.shared + self._inflight_async.shared
+        stats["in_flight"] = self.in_flight
+        stats["pending_generations"] = self.pending_generations
+        stats["degraded"] = dict(self.degraded)
+        stats["batch_fallbacks"] = self.batch_fallbacks
+        return stats
+    
+    @staticmethod
+    def template_explanation(email: str, formatted_time: str, reason_explanation: str) -> str:
+        """Deterministic explanation used whenever the model is not consulted"""
+        return f"The email address {email} is suppressed because {reason_explanation}. This suppression was last updated on {formatted_time}."
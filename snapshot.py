@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Binary snapshots of the suppression list for near-constant-time cold starts.
+
+A snapshot is the column layout of CompactSuppressionStore written to disk. Workers
+mmap it read-only and serve lookups straight from the mapping, so start-up does not
+parse any JSON and every worker on a host shares the same page cache.
+
+Usage:
+    python snapshot.py build suppressed_emails.json suppressed_emails.snap
+    python snapshot.py info suppressed_emails.snap
+"""
+
+import argparse
+import fcntl
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import config
+from loader import IngestError, IngestReport, iter_valid_destinations, print_progress
+from stores import CompactSuppressionStore, _deep_sizeof
+
+MAGIC = b"SESSNAP1"
+FORMAT_VERSION = 1
+
+# magic, version, byte order (0 little / 1 big), row count, table size, then
+# (offset, length) pairs for each section in SECTIONS order
+SECTIONS = ("offsets", "reason_codes", "epochs", "table", "blob", "metadata")
+_HEADER = struct.Struct("<8sIIQQ" + "QQ" * len(SECTIONS))
+
+_TYPECODES = {"offsets": "Q", "reason_codes": "H", "epochs": "q", "table": "I"}
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, truncated or incompatible"""
+
+
+def _align(value: int, alignment: int = 8) -> int:
+    return (value + alignment - 1) & ~(alignment - 1)
+
+
+def write_snapshot(store: CompactSuppressionStore, path: str) -> None:
+    """Write ``store`` to ``path`` atomically, so running workers keep their old mapping"""
+    metadata = json.dumps({
+        "reasons": store._reason_names,
+        "original_addresses": store._original_addresses,
+        "original_times": store._original_times,
+        "created_at": int(time.time()),
+    }).encode("utf-8")
+    payloads = {
+        "offsets": store._offsets.tobytes(),
+        "reason_codes": store._reason_codes.tobytes(),
+        "epochs": store._epochs.tobytes(),
+        "table": store._table.tobytes(),
+        "blob": bytes(store._blob),
+        "metadata": metadata,
+    }
+
+    layout: List[Tuple[int, int]] = []
+    position = _align(_HEADER.size)
+    for name in SECTIONS:
+        layout.append((position, len(payloads[name])))
+        position = _align(position + len(payloads[name]))
+
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0 if sys.byteorder == "little" else 1,
+        len(store), len(store._table),
+        *[value for section in layout for value in section]
+    )
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(header)
+            for name, (offset, length) in zip(SECTIONS, layout):
+                file.write(b"\0" * (offset - file.tell()))
+                file.write(payloads[name])
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def build_snapshot(json_path: str, snapshot_path: str, progress_every: int = 1_000_000,
+                   max_invalid: int = 0) -> int:
+    """
+    Compile an SES JSON export into a snapshot; returns the number of entries.
+
+    Rows are validated like a service load: more than ``max_invalid`` malformed rows
+    raise IngestError and no snapshot is written.
+    """
+    store = CompactSuppressionStore()
+    report = IngestReport(json_path)
+    for email_address, reason, last_update_time, epoch in iter_valid_destinations(
+        json_path, report, max_invalid=max_invalid, progress=print_progress, progress_every=progress_every
+    ):
+        store.add(email_address.lower(), email_address, reason, last_update_time, epoch)
+    if report.invalid:
+        print(f"Skipped {report.summary()}")
+    write_snapshot(store, snapshot_path)
+    return len(store)
+
+
+def snapshot_is_stale(json_path: str, snapshot_path: str) -> bool:
+    """True when the JSON export was modified after the snapshot was built"""
+    return os.path.exists(json_path) and os.path.getmtime(json_path) > os.path.getmtime(snapshot_path)
+
+
+def refresh_snapshot(json_path: str, snapshot_path: str, progress_every: int = 1_000_000,
+                     max_invalid: int = 0) -> bool:
+    """
+    Rebuild ``snapshot_path`` if it is missing or older than ``json_path``; returns True if
+    it was rebuilt.
+
+    The check and the build run under an exclusive lock on ``<snapshot_path>.lock``, so
+    when several processes notice the same new export, one of them rebuilds and the
+    others wait and then find the snapshot current. A failed build raises and leaves the
+    old snapshot in place.
+    """
+    with open(snapshot_path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(snapshot_path) and not snapshot_is_stale(json_path, snapshot_path):
+            return False
+        started = time.perf_counter()
+        rows = build_snapshot(json_path, snapshot_path, progress_every=progress_every, max_invalid=max_invalid)
+        print(f"Built snapshot {snapshot_path}: {rows:,} entries in {time.perf_counter() - started:.2f}s")
+        return True
+
+
+class SnapshotSuppressionStore(CompactSuppressionStore):
+    """Read-only CompactSuppressionStore whose columns are views into an mmapped snapshot"""
+
+    backend = "snapshot"
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "rb") as file:
+                self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot map snapshot {path}: {e}")
+
+        try:
+            if len(self._mmap) < _HEADER.size:
+                raise SnapshotError(f"Snapshot {path} is truncated")
+            magic, version, byte_order, rows, table_size, *positions = _HEADER.unpack_from(self._mmap)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise SnapshotError(f"{path} is not a version {FORMAT_VERSION} suppression snapshot")
+            if byte_order != (0 if sys.byteorder == "little" else 1):
+                raise SnapshotError(f"Snapshot {path} was built on a machine with a different byte order")
+            if any(offset + length > len(self._mmap) for offset, length in zip(positions[0::2], positions[1::2])):
+                raise SnapshotError(f"Snapshot {path} is truncated")
+        except (SnapshotError, struct.error):
+            self._mmap.close()
+            raise
+
+        view = memoryview(self._mmap)
+        sections: Dict[str, memoryview] = {}
+        for index, name in enumerate(SECTIONS):
+            offset, length = positions[2 * index], positions[2 * index + 1]
+            section = view[offset:offset + length]
+            sections[name] = section.cast(_TYPECODES[name]) if name in _TYPECODES else section
+
+        metadata_view = sections.pop("metadata")
+        metadata = json.loads(bytes(metadata_view))
+        metadata_view.release()
+        self._offsets = sections["offsets"]
+        self._reason_codes = sections["reason_codes"]
+        self._epochs = sections["epochs"]
+        self._table = sections["table"]
+        self._blob = sections["blob"]
+        self._mask = table_size - 1
+        self._reason_names = metadata["reasons"]
+        self._reason_lookup = {name: code for code, name in enumerate(self._reason_names)}
+        self._original_addresses = {int(row): value for row, value in metadata["original_addresses"].items()}
+        self._original_times = {int(row): value for row, value in metadata["original_times"].items()}
+        self.created_at: int = metadata["created_at"]
+        self._views = [view, *sections.values()]
+
+    def add(self, key: str, email_address: str, reason: str, last_update_time: str,
+            last_update_epoch: Optional[int] = None) -> bool:
+        raise TypeError("Snapshot stores are read-only; rebuild the snapshot instead")
+
+    def memory_footprint(self) -> int:
+        # The mapped columns live in the shared page cache rather than this process's heap
+        return len(self._mmap) + _deep_sizeof(self._original_addresses) + _deep_sizeof(self._original_times)
+
+    def close(self) -> None:
+        """Release the memory views and unmap the file"""
+        for view in getattr(self, "_views", []):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+
+def open_snapshot(path: str) -> Optional[SnapshotSuppressionStore]:
+    """Map ``path`` if it exists, or return None"""
+    if not path or not os.path.exists(path):
+        return None
+    return SnapshotSuppressionStore(path)
+
+
+def _info(path: str) -> Dict[str, Any]:
+    store = SnapshotSuppressionStore(path)
+    try:
+        return {
+            "path": path,
+            "entries": len(store),
+            "reasons": store._reason_names,
+            "bytes": os.path.getsize(path),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(store.created_at)),
+        }
+    finally:
+        store.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile a JSON export into a snapshot")
+    build.add_argument("json_path")
+    build.add_argument("snapshot_path")
+    build.add_argument("--max-invalid", type=int, default=config.SUPPRESSION_MAX_INVALID_ROWS,
+                       help="malformed rows to skip before giving up (default: SUPPRESSION_MAX_INVALID_ROWS)")
+    info = commands.add_parser("info", help="describe an existing snapshot")
+    info.add_argument("snapshot_path")
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        try:
+            count = build_snapshot(args.json_path, args.snapshot_path, max_invalid=args.max_invalid)
+        except IngestError as e:
+            print(f"Not writing {args.snapshot_path}: {e}", file=sys.stderr)
+            for error in e.report.errors:
+                print(f"  row {error['index']} ({error['email']!r}): {error['error']}", file=sys.stderr)
+            return 1
+        print(f"Wrote {count:,} suppressed emails to {args.snapshot_path} in {time.perf_counter() - start:.1f}s")
+    else:
+        print(json.dumps(_info(args.snapshot_path), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,434 @@
+import calendar
+import sys
+import time
+import zlib
+from array import array
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from dateutil import parser
+from pydantic import Field
+
+from models import SuppressionInfo
+
+# Epoch stored for timestamps that cannot be parsed; the original string is kept verbatim
+INVALID_EPOCH = -(1 << 63)
+
+CANONICAL_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# How timestamps are shown in explanations, e.g. "January 15, 2024 at 10:30 AM UTC"
+HUMAN_TIME_FORMAT = "%B %d, %Y at %I:%M %p UTC"
+
+REASON_EXPLANATIONS = {
+    "COMPLAINT": "the recipient marked emails from this sender as spam or complained about receiving them",
+    "BOUNCE": "emails to this address consistently bounce back, indicating the email address may be invalid or the mailbox is full",
+    "UNSUBSCRIBE": "the recipient has unsubscribed from receiving emails",
+    "REPUTATION": "the sender's reputation has been negatively affected due to poor email practices"
+}
+
+
+@lru_cache(maxsize=8192)
+def _day_epoch(day: str) -> int:
+    """Epoch of midnight UTC on a YYYY-MM-DD date; raises ValueError for dates that do not exist"""
+    return calendar.timegm(date(int(day[0:4]), int(day[5:7]), int(day[8:10])).timetuple())
+
+
+def parse_epoch(value: str) -> int:
+    """Parse an ISO-8601 timestamp into integer seconds since the epoch (UTC)"""
+    # Fast path for the canonical SES format, e.g. 2024-01-15T10:30:00Z; exports span
+    # relatively few distinct days, so the date part is converted once per day
+    if len(value) == 20 and value[4] == "-" and value[10] == "T" and value[19] == "Z":
+        try:
+            hour, minute, second = int(value[11:13]), int(value[14:16]), int(value[17:19])
+            if 0 <= hour < 24 and 0 <= minute < 60 and 0 <= second < 61:
+                return _day_epoch(value[:10]) + hour * 3600 + minute * 60 + second
+        except ValueError:
+            pass
+    dt = parser.isoparse(value)
+    if dt.tzinfo is None:
+        return calendar.timegm(dt.timetuple())
+    return int(dt.timestamp())
+
+
+def format_epoch(epoch: int) -> str:
+    """Format epoch seconds in the canonical SES timestamp format"""
+    return time.strftime(CANONICAL_TIME_FORMAT, time.gmtime(epoch))
+
+
+@lru_cache(maxsize=65536)
+def _format_human_minute(minute: int) -> str:
+    return time.strftime(HUMAN_TIME_FORMAT, time.gmtime(minute))
+
+
+def format_human(epoch: int) -> str:
+    """Format epoch seconds for explanations; memoized per distinct minute, the format's resolution"""
+    return _format_human_minute(epoch - epoch % 60)
+
+
+@lru_cache(maxsize=1024)
+def reason_explanation(reason: str) -> str:
+    """Human-readable meaning of a suppression reason, computed once per distinct reason"""
+    explanation = REASON_EXPLANATIONS.get(reason.upper())
+    return explanation if explanation is not None else f"the email was suppressed due to {reason.lower()}"
+
+
+class SuppressionRecord(SuppressionInfo):
+    """
+    A loaded suppression entry whose timestamp was parsed once, at ingest.
+
+    ``last_update_epoch`` is excluded from serialization, so records dump exactly like
+    SuppressionInfo; the display strings explanations need are derived from it without
+    parsing anything on the request path.
+    """
+
+    last_update_epoch: int = Field(INVALID_EPOCH, exclude=True)
+
+    @classmethod
+    def parse(cls, email_address: str, reason: str, last_update_time: str) -> "SuppressionRecord":
+        """Build a record, keeping INVALID_EPOCH for a timestamp that does not parse"""
+        try:
+            epoch = parse_epoch(last_update_time)
+        except (ValueError, OverflowError):
+            epoch = INVALID_EPOCH
+        return cls(email_address=email_address, reason=reason, last_update_time=last_update_time,
+                   last_update_epoch=epoch)
+
+    @property
+    def formatted_time(self) -> str:
+        if self.last_update_epoch == INVALID_EPOCH:
+            return self.last_update_time
+        return format_human(self.last_update_epoch)
+
+    @property
+    def reason_explanation(self) -> str:
+        return reason_explanation(self.reason)
+
+    @property
+    def matched_rule(self) -> Optional[str]:
+        """Domain rule this record stands for; None for an entry of the address itself"""
+        return None
+
+
+def _deep_sizeof(obj, seen=None) -> int:
+    """Approximate recursive size of ``obj`` in bytes"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += _deep_sizeof(vars(obj), seen)
+    return size
+
+
+class SuppressionStore:
+    """Interface for the in-memory structures backing SuppressionService lookups"""
+
+    backend = "abstract"
+
+    def add(self, key: str, email_address: str, reason: str, last_update_time: str,
+            last_update_epoch: Optional[int] = None) -> bool:
+        """
+        Insert an entry under the normalized ``key``; returns False if the key already exists.
+
+        Pass ``last_update_epoch`` when the caller has already parsed the timestamp.
+        """
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[SuppressionRecord]:
+        """Return the entry stored under the normalized ``key``"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __iter__(self) -> Iterator[SuppressionRecord]:
+        raise NotImplementedError
+
+    def iter_keys(self) -> Iterator[str]:
+        """Yield the normalized keys in insertion order"""
+        raise NotImplementedError
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def index_columns(self) -> Tuple[Sequence[int], List[str], Sequence[int]]:
+        """Per-row reason codes, the reason names they number, and per-row epochs, in insertion order"""
+        raise NotImplementedError
+
+    def record_at(self, row: int) -> SuppressionRecord:
+        """The entry at insertion-order ``row``, as numbered by ``index_columns``"""
+        raise NotImplementedError
+
+    def matches(self, key: str, email_address: str, reason: str, last_update_time: str,
+                last_update_epoch: Optional[int] = None) -> Optional[bool]:
+        """None if ``key`` is absent, else whether the stored entry equals the given fields"""
+        info = self.get(key)
+        if info is None:
+            return None
+        return (info.email_address, info.reason, info.last_update_time) == (email_address, reason, last_update_time)
+
+    def memory_footprint(self) -> int:
+        """Approximate number of bytes held by the store"""
+        raise NotImplementedError
+
+
+class DictSuppressionStore(SuppressionStore):
+    """One SuppressionRecord per address in a dict; fastest lookups, largest footprint"""
+
+    backend = "dict"
+
+    def __init__(self):
+        self._entries: Dict[str, SuppressionRecord] = {}
+        # Keys by insertion order; built by index_columns for record_at
+        self._row_keys: List[str] = []
+
+    def add(self, key: str, email_address: str, reason: str, last_update_time: str,
+            last_update_epoch: Optional[int] = None) -> bool:
+        if key in self._entries:
+            return False
+        if last_update_epoch is None:
+            self._entries[key] = SuppressionRecord.parse(email_address, reason, last_update_time)
+        else:
+            self._entries[key] = SuppressionRecord(
+                email_address=email_address,
+                reason=reason,
+                last_update_time=last_update_time,
+                last_update_epoch=last_update_epoch
+            )
+        return True
+
+    def add_existing(self, key: str, info: SuppressionRecord) -> bool:
+        """Insert an already-built entry, e.g. one carried over unchanged from a previous store"""
+        if key in self._entries:
+            return False
+        self._entries[key] = info
+        return True
+
+    def get(self, key: str) -> Optional[SuppressionRecord]:
+        return self._entries.get(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[SuppressionRecord]:
+        return iter(self._entries.values())
+
+    def iter_keys(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def index_columns(self) -> Tuple[Sequence[int], List[str], Sequence[int]]:
+        names: List[str] = []
+        lookup: Dict[str, int] = {}
+        reason_codes = array("H")
+        epochs = array("q")
+        for info in self._entries.values():
+            code = lookup.get(info.reason)
+            if code is None:
+                code = lookup[info.reason] = len(names)
+                names.append(info.reason)
+            reason_codes.append(code)
+            epochs.append(info.last_update_epoch)
+        self._row_keys = list(self._entries)
+        return reason_codes, names, epochs
+
+    def record_at(self, row: int) -> SuppressionRecord:
+        return self._entries[self._row_keys[row]]
+
+    def memory_footprint(self) -> int:
+        return _deep_sizeof(self._entries) + sys.getsizeof(self._row_keys)
+
+
+class CompactSuppressionStore(SuppressionStore):
+    """
+    Columnar store: normalized addresses packed into one buffer, reason codes interned,
+    timestamps as integer epochs, and an open-addressing hash table of row numbers.
+    SuppressionRecord objects are only built for hits.
+    """
+
+    backend = "compact"
+
+    _MAX_LOAD_NUMERATOR = 7
+    _MAX_LOAD_DENOMINATOR = 10
+
+    def __init__(self, initial_capacity: int = 1024):
+        self._blob = bytearray()
+        self._offsets = array("Q", [0])
+        self._reason_codes = array("H")
+        self._epochs = array("q")
+        self._reason_names: List[str] = []
+        self._reason_lookup: Dict[str, int] = {}
+        # Rows whose original address or timestamp does not round-trip from the packed form
+        self._original_addresses: Dict[int, str] = {}
+        self._original_times: Dict[int, str] = {}
+        size = 1
+        while size < initial_capacity:
+            size <<= 1
+        self._table = array("I", bytes(4 * size))
+        self._mask = size - 1
+
+    @staticmethod
+    def _encode(key: str) -> bytes:
+        return key.encode("utf-8", "surrogatepass")
+
+    def _probe(self, key: bytes) -> int:
+        """Return the slot holding ``key``, or the empty slot where it would be inserted"""
+        table = self._table
+        offsets = self._offsets
+        blob = self._blob
+        mask = self._mask
+        length = len(key)
+        slot = zlib.crc32(key) & mask
+        while True:
+            row = table[slot]
+            if not row:
+                return slot
+            row -= 1
+            start = offsets[row]
+            if offsets[row + 1] - start == length and blob[start:start + length] == key:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _find_row(self, key: bytes) -> int:
+        """Return the row for ``key``, or -1"""
+        return self._table[self._probe(key)] - 1
+
+    def _grow(self) -> None:
+        size = len(self._table) * 2
+        table = array("I", bytes(4 * size))
+        mask = size - 1
+        offsets = self._offsets
+        blob = self._blob
+        for row in range(len(self)):
+            slot = zlib.crc32(blob[offsets[row]:offsets[row + 1]]) & mask
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = row + 1
+        self._table = table
+        self._mask = mask
+
+    def _intern_reason(self, reason: str) -> int:
+        code = self._reason_lookup.get(reason)
+        if code is None:
+            code = len(self._reason_names)
+            self._reason_names.append(reason)
+            self._reason_lookup[reason] = code
+        return code
+
+    def add(self, key: str, email_address: str, reason: str, last_update_time: str,
+            last_update_epoch: Optional[int] = None) -> bool:
+        if not (isinstance(email_address, str) and isinstance(reason, str) and isinstance(last_update_time, str)):
+            raise TypeError("email_address, reason and last_update_time must be strings")
+        row = len(self)
+        if (row + 1) * self._MAX_LOAD_DENOMINATOR > len(self._table) * self._MAX_LOAD_NUMERATOR:
+            self._grow()
+        encoded = self._encode(key)
+        slot = self._probe(encoded)
+        if self._table[slot]:
+            return False
+
+        try:
+            epoch = parse_epoch(last_update_time) if last_update_epoch is None else last_update_epoch
+            if format_epoch(epoch) != last_update_time:
+                self._original_times[row] = last_update_time
+        except (ValueError, OverflowError):
+            epoch = INVALID_EPOCH
+            self._original_times[row] = last_update_time
+        if email_address != key:
+            self._original_addresses[row] = email_address
+
+        self._blob += encoded
+        self._offsets.append(len(self._blob))
+        self._reason_codes.append(self._intern_reason(reason))
+        self._epochs.append(epoch)
+        self._table[slot] = row + 1
+        return True
+
+    def _materialize(self, row: int) -> SuppressionRecord:
+        email_address = self._original_addresses.get(row)
+        if email_address is None:
+            email_address = str(self._blob[self._offsets[row]:self._offsets[row + 1]], "utf-8", "surrogatepass")
+        epoch = self._epochs[row]
+        last_update_time = self._original_times.get(row)
+        if last_update_time is None:
+            last_update_time = format_epoch(epoch)
+        return SuppressionRecord(
+            email_address=email_address,
+            reason=self._reason_names[self._reason_codes[row]],
+            last_update_time=last_update_time,
+            last_update_epoch=epoch
+        )
+
+    def get(self, key: str) -> Optional[SuppressionRecord]:
+        row = self._find_row(self._encode(key))
+        return self._materialize(row) if row >= 0 else None
+
+    def __contains__(self, key: str) -> bool:
+        return self._find_row(self._encode(key)) >= 0
+
+    def matches(self, key: str, email_address: str, reason: str, last_update_time: str,
+                last_update_epoch: Optional[int] = None) -> Optional[bool]:
+        """Compares the packed columns directly; a reload diff must not build a record per row"""
+        row = self._find_row(self._encode(key))
+        if row < 0:
+            return None
+        if self._reason_names[self._reason_codes[row]] != reason:
+            return False
+        if self._original_addresses.get(row, key) != email_address:
+            return False
+        original_time = self._original_times.get(row)
+        if original_time is not None:
+            return original_time == last_update_time
+        epoch = self._epochs[row]
+        if last_update_epoch is not None and last_update_epoch != epoch:
+            return False
+        return format_epoch(epoch) == last_update_time
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def index_columns(self) -> Tuple[Sequence[int], List[str], Sequence[int]]:
+        return self._reason_codes, self._reason_names, self._epochs
+
+    def record_at(self, row: int) -> SuppressionRecord:
+        return self._materialize(row)
+
+    def __iter__(self) -> Iterator[SuppressionRecord]:
+        for row in range(len(self)):
+            yield self._materialize(row)
+
+    def iter_keys(self) -> Iterator[str]:
+        offsets = self._offsets
+        blob = self._blob
+        for row in range(len(self)):
+            yield str(blob[offsets[row]:offsets[row + 1]], "utf-8", "surrogatepass")
+
+    def memory_footprint(self) -> int:
+        size = sys.getsizeof(self._blob)
+        for column in (self._offsets, self._reason_codes, self._epochs, self._table):
+            size += sys.getsizeof(column)
+        size += _deep_sizeof(self._reason_names) + _deep_sizeof(self._reason_lookup)
+        size += _deep_sizeof(self._original_addresses) + _deep_sizeof(self._original_times)
+        return size
+
+
+STORE_BACKENDS = {
+    DictSuppressionStore.backend: DictSuppressionStore,
+    CompactSuppressionStore.backend: CompactSuppressionStore,
+}
+
+
+def create_store(backend: str) -> SuppressionStore:
+    """Instantiate the suppression store registered under ``backend``"""
+    try:
+        return STORE_BACKENDS[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown suppression store backend: {backend!r} (expected one of {sorted(STORE_BACKENDS)})")
@@ -0,0 +1,84 @@
+import json
+import re
+from typing import Any, List, Optional
+
+_THINK_TAGS = (("<think>", "</think>"), ("<thinking>", "</thinking>"))
+_WHITESPACE = re.compile(r"(\s+)")
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Encode one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class ThinkTagStripper:
+    """
+    Incremental version of OllamaService._clean_content for streamed replies.
+
+    ``feed`` takes raw chunks and returns the text that is safe to show so far: thinking
+    blocks are dropped even when their tags are split across chunks, and whitespace is
+    collapsed to single spaces with nothing leading or trailing. Concatenating every
+    ``feed`` result and ``flush`` gives the same text as cleaning the whole reply at once;
+    in both, a thinking block that is never closed hides the rest of the reply.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._closing_tag: Optional[str] = None
+        self._pending_space = False
+        self._emitted = False
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        visible: List[str] = []
+        while self._buffer:
+            if self._closing_tag is not None:
+                end = self._buffer.find(self._closing_tag)
+                if end < 0:
+                    # Only a tail that could begin the closing tag needs to be kept
+                    self._buffer = self._buffer[-(len(self._closing_tag) - 1):]
+                    break
+                self._buffer = self._buffer[end + len(self._closing_tag):]
+                self._closing_tag = None
+                continue
+            start = self._buffer.find("<")
+            if start < 0:
+                visible.append(self._buffer)
+                self._buffer = ""
+                break
+            visible.append(self._buffer[:start])
+            self._buffer = self._buffer[start:]
+            for open_tag, close_tag in _THINK_TAGS:
+                if self._buffer.startswith(open_tag):
+                    self._buffer = self._buffer[len(open_tag):]
+                    self._closing_tag = close_tag
+                    break
+            else:
+                if any(open_tag.startswith(self._buffer) for open_tag, _ in _THINK_TAGS):
+                    # Could still become an opening tag; wait for the next chunk
+                    break
+                visible.append("<")
+                self._buffer = self._buffer[1:]
+        return self._collapse_whitespace("".join(visible))
+
+    def flush(self) -> str:
+        """Text still held back at the end of the stream (an unclosed thinking block is dropped)"""
+        remainder = "" if self._closing_tag is not None else self._buffer
+        self._buffer = ""
+        self._closing_tag = None
+        return self._collapse_whitespace(remainder)
+
+    def _collapse_whitespace(self, text: str) -> str:
+        out: List[str] = []
+        for piece in _WHITESPACE.split(text):
+            if not piece:
+                continue
+            if piece.isspace():
+                self._pending_space = self._emitted
+                continue
+            if self._pending_space:
+                out.append(" ")
+                self._pending_space = False
+            out.append(piece)
+            self._emitted = True
+        return "".join(out)
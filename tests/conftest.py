@@ -71,3 +71,93 @@ def suppression_service_with_test_data(temp_json_file):
     with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file):
         service = SuppressionService()
         return service
+
+@pytest.fixture
+def fake_ollama_server():
+    """
+    Local stand-in for the Ollama HTTP API; set ``server.healthy`` to simulate outages, ``server.reply`` for content.
+
+    Every POST body is recorded in ``server.payloads``, so other paths double as a webhook receiver.
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        disable_nagle_algorithm = True
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self.server.requests.append(("GET", self.path))
+            if not self.server.healthy:
+                return self._reply(503, {"error": "unavailable"})
+            self._reply(200, {"models": [{"model": config.OLLAMA_MODEL, "name": config.OLLAMA_MODEL}]})
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            self.server.requests.append(("POST", self.path))
+            self.server.payloads.append(request)
+            if not self.server.healthy:
+                return self._reply(500, {"error": "model crashed"})
+            if request.get("format") == "json":
+                # Batched prompt: answer every record except those in ``server.drop_ids``; ids in
+                # ``server.mislabel`` get the explanation written for the record they map to
+                records = json.loads(request["messages"][-1]["content"].split("Records:\n", 1)[1])
+                self.server.batch_sizes.append(len(records))
+                explanations = [
+                    {"id": record["id"],
+                     "explanation": f"Batch explanation for {records[self.server.mislabel.get(record['id'], record['id'])]['email']}."}
+                    for record in records if record["id"] not in self.server.drop_ids
+                ]
+                content = json.dumps({"explanations": explanations})
+                return self._reply(200, {
+                    "model": request["model"],
+                    "created_at": "2024-01-15T10:30:00Z",
+                    "message": {"role": "assistant", "content": content},
+                    "done": True
+                })
+            if not request.get("stream", True):
+                return self._reply(200, {
+                    "model": request["model"],
+                    "created_at": "2024-01-15T10:30:00Z",
+                    "message": {"role": "assistant", "content": self.server.reply},
+                    "done": True
+                })
+            # Streamed replies go out as NDJSON chunks of a few characters each
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            reply = self.server.reply
+            for i in range(0, len(reply), 5):
+                chunk = {"model": request["model"], "created_at": "2024-01-15T10:30:00Z",
+                         "message": {"role": "assistant", "content": reply[i:i + 5]}, "done": False}
+                self.wfile.write(json.dumps(chunk).encode() + b"\n")
+                self.wfile.flush()
+            done = {"model": request["model"], "created_at": "2024-01-15T10:30:00Z",
+                    "message": {"role": "assistant", "content": ""}, "done": True}
+            self.wfile.write(json.dumps(done).encode() + b"\n")
+            self.close_connection = True
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.healthy = True
+    server.reply = "Fake model explanation"
+    server.requests = []
+    server.payloads = []
+    server.batch_sizes = []
+    server.drop_ids = set()
+    server.mislabel = {}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
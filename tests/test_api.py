@@ -1,9 +1,24 @@
+import asyncio
+import json
+import os
 import pytest
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock
 from fastapi.testclient import TestClient
 
+import main
+from config import config
 from main import app
-from models import SuppressionInfo
+from services import ExplanationResult
+from stores import SuppressionRecord
+
+
+def parse_events(body):
+    """Split a server-sent-events body into (event, data) pairs"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
 
 
 class TestAPIEndpoints:
@@ -25,20 +40,123 @@ class TestAPIEndpoints:
         assert data["status"] == "healthy"
         assert data["service"] == "suppressed-email-checker"
     
+    def test_health_endpoint_reports_open_circuit(self, client):
+        """Test that an open Ollama circuit shows up as degraded health"""
+        from main import ollama_service
+        with patch.object(ollama_service.breaker, '_state', 'open'), \
+             patch.object(ollama_service.breaker, '_opened_at', float('inf')):
+            response = client.get("/health")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "degraded"
+        assert data["ollama"]["circuit"]["state"] == "open"
+    
+    def test_dataset_info_endpoint(self, client, suppression_service_with_test_data):
+        """Test the dataset version endpoint"""
+        with patch('main.suppression_service', suppression_service_with_test_data):
+            response = client.get("/admin/dataset")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["version"] == 1
+        assert data["entries"] == 4
+        assert "load_duration_seconds" in data
+        assert data["worker_pid"] == os.getpid()
+    
+    def test_explanation_cache_endpoint(self, client):
+        """Test that cache counters are exposed"""
+        response = client.get("/admin/explanation-cache")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert {"mode", "entries", "hits", "misses", "hit_ratio"} <= set(data)
+    
+    def test_explanation_cache_stats_run_off_the_event_loop(self, client):
+        """Test that the stats, which count the persistent store's rows, are gathered on a worker thread"""
+        on_loop = []
+        stats = main.ollama_service.explanation_stats
+        
+        def record():
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return stats()
+        
+        with patch.object(main.ollama_service, 'explanation_stats', record):
+            response = client.get("/admin/explanation-cache")
+        
+        assert response.status_code == 200
+        assert on_loop == [False]
+    
+    def test_explanation_store_purge(self, client, tmp_path):
+        """Test that stale persisted explanations are only purged on request"""
+        from explanation_store import ExplanationStore
+        path = str(tmp_path / "explanations.db")
+        ExplanationStore(path, model="old", prompt_version="v0").put(("exact", "a@example.com"), "old")
+        store = ExplanationStore(path, model="new", prompt_version="v1")
+        with patch.object(main.ollama_service.explanation_cache, 'store', store):
+            response = client.post("/admin/explanation-store/purge")
+        
+        assert response.status_code == 200
+        assert response.json() == {"purged": 1, "model": "new", "prompt_version": "v1"}
+        with patch.object(main.ollama_service.explanation_cache, 'store', None):
+            assert client.post("/admin/explanation-store/purge").status_code == 404
+    
+    def test_warmer_endpoints(self, client, suppression_service_with_test_data):
+        """Test warmer status and controls"""
+        from main import ollama_service
+        from warmer import ExplanationWarmer
+        warmer = ExplanationWarmer(suppression_service_with_test_data, ollama_service)
+        with patch('main.warmer', warmer):
+            status = client.get("/admin/warmer").json()
+            paused = client.post("/admin/warmer/pause?rate=2.5&priority=hot").json()
+            unknown = client.post("/admin/warmer/explode")
+            invalid = client.post("/admin/warmer/resume?priority=random")
+        
+        assert status["state"] == "stopped"
+        assert (paused["rate_per_second"], paused["priority"]) == (2.5, "hot")
+        assert unknown.status_code == 404
+        assert invalid.status_code == 422
+    
+    def test_reload_endpoint_wait(self, client, suppression_service_with_test_data, temp_json_file):
+        """Test a synchronous forced reload through the API"""
+        with patch('main.suppression_service', suppression_service_with_test_data), \
+             patch('config.config.SUPPRESSED_EMAILS_JSON_PATH', temp_json_file):
+            response = client.post("/admin/reload?force=true&wait=true")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["reloaded"] is True
+        assert data["dataset"]["version"] == 2
+    
+    def test_reload_endpoint_background(self, client):
+        """Test that a background reload is accepted immediately"""
+        with patch('main.suppression_service') as mock_service:
+            mock_service.reload_in_background.return_value = True
+            mock_service.dataset_info.return_value = {"version": 1}
+            response = client.post("/admin/reload")
+        
+        assert response.status_code == 202
+        assert response.json() == {"started": True, "dataset": {"version": 1}}
+        mock_service.reload_in_background.assert_called_once_with(False)
+    
     @patch('main.suppression_service')
     @patch('main.ollama_service')
     def test_check_email_suppressed(self, mock_ollama_service, mock_suppression_service, client):
         """Test checking a suppressed email"""
         # Setup mocks
-        suppression_info = SuppressionInfo(
+        suppression_info = SuppressionRecord.parse(
             email_address="test@example.com",
             reason="COMPLAINT",
             last_update_time="2024-01-15T10:30:00Z"
         )
         mock_suppression_service.check_email_suppression.return_value = suppression_info
-        mock_suppression_service._format_datetime_human_readable.return_value = "January 15, 2024 at 10:30 AM UTC"
-        mock_suppression_service._get_reason_explanation.return_value = "recipient marked emails as spam"
-        mock_ollama_service.generate_human_explanation.return_value = "The email test@example.com is suppressed due to complaints."
+        mock_ollama_service.agenerate_explanation = AsyncMock(
+            return_value=ExplanationResult("The email test@example.com is suppressed due to complaints.")
+        )
         
         response = client.post(
             "/check-email",
@@ -52,6 +170,24 @@ class TestAPIEndpoints:
         assert data["reason"] == "COMPLAINT"
         assert data["last_update_time"] == "2024-01-15T10:30:00Z"
         assert data["human_readable_explanation"] == "The email test@example.com is suppressed due to complaints."
+        assert data["explanation_degraded"] is False
+    
+    @patch('main.suppression_service')
+    @patch('main.ollama_service')
+    def test_check_email_degraded_explanation(self, mock_ollama_service, mock_suppression_service, client):
+        """Test that a template fallback is flagged and the request budget is passed through"""
+        mock_suppression_service.check_email_suppression.return_value = SuppressionRecord.parse(
+            email_address="test@example.com",
+            reason="BOUNCE",
+            last_update_time="2024-01-15T10:30:00Z"
+        )
+        mock_ollama_service.agenerate_explanation = AsyncMock(return_value=ExplanationResult("Template text", degraded=True))
+        
+        response = client.post("/check-email", json={"email": "test@example.com", "explanation_budget_ms": 250})
+        
+        assert response.status_code == 200
+        assert response.json()["explanation_degraded"] is True
+        assert mock_ollama_service.agenerate_explanation.call_args[1]["budget_seconds"] == 0.25
     
     @patch('main.suppression_service')
     def test_check_email_not_suppressed(self, mock_suppression_service, client):
@@ -136,15 +272,13 @@ class TestAPIEndpoints:
         reasons = ["COMPLAINT", "BOUNCE", "UNSUBSCRIBE", "REPUTATION"]
         
         for reason in reasons:
-            suppression_info = SuppressionInfo(
+            suppression_info = SuppressionRecord.parse(
                 email_address=f"test.{reason.lower()}@example.com",
                 reason=reason,
                 last_update_time="2024-01-15T10:30:00Z"
             )
             mock_suppression_service.check_email_suppression.return_value = suppression_info
-            mock_suppression_service._format_datetime_human_readable.return_value = "January 15, 2024 at 10:30 AM UTC"
-            mock_suppression_service._get_reason_explanation.return_value = f"test explanation for {reason}"
-            mock_ollama_service.generate_human_explanation.return_value = f"AI explanation for {reason}"
+            mock_ollama_service.agenerate_explanation = AsyncMock(return_value=ExplanationResult(f"AI explanation for {reason}"))
             
             response = client.post(
                 "/check-email",
@@ -189,6 +323,387 @@ class TestAPIEndpoints:
         assert response.status_code == 422
 
 
+class TestDomainRuleMatches:
+    """Test cases for addresses suppressed by domain rules"""
+    
+    def test_check_email_reports_matched_rule(self, client, temp_json_file, tmp_path):
+        """Test that rule hits name the rule and exact hits do not"""
+        from services import SuppressionService
+        rules = tmp_path / "rules.txt"
+        rules.write_text("*@olddomain.net BOUNCE 2024-04-01T00:00:00Z\n")
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file), \
+             patch.object(config, 'SUPPRESSION_DOMAIN_RULES_PATH', str(rules)):
+            service = SuppressionService()
+        with patch('main.suppression_service', service):
+            rule_hit = client.post("/check-email", json={"email": "Anyone@OldDomain.net", "explanation_mode": "none"})
+            exact_hit = client.post("/check-email", json={"email": "test.bounce@example.com", "explanation_mode": "none"})
+            batch = client.post("/check-emails", json={"emails": ["x@olddomain.net", "x@example.com"]})
+        
+        assert rule_hit.json()["is_suppressed"] is True
+        assert rule_hit.json()["reason"] == "BOUNCE"
+        assert rule_hit.json()["last_update_time"] == "2024-04-01T00:00:00Z"
+        assert rule_hit.json()["matched_rule"] == "*@olddomain.net"
+        assert exact_hit.json()["matched_rule"] is None
+        assert [result.get("matched_rule") for result in batch.json()["results"]] == ["*@olddomain.net", None]
+
+
+class TestBatchCheckEndpoint:
+    """Test cases for the /check-emails batch endpoint"""
+    
+    def test_batch_mixed_results(self, client, suppression_service_with_test_data):
+        """Test a batch with suppressed, clean and malformed addresses"""
+        with patch('main.suppression_service', suppression_service_with_test_data):
+            response = client.post("/check-emails", json={"emails": [
+                "TEST.COMPLAINT@example.com", "valid@example.com", "not-an-email"
+            ]})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 3
+        assert data["suppressed"] == 1
+        assert data["invalid"] == 1
+        assert data["results"][0] == {
+            "email": "test.complaint@example.com",
+            "is_suppressed": True,
+            "reason": "COMPLAINT",
+            "last_update_time": "2024-01-15T10:30:00Z"
+        }
+        assert data["results"][1] == {"email": "valid@example.com", "is_suppressed": False}
+        assert data["results"][2]["error"] == "invalid email address"
+    
+    @patch('main.ollama_service')
+    def test_batch_explanations_never_call_ollama(self, mock_ollama_service, client, suppression_service_with_test_data):
+        """Test that batch explanations come from the template, not the model"""
+        with patch('main.suppression_service', suppression_service_with_test_data):
+            response = client.post("/check-emails", json={
+                "emails": ["test.bounce@example.com"],
+                "include_explanations": True
+            })
+        
+        assert response.status_code == 200
+        explanation = response.json()["results"][0]["explanation"]
+        assert "test.bounce@example.com is suppressed because emails to this address consistently bounce back" in explanation
+        assert "January 20, 2024" in explanation
+        mock_ollama_service.generate_human_explanation.assert_not_called()
+    
+    def test_batch_uses_one_vectorized_lookup(self, client):
+        """Test that the batch is resolved with a single service call"""
+        with patch('main.suppression_service') as mock_service:
+            mock_service.check_emails_suppression.return_value = [None, None]
+            response = client.post("/check-emails", json={"emails": ["a@example.com", "b@example.com"]})
+        
+        assert response.status_code == 200
+        mock_service.check_emails_suppression.assert_called_once_with(["a@example.com", "b@example.com"])
+    
+    def test_batch_empty_rejected(self, client):
+        """Test that an empty batch is rejected"""
+        response = client.post("/check-emails", json={"emails": []})
+        
+        assert response.status_code == 422
+    
+    def test_batch_too_large_rejected(self, client):
+        """Test that batches over the configured limit are rejected"""
+        from config import config
+        emails = [f"user{i}@example.com" for i in range(config.BATCH_MAX_EMAILS + 1)]
+        response = client.post("/check-emails", json={"emails": emails})
+        
+        assert response.status_code == 422
+
+
+class TestStreamingCheckEndpoint:
+    """Test cases for the server-sent-events /check-email/stream endpoint"""
+    
+    def test_stream_suppressed_from_fake_ollama(self, client, suppression_service_with_test_data, fake_ollama_server):
+        """Test that the result comes first, then cleaned tokens, then the full explanation"""
+        from config import config
+        from services import OllamaService
+        fake_ollama_server.reply = "<think>internal</think>The address test.bounce@example.com keeps   bouncing."
+        with patch.object(config, 'OLLAMA_BASE_URL', fake_ollama_server.url):
+            streaming_ollama_service = OllamaService()
+        with patch('main.suppression_service', suppression_service_with_test_data), \
+             patch('main.ollama_service', streaming_ollama_service):
+            response = client.post("/check-email/stream", json={"email": "test.bounce@example.com"})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.text)
+        assert events[0] == ("result", {
+            "email": "test.bounce@example.com",
+            "is_suppressed": True,
+            "reason": "BOUNCE",
+            "last_update_time": "2024-01-20T14:45:30Z"
+        })
+        tokens = [data["text"] for name, data in events if name == "token"]
+        assert len(tokens) > 1
+        assert "".join(tokens) == "The address test.bounce@example.com keeps bouncing."
+        assert events[-1] == ("done", {
+            "human_readable_explanation": "The address test.bounce@example.com keeps bouncing.",
+            "explanation_degraded": False
+        })
+    
+    def test_stream_degrades_when_ollama_down(self, client, suppression_service_with_test_data, fake_ollama_server):
+        """Test that a failing model yields the template as a degraded explanation"""
+        from config import config
+        from services import OllamaService
+        fake_ollama_server.healthy = False
+        with patch.object(config, 'OLLAMA_BASE_URL', fake_ollama_server.url):
+            streaming_ollama_service = OllamaService()
+        with patch('main.suppression_service', suppression_service_with_test_data), \
+             patch('main.ollama_service', streaming_ollama_service):
+            response = client.post("/check-email/stream", json={"email": "test.complaint@example.com"})
+        
+        events = parse_events(response.text)
+        assert [name for name, _ in events] == ["result", "token", "done"]
+        assert events[-1][1]["explanation_degraded"] is True
+        assert "test.complaint@example.com is suppressed because" in events[-1][1]["human_readable_explanation"]
+    
+    def test_stream_not_suppressed(self, client):
+        """Test that clean addresses get a result and an empty done event"""
+        with patch('main.suppression_service') as mock_service:
+            mock_service.check_email_suppression.return_value = None
+            response = client.post("/check-email/stream", json={"email": "valid@example.com"})
+        
+        assert parse_events(response.text) == [
+            ("result", {"email": "valid@example.com", "is_suppressed": False}),
+            ("done", {"human_readable_explanation": None, "explanation_degraded": None})
+        ]
+
+
+class TestFilterEmailsEndpoint:
+    """Test cases for the streaming /filter-emails endpoint"""
+    
+    def test_filter_ndjson_clean(self, client, suppression_service_with_test_data):
+        """Test that suppressed and invalid rows are dropped from an NDJSON upload"""
+        body = (
+            '{"email": "test.complaint@example.com", "id": 1}\n'
+            '{"email": "valid@example.com", "id": 2}\n'
+            '{"email": "broken"}\n'
+        )
+        with patch('main.suppression_service', suppression_service_with_test_data):
+            response = client.post("/filter-emails", content=body,
+                                   headers={"Content-Type": "application/x-ndjson"})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert response.text == '{"email": "valid@example.com", "id": 2}\n'
+    
+    def test_filter_csv_suppressed(self, client, suppression_service_with_test_data):
+        """Test keeping only suppressed rows of a CSV upload"""
+        body = "id,email\n1,valid@example.com\n2,TEST.BOUNCE@example.com\n"
+        with patch('main.suppression_service', suppression_service_with_test_data):
+            response = client.post("/filter-emails?keep=suppressed", content=body,
+                                   headers={"Content-Type": "text/csv"})
+        
+        assert response.status_code == 200
+        assert response.text == "id,email\n2,TEST.BOUNCE@example.com\n"
+    
+    def test_filter_csv_missing_column(self, client, suppression_service_with_test_data):
+        """Test that a CSV header without the email_field column is a 422 naming it"""
+        body = "id,address\n1,valid@example.com\n"
+        with patch('main.suppression_service', suppression_service_with_test_data):
+            response = client.post("/filter-emails?email_field=Email", content=body, headers={"Content-Type": "text/csv"})
+            empty = client.post("/filter-emails", content="", headers={"Content-Type": "text/csv"})
+        
+        assert response.status_code == 422
+        assert "'Email'" in response.json()["detail"]
+        assert (empty.status_code, empty.text) == (200, "")
+    
+    def test_filter_bad_parameters(self, client):
+        """Test that unknown modes and formats are rejected up front"""
+        assert client.post("/filter-emails?keep=all", content="").status_code == 422
+        assert client.post("/filter-emails?format=xml", content="").status_code == 422
+
+
+class TestDeferredExplanations:
+    """Test cases for explanation_mode and /explanations/{explanation_id}"""
+    
+    @pytest.fixture
+    def suppressed_hit(self):
+        with patch('main.suppression_service') as mock_service:
+            mock_service.check_email_suppression.return_value = SuppressionRecord.parse(
+                email_address="test@example.com",
+                reason="BOUNCE",
+                last_update_time="2024-01-15T10:30:00Z"
+            )
+            yield mock_service
+    
+    def test_deferred_returns_handle_then_explanation(self, suppressed_hit):
+        """Test that the lookup returns at once and the explanation is fetched by handle"""
+        generate = AsyncMock(return_value=ExplanationResult("Deferred explanation"))
+        with patch.object(config, 'OLLAMA_WARMUP_ON_STARTUP', False), \
+             patch.object(config, 'OLLAMA_HEALTH_CHECK_INTERVAL_SECONDS', 0), \
+             patch.object(main.deferred_explanations.ollama_service, 'agenerate_explanation', generate), \
+             TestClient(app) as test_client:
+            response = test_client.post("/check-email", json={"email": "test@example.com", "explanation_mode": "deferred"})
+            data = response.json()
+            fetched = test_client.get(data["explanation_url"], params={"wait_ms": 2000}).json()
+        
+        assert response.status_code == 200
+        assert data["is_suppressed"] is True
+        assert data["reason"] == "BOUNCE"
+        assert data["human_readable_explanation"] is None
+        assert data["explanation_url"] == f"/explanations/{data['explanation_id']}"
+        assert fetched["status"] == "ready"
+        assert fetched["human_readable_explanation"] == "Deferred explanation"
+        assert fetched["explanation_degraded"] is False
+        assert generate.call_args[1]["budget_seconds"] == 0
+    
+    @patch('main.ollama_service')
+    def test_mode_none_skips_explanation(self, mock_ollama_service, suppressed_hit, client):
+        """Test that explanation_mode none is a pure lookup"""
+        mock_ollama_service.agenerate_explanation = AsyncMock()
+        
+        response = client.post("/check-email", json={"email": "test@example.com", "explanation_mode": "none"})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["is_suppressed"] is True
+        assert data["reason"] == "BOUNCE"
+        assert data["human_readable_explanation"] is None
+        assert data["explanation_id"] is None
+        mock_ollama_service.agenerate_explanation.assert_not_called()
+    
+    def test_callback_host_must_be_allowed(self, client):
+        """Test that callbacks are refused unless their host is allow-listed"""
+        response = client.post("/check-email", json={
+            "email": "test@example.com", "explanation_mode": "deferred", "callback_url": "http://internal.example/hook"
+        })
+        
+        assert response.status_code == 422
+    
+    def test_deferred_can_be_disabled(self, client):
+        """Test that deferred mode is refused when DEFERRED_EXPLANATIONS_ENABLED is off"""
+        with patch.object(config, 'DEFERRED_EXPLANATIONS_ENABLED', False):
+            response = client.post("/check-email", json={"email": "test@example.com", "explanation_mode": "deferred"})
+        
+        assert response.status_code == 422
+        assert "deferred" in response.json()["detail"]
+    
+    def test_unknown_handle_is_404(self, client):
+        """Test fetching a handle that was never issued"""
+        assert client.get("/explanations/does-not-exist").status_code == 404
+        assert client.get("/explanations/x", params={"wait_ms": 60000}).status_code == 422
+
+
+class TestMetricsEndpoint:
+    """Test cases for stage timings and /metrics"""
+    
+    @patch('main.suppression_service')
+    @patch('main.ollama_service')
+    def test_server_timing_and_metrics(self, mock_ollama_service, mock_suppression_service, client):
+        """Test that /check-email reports its stages and /metrics exposes them"""
+        mock_suppression_service.check_email_suppression.return_value = SuppressionRecord.parse(
+            email_address="test@example.com",
+            reason="BOUNCE",
+            last_update_time="2024-01-15T10:30:00Z"
+        )
+        mock_ollama_service.agenerate_explanation = AsyncMock(return_value=ExplanationResult("Template", degraded=True))
+        llm_before = main.check_email_stage_duration.count("llm")
+        degraded_before = main.explanations_served.value("inline", "true")
+        
+        response = client.post("/check-email", json={"email": "test@example.com"})
+        
+        assert response.status_code == 200
+        assert response.json()["explanation_degraded"] is True
+        stages = [part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")]
+        assert stages == ["lookup", "format", "llm", "serialize"]
+        assert main.check_email_stage_duration.count("llm") == llm_before + 1
+        assert main.explanations_served.value("inline", "true") == degraded_before + 1
+        
+        metrics = client.get("/metrics")
+        assert metrics.status_code == 200
+        assert metrics.headers["content-type"].startswith("text/plain")
+        assert 'check_email_stage_seconds_count{stage="llm"}' in metrics.text
+        assert 'http_requests_total{handler="check_email_suppression",method="POST",status="200"}' in metrics.text
+        assert "# TYPE ollama_circuit_state gauge" in metrics.text
+    
+    @patch('main.suppression_service')
+    def test_metrics_disabled(self, mock_suppression_service, client):
+        """Test that disabling metrics drops the header and the endpoint"""
+        mock_suppression_service.check_email_suppression.return_value = None
+        with patch.object(config, 'METRICS_ENABLED', False):
+            response = client.post("/check-email", json={"email": "valid@example.com"})
+            assert "Server-Timing" not in response.headers
+            assert client.get("/metrics").status_code == 404
+        
+        with patch.object(config, 'SERVER_TIMING_ENABLED', False):
+            assert "Server-Timing" not in client.post("/check-email", json={"email": "valid@example.com"}).headers
+
+
+class TestSuppressionQueries:
+    """Test cases for GET /suppressions and /suppressions/counts"""
+    
+    def test_query_by_reason_and_time(self, client, suppression_service_with_test_data):
+        """Test filtering by reason and LastUpdateTime range"""
+        with patch('main.suppression_service', suppression_service_with_test_data):
+            response = client.get("/suppressions", params={"reason": "bounce", "since": "2024-01-16T00:00:00Z"})
+            everything = client.get("/suppressions", params={"since": "2024-01-16", "until": "2024-02-05T00:00:00Z"})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 1
+        assert data["items"] == [{"email_address": "test.bounce@example.com", "reason": "BOUNCE",
+                                  "last_update_time": "2024-01-20T14:45:30Z"}]
+        assert data["next_cursor"] is None
+        assert [item["reason"] for item in everything.json()["items"]] == ["BOUNCE", "UNSUBSCRIBE"]
+    
+    def test_query_pagination(self, client, suppression_service_with_test_data):
+        """Test walking all entries, newest first, two at a time"""
+        seen = []
+        cursor = None
+        with patch('main.suppression_service', suppression_service_with_test_data):
+            while True:
+                params = {"limit": 2, "order": "desc"}
+                if cursor:
+                    params["cursor"] = cursor
+                data = client.get("/suppressions", params=params).json()
+                assert data["total"] == 4
+                seen.extend(item["reason"] for item in data["items"])
+                cursor = data["next_cursor"]
+                if cursor is None:
+                    break
+        
+        assert seen == ["REPUTATION", "UNSUBSCRIBE", "BOUNCE", "COMPLAINT"]
+    
+    def test_query_errors(self, client, suppression_service_with_test_data, temp_json_file):
+        """Test bad limits, malformed cursors and cursors from before a reload"""
+        with patch('main.suppression_service', suppression_service_with_test_data):
+            cursor = client.get("/suppressions", params={"limit": 1}).json()["next_cursor"]
+            assert client.get("/suppressions", params={"limit": 0}).status_code == 422
+            assert client.get("/suppressions", params={"since": "not a date"}).status_code == 422
+            assert client.get("/suppressions", params={"cursor": "garbage"}).status_code == 400
+            with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file):
+                assert suppression_service_with_test_data.reload(force=True)
+            assert client.get("/suppressions", params={"cursor": cursor}).status_code == 409
+    
+    def test_counts(self, client, suppression_service_with_test_data):
+        """Test counting by reason per day"""
+        with patch('main.suppression_service', suppression_service_with_test_data):
+            response = client.get("/suppressions/counts", params={"since": "2024-01-01T00:00:00Z",
+                                                                  "until": "2024-02-01T00:00:00Z"})
+            too_many = client.get("/suppressions/counts", params={"since": "2000-01-01", "interval": "hour"})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 2
+        assert data["by_reason"] == {"COMPLAINT": 1, "BOUNCE": 1}
+        assert data["buckets"] == [
+            {"start": "2024-01-15T00:00:00Z", "total": 1, "by_reason": {"COMPLAINT": 1}},
+            {"start": "2024-01-20T00:00:00Z", "total": 1, "by_reason": {"BOUNCE": 1}},
+        ]
+        assert too_many.status_code == 422
+    
+    def test_disabled(self, client, temp_json_file):
+        """Test that the endpoints are gone when the indexes are disabled"""
+        from services import SuppressionService
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file), \
+             patch.object(config, 'SUPPRESSION_QUERY_INDEX_ENABLED', False):
+            service = SuppressionService()
+            with patch('main.suppression_service', service):
+                assert client.get("/suppressions").status_code == 404
+                assert client.get("/suppressions/counts").status_code == 404
+
+
 class TestAPIIntegration:
     """Integration tests for the API"""
     
@@ -0,0 +1,39 @@
+import pytest
+
+from bloom import BloomFilter
+
+
+class TestBloomFilter:
+    """Test cases for the negative-lookup Bloom filter"""
+
+    def test_no_false_negatives(self):
+        """Test that every added key is reported as possibly present"""
+        keys = [f"user{i}@example.com" for i in range(5000)]
+        bloom = BloomFilter.from_keys(keys, capacity=len(keys))
+
+        assert all(key in bloom for key in keys)
+        assert bloom.count == 5000
+
+    @pytest.mark.parametrize("rate", [0.05, 0.01])
+    def test_false_positive_rate_close_to_target(self, rate):
+        """Test that the observed false-positive rate stays near the configured one"""
+        bloom = BloomFilter.from_keys((f"user{i}@example.com" for i in range(20000)), capacity=20000, false_positive_rate=rate)
+
+        false_positives = sum(f"other{i}@example.org" in bloom for i in range(50000))
+
+        assert false_positives / 50000 <= rate * 1.5
+
+    def test_lower_rate_uses_more_memory(self):
+        """Test that tightening the rate grows the filter"""
+        assert BloomFilter(10000, 0.001).size_bytes > BloomFilter(10000, 0.05).size_bytes
+
+    def test_empty_filter_rejects_everything(self):
+        """Test a filter built from no keys"""
+        bloom = BloomFilter.from_keys([], capacity=0)
+        assert "anyone@example.com" not in bloom
+
+    @pytest.mark.parametrize("rate", [0, 1, -0.5])
+    def test_invalid_rate(self, rate):
+        """Test that impossible rates are rejected"""
+        with pytest.raises(ValueError):
+            BloomFilter(100, rate)
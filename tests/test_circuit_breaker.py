@@ -0,0 +1,58 @@
+import pytest
+from unittest.mock import patch
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class TestCircuitBreaker:
+    """Test cases for the circuit breaker state machine"""
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that only an unbroken run of failures opens the circuit"""
+        breaker = CircuitBreaker(failure_threshold=3, recovery_seconds=30)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+        breaker.record_failure(RuntimeError("down"))
+        assert breaker.state == OPEN
+        assert breaker.allow_request() is False
+        assert breaker.stats()["rejected"] == 1
+        assert "down" in breaker.stats()["last_failure"]
+
+    def test_half_open_allows_a_single_trial(self):
+        """Test recovery after the timeout with one trial call"""
+        breaker = CircuitBreaker(failure_threshold=1, recovery_seconds=10)
+        with patch("circuit_breaker.time.monotonic", return_value=100.0):
+            breaker.record_failure()
+        with patch("circuit_breaker.time.monotonic", return_value=111.0):
+            assert breaker.state == HALF_OPEN
+            assert breaker.allow_request() is True
+            assert breaker.allow_request() is False
+            breaker.record_success()
+
+        assert breaker.state == CLOSED
+        assert breaker.allow_request() is True
+
+    def test_failed_trial_reopens(self):
+        """Test that a failing half-open trial opens the circuit again"""
+        breaker = CircuitBreaker(failure_threshold=5, recovery_seconds=0)
+        for _ in range(5):
+            breaker.record_failure()
+        assert breaker.allow_request() is True
+        breaker.record_failure()
+
+        assert breaker.times_opened == 2
+
+    def test_probe_results(self):
+        """Test that probes close the gap early and count as failures when closed"""
+        breaker = CircuitBreaker(failure_threshold=2, recovery_seconds=60)
+        breaker.record_probe(False)
+        breaker.record_probe(False)
+        assert breaker.state == OPEN
+
+        breaker.record_probe(True)
+        assert breaker.state == HALF_OPEN
@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from config import config
+from deferred import DeferredExplanations
+from services import OllamaService
+
+RECORD = ("test@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024 at 10:30 AM UTC", "emails bounce")
+
+
+@pytest.fixture
+def fake_ollama_service(fake_ollama_server):
+    """OllamaService wired to the local fake Ollama server"""
+    with patch.object(config, 'OLLAMA_BASE_URL', fake_ollama_server.url):
+        return OllamaService()
+
+
+class TestDeferredExplanations:
+    """Test cases for explanations generated in the background and fetched by handle"""
+
+    def test_submit_then_wait(self, fake_ollama_service):
+        """Test that a handle is pending at first and ready once generated"""
+        deferred = DeferredExplanations(fake_ollama_service)
+
+        async def run():
+            handle = deferred.submit(*RECORD)
+            first = await deferred.wait(handle)
+            ready = await deferred.wait(handle, timeout=5)
+            return first, ready
+
+        first, ready = asyncio.run(run())
+        assert first["status"] == "pending"
+        assert first["human_readable_explanation"] is None
+        assert ready["status"] == "ready"
+        assert ready["human_readable_explanation"] == "Fake model explanation"
+        assert ready["explanation_degraded"] is False
+        assert "callback_status" not in ready
+        assert deferred.stats()["completed"] == 1
+
+    def test_callback_delivery(self, fake_ollama_server, fake_ollama_service):
+        """Test that the finished explanation is POSTed to the callback URL"""
+        deferred = DeferredExplanations(fake_ollama_service, callback_allowed_hosts="127.0.0.1")
+        hook = f"{fake_ollama_server.url}/hook"
+        assert deferred.accepts_callback(hook)
+
+        async def run():
+            handle = deferred.submit(*RECORD, callback_url=hook)
+            await asyncio.gather(*deferred._tasks)
+            return handle, await deferred.wait(handle)
+
+        handle, state = asyncio.run(run())
+        delivered = [payload for payload in fake_ollama_server.payloads if "explanation_id" in payload]
+        assert delivered == [{
+            "explanation_id": handle,
+            "email": "test@example.com",
+            "status": "ready",
+            "human_readable_explanation": "Fake model explanation",
+            "explanation_degraded": False,
+        }]
+        assert state["callback_status"] == "delivered"
+        assert deferred.stats()["callbacks_sent"] == 1
+
+    def test_failed_callback_is_recorded(self, fake_ollama_server):
+        """Test that a rejected callback is counted and the explanation stays fetchable"""
+        fake_ollama_server.healthy = False
+        with patch.object(config, 'OLLAMA_BASE_URL', fake_ollama_server.url):
+            service = OllamaService()
+        deferred = DeferredExplanations(service, callback_allowed_hosts="*")
+
+        async def run():
+            handle = deferred.submit(*RECORD, callback_url=f"{fake_ollama_server.url}/hook")
+            await asyncio.gather(*deferred._tasks)
+            return await deferred.wait(handle)
+
+        state = asyncio.run(run())
+        assert state["explanation_degraded"] is True
+        assert state["callback_status"] == "failed"
+        assert deferred.stats()["callbacks_failed"] == 1
+
+    def test_accepts_callback_allow_list(self, fake_ollama_service):
+        """Test that callbacks are disabled by default and limited to listed hosts"""
+        assert not DeferredExplanations(fake_ollama_service).accepts_callback("https://hooks.example.com/x")
+        deferred = DeferredExplanations(fake_ollama_service, callback_allowed_hosts="Hooks.Example.com, other.test")
+        assert deferred.accepts_callback("https://hooks.example.com/x")
+        assert not deferred.accepts_callback("http://169.254.169.254/latest")
+
+    def test_handles_expire_and_are_bounded(self, fake_ollama_service):
+        """Test that finished handles expire after the TTL and the oldest are evicted at capacity"""
+        deferred = DeferredExplanations(fake_ollama_service, ttl_seconds=60, max_entries=2)
+
+        async def run():
+            handles = [deferred.submit(f"user{i}@example.com", *RECORD[1:]) for i in range(3)]
+            await asyncio.gather(*deferred._tasks)
+            evicted = await deferred.wait(handles[0])
+            with patch("deferred.time.time", return_value=deferred._jobs[handles[2]].completed_at + 61):
+                expired = await deferred.wait(handles[2])
+            return evicted, expired
+
+        evicted, expired = asyncio.run(run())
+        assert evicted is None
+        assert expired is None
+        assert deferred.stats()["handles"] == 0
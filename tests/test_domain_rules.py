@@ -0,0 +1,84 @@
+import pytest
+import os
+
+from domain_rules import DomainRuleError, DomainRuleTrie, load_domain_rules, parse_pattern
+
+
+class TestDomainRuleTrie:
+    """Test cases for the reversed-label domain rule trie"""
+
+    @pytest.mark.parametrize("pattern,expected", [
+        ("*@OldDomain.net", (["net", "olddomain"], False)),
+        ("*.corp.example", (["example", "corp"], True)),
+        ("*@*.corp.example", (["example", "corp"], True)),
+        ("*@example.com.", (["com", "example"], False)),
+    ])
+    def test_parse_pattern(self, pattern, expected):
+        """Test the accepted rule forms"""
+        assert parse_pattern(pattern) == expected
+
+    @pytest.mark.parametrize("pattern", ["olddomain.net", "user@olddomain.net", "*@", "*.", "*@a..b", "*@*", "*@a*.b"])
+    def test_parse_pattern_rejects(self, pattern):
+        """Test that addresses and malformed patterns are not rules"""
+        with pytest.raises(DomainRuleError):
+            parse_pattern(pattern)
+
+    def test_most_specific_rule_wins(self):
+        """Test domain rules, subdomain wildcards and their precedence"""
+        rules = DomainRuleTrie()
+        rules.add("*@olddomain.net", "BOUNCE", "2024-01-01T00:00:00Z")
+        rules.add("*.corp.example", "COMPLAINT", "2024-01-02T00:00:00Z")
+        rules.add("*.eu.corp.example", "UNSUBSCRIBE", "2024-01-03T00:00:00Z")
+        rules.add("*@eu.corp.example", "REPUTATION", "2024-01-04T00:00:00Z")
+
+        def rule(email):
+            match = rules.match(email)
+            return match.matched_rule if match is not None else None
+
+        assert rule("anyone@olddomain.net") == "*@olddomain.net"
+        assert rule("anyone@mail.olddomain.net") is None
+        assert rule("anyone@corp.example") is None
+        assert rule("anyone@us.corp.example") == "*.corp.example"
+        assert rule("anyone@a.b.us.corp.example") == "*.corp.example"
+        assert rule("anyone@eu.corp.example") == "*@eu.corp.example"
+        assert rule("anyone@x.eu.corp.example") == "*.eu.corp.example"
+        assert rule("anyone@example") is None
+        assert rule("not-an-address") is None
+        assert len(rules) == 4
+
+        match = rules.match("anyone@olddomain.net")
+        assert (match.reason, match.last_update_time) == ("BOUNCE", "2024-01-01T00:00:00Z")
+        assert match.formatted_time == "January 01, 2024 at 12:00 AM UTC"
+
+    def test_duplicates_keep_the_first_rule(self):
+        """Test that an equivalent pattern is not added twice"""
+        rules = DomainRuleTrie()
+        assert rules.add("*.corp.example", "BOUNCE", "2024-01-01T00:00:00Z")
+        assert not rules.add("*@*.corp.example", "COMPLAINT", "2024-01-01T00:00:00Z")
+        assert rules.add("*@corp.example", "COMPLAINT", "2024-01-01T00:00:00Z")
+        assert sorted(rule.reason for rule in rules) == ["BOUNCE", "COMPLAINT"]
+
+    def test_load_file(self, tmp_path):
+        """Test the rules file format, comments and the default time"""
+        path = tmp_path / "rules.txt"
+        path.write_text(
+            "# retired domains\n"
+            "*@olddomain.net  bounce  2024-03-01T08:00:00Z\n"
+            "\n"
+            "*.corp.example COMPLAINT   # no time: the file's mtime\n"
+        )
+        os.utime(path, (1700000000, 1700000000))
+        rules = load_domain_rules(str(path))
+
+        assert len(rules) == 2
+        assert rules.match("x@olddomain.net").reason == "BOUNCE"
+        assert rules.match("x@a.corp.example").last_update_time == "2023-11-14T22:13:20Z"
+
+    @pytest.mark.parametrize("line", ["*@olddomain.net", "*@olddomain.net BOUNCE yesterday", "olddomain.net BOUNCE",
+                                      "*@olddomain.net BOUNCE 2024-01-01T00:00:00Z extra"])
+    def test_load_file_rejects_bad_lines(self, tmp_path, line):
+        """Test that a bad line fails the load and names its line number"""
+        path = tmp_path / "rules.txt"
+        path.write_text("*@fine.example BOUNCE\n" + line + "\n")
+        with pytest.raises(DomainRuleError, match=":2:"):
+            load_domain_rules(str(path))
@@ -0,0 +1,85 @@
+import pytest
+from unittest.mock import patch
+
+from explanation_cache import ExplanationCache
+
+
+class TestExplanationCache:
+    """Test cases for the LRU/TTL explanation cache"""
+
+    def test_exact_hit_and_miss_counters(self):
+        """Test that lookups are counted and exact keys include the address"""
+        cache = ExplanationCache(max_entries=10, ttl_seconds=60)
+        assert cache.get("a@example.com", "BOUNCE", "Jan 1") is None
+        cache.put("a@example.com", "BOUNCE", "Jan 1", "A bounced.")
+
+        assert cache.get("a@example.com", "BOUNCE", "Jan 1") == "A bounced."
+        assert cache.get("b@example.com", "BOUNCE", "Jan 1") is None
+        assert (cache.hits, cache.misses) == (1, 2)
+        assert cache.stats()["hit_ratio"] == pytest.approx(1 / 3, abs=1e-4)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = ExplanationCache(max_entries=2, ttl_seconds=60)
+        cache.put("a@example.com", "BOUNCE", "Jan 1", "a")
+        cache.put("b@example.com", "BOUNCE", "Jan 1", "b")
+        cache.get("a@example.com", "BOUNCE", "Jan 1")
+        cache.put("c@example.com", "BOUNCE", "Jan 1", "c")
+
+        assert cache.get("b@example.com", "BOUNCE", "Jan 1") is None
+        assert cache.get("a@example.com", "BOUNCE", "Jan 1") == "a"
+        assert cache.evictions == 1
+        assert len(cache) == 2
+
+    def test_ttl_expiry(self):
+        """Test that entries older than the TTL are dropped on access"""
+        cache = ExplanationCache(max_entries=10, ttl_seconds=30)
+        with patch("explanation_cache.time.monotonic", return_value=100.0):
+            cache.put("a@example.com", "BOUNCE", "Jan 1", "a")
+        with patch("explanation_cache.time.monotonic", return_value=129.0):
+            assert cache.get("a@example.com", "BOUNCE", "Jan 1") == "a"
+        with patch("explanation_cache.time.monotonic", return_value=131.0):
+            assert cache.get("a@example.com", "BOUNCE", "Jan 1") is None
+
+        assert cache.expirations == 1
+        assert len(cache) == 0
+
+    def test_template_mode_substitutes_email(self):
+        """Test that template mode shares one generation across addresses"""
+        cache = ExplanationCache(max_entries=10, ttl_seconds=60, mode="template")
+        cache.put("a@example.com", "BOUNCE", "Jan 1", "A@Example.com bounced on Jan 1.")
+
+        assert cache.get("b@example.com", "BOUNCE", "Jan 1") == "b@example.com bounced on Jan 1."
+        assert cache.get("b@example.com", "COMPLAINT", "Jan 1") is None
+
+    def test_template_mode_never_caches_foreign_addresses(self):
+        """Test that replies mentioning an altered address are not shared"""
+        cache = ExplanationCache(max_entries=10, ttl_seconds=60, mode="template")
+        cache.put("a@example.com", "BOUNCE", "Jan 1", "a (at) example.com or a@example.org bounced.")
+
+        assert len(cache) == 0
+
+    def test_off_mode(self):
+        """Test that a disabled cache stores nothing and counts nothing"""
+        cache = ExplanationCache(mode="off")
+        cache.put("a@example.com", "BOUNCE", "Jan 1", "a")
+
+        assert cache.get("a@example.com", "BOUNCE", "Jan 1") is None
+        assert (len(cache), cache.hits, cache.misses) == (0, 0, 0)
+
+    def test_contains_does_not_count(self):
+        """Test that contains respects TTL but leaves counters alone"""
+        cache = ExplanationCache(max_entries=10, ttl_seconds=30)
+        with patch("explanation_cache.time.monotonic", return_value=100.0):
+            cache.put("a@example.com", "BOUNCE", "Jan 1", "a")
+            assert cache.contains("a@example.com", "BOUNCE", "Jan 1") is True
+            assert cache.contains("b@example.com", "BOUNCE", "Jan 1") is False
+        with patch("explanation_cache.time.monotonic", return_value=200.0):
+            assert cache.contains("a@example.com", "BOUNCE", "Jan 1") is False
+
+        assert (cache.hits, cache.misses) == (0, 0)
+
+    def test_invalid_mode(self):
+        """Test that unknown modes are rejected"""
+        with pytest.raises(ValueError):
+            ExplanationCache(mode="forever")
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import threading
+import pytest
+from unittest.mock import patch
+
+from config import config
+from explanation_cache import ExplanationCache
+from explanation_store import ExplanationStore
+from services import PROMPT_VERSION, OllamaService
+
+KEY = ("exact", "a@example.com", "BOUNCE", "Jan 1")
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "explanations.db")
+
+
+class TestExplanationStore:
+    """Test cases for the persistent SQLite explanation store"""
+
+    def test_survives_reopen(self, store_path):
+        """Test that explanations written by one instance are read by the next"""
+        store = ExplanationStore(store_path, model="m1", prompt_version="v1")
+        assert store.get(KEY) is None
+        store.put(KEY, "A bounced.")
+        store.close()
+
+        reopened = ExplanationStore(store_path, model="m1", prompt_version="v1")
+        assert reopened.get(KEY) == "A bounced."
+        assert reopened.contains(KEY)
+        assert len(reopened) == 1
+        assert (reopened.hits, reopened.misses) == (1, 0)
+
+    def test_entry_count_uses_the_model_index(self, store_path):
+        """Test that counting the current version's rows does not scan the table"""
+        store = ExplanationStore(store_path, model="m1", prompt_version="v1")
+        plan = store._conn.execute(
+            "EXPLAIN QUERY PLAN SELECT COUNT(*) FROM explanations WHERE model = ? AND prompt_version = ?",
+            ("m1", "v1")
+        ).fetchall()
+        assert any("explanations_model_prompt" in row[-1] for row in plan)
+
+    def test_reopen_after_close(self, store_path):
+        """Test that a closed store reconnects, as forked workers do"""
+        store = ExplanationStore(store_path, model="m1", prompt_version="v1")
+        store.put(KEY, "A bounced.")
+        store.close()
+        store.reopen()
+        assert store.get(KEY) == "A bounced."
+        store.close()
+
+    def test_model_or_prompt_change_invalidates(self, store_path):
+        """Test that rows from another model or prompt version never match and are purged"""
+        ExplanationStore(store_path, model="m1", prompt_version="v1").put(KEY, "old model")
+        ExplanationStore(store_path, model="m1", prompt_version="v2").put(KEY, "old prompt")
+
+        current = ExplanationStore(store_path, model="m2", prompt_version="v2")
+        assert current.get(KEY) is None
+        assert len(current) == 0
+        assert current.purge_stale() == 2
+        assert ExplanationStore(store_path, model="m1", prompt_version="v1").get(KEY) is None
+
+    def test_ttl(self, store_path):
+        """Test that rows older than the TTL are ignored"""
+        store = ExplanationStore(store_path, model="m1", prompt_version="v1", ttl_seconds=60)
+        with patch("explanation_store.time.time", return_value=1000.0):
+            store.put(KEY, "A bounced.")
+        with patch("explanation_store.time.time", return_value=1059.0):
+            assert store.get(KEY) == "A bounced."
+        with patch("explanation_store.time.time", return_value=1061.0):
+            assert store.get(KEY) is None
+            assert store.purge_stale() == 1
+
+    def test_concurrent_writers_share_the_file(self, store_path):
+        """Test that separate connections, like separate workers, can write and read concurrently"""
+        stores = [ExplanationStore(store_path, model="m1", prompt_version="v1") for _ in range(4)]
+
+        def write(index, store):
+            for i in range(50):
+                store.put(("exact", f"user{index}-{i}@example.com", "BOUNCE", "Jan 1"), f"text {index}-{i}")
+
+        threads = [threading.Thread(target=write, args=(index, store)) for index, store in enumerate(stores)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(store.errors for store in stores) == 0
+        assert len(stores[0]) == 200
+        assert stores[1].get(("exact", "user3-49@example.com", "BOUNCE", "Jan 1")) == "text 3-49"
+
+    def test_backs_the_memory_cache(self, store_path):
+        """Test that memory misses fall through to the store and are promoted"""
+        store = ExplanationStore(store_path, model="m1", prompt_version="v1")
+        ExplanationCache(max_entries=10, mode="template", store=store).put("a@example.com", "BOUNCE", "Jan 1", "A@example.com bounced.")
+
+        cache = ExplanationCache(max_entries=10, mode="template", store=store)
+        assert cache.contains("b@example.com", "BOUNCE", "Jan 1")
+        assert cache.get("b@example.com", "BOUNCE", "Jan 1") == "b@example.com bounced."
+        assert cache.get("c@example.com", "BOUNCE", "Jan 1") == "c@example.com bounced."
+        stats = cache.stats()
+        assert (stats["store_hits"], stats["hits"], stats["misses"]) == (1, 1, 0)
+        assert stats["store"]["entries"] == 1
+
+    def test_async_access_runs_off_the_event_loop(self, store_path):
+        """Test that aget/aput/acontains reach the store from a worker thread"""
+        store = ExplanationStore(store_path, model="m1", prompt_version="v1")
+        threads = []
+        get, put = store.get, store.put
+
+        def record(func):
+            def call(*args):
+                threads.append(threading.current_thread())
+                return func(*args)
+            return call
+
+        async def scenario():
+            with patch.object(store, "get", record(get)), patch.object(store, "put", record(put)):
+                await ExplanationCache(max_entries=10, store=store).aput("a@example.com", "BOUNCE", "Jan 1", "A bounced.")
+                cache = ExplanationCache(max_entries=10, store=store)
+                assert await cache.acontains("a@example.com", "BOUNCE", "Jan 1")
+                assert await cache.aget("a@example.com", "BOUNCE", "Jan 1") == "A bounced."
+                assert await cache.aget("a@example.com", "BOUNCE", "Jan 1") == "A bounced."
+                assert await cache.aget("b@example.com", "BOUNCE", "Jan 1") is None
+                return cache.stats()
+
+        stats = asyncio.run(scenario())
+        assert (stats["store_hits"], stats["hits"], stats["misses"]) == (1, 1, 1)
+        assert len(threads) == 3
+        assert threading.main_thread() not in threads
+
+    def test_other_versions_are_kept_until_purged(self, store_path):
+        """Test that starting a service for a new prompt does not delete the old version's rows"""
+        ExplanationStore(store_path, model="m1", prompt_version="old").put(KEY, "old prompt")
+        with patch.object(config, 'EXPLANATION_STORE_PATH', store_path), patch('ollama.Client'):
+            service = OllamaService()
+        assert ExplanationStore(store_path, model="m1", prompt_version="old").get(KEY) == "old prompt"
+        assert service.explanation_cache.store.purge_stale() == 1
+
+    def test_ollama_service_restart_reuses_explanations(self, store_path):
+        """Test that a new OllamaService answers from the store without calling the model"""
+        with patch.object(config, 'EXPLANATION_STORE_PATH', store_path), \
+             patch('ollama.Client') as mock_client_class:
+            mock_client_class.return_value.chat.return_value = {'message': {'content': 'Generated once.'}}
+            first = OllamaService()
+            first.generate_human_explanation("a@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "Jan 15", "it bounced")
+            restarted = OllamaService()
+            text = restarted.generate_human_explanation("a@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "Jan 15", "it bounced")
+
+        assert text == "Generated once."
+        assert mock_client_class.return_value.chat.call_count == 1
+        assert restarted.explanation_cache.store.prompt_version == PROMPT_VERSION
+        assert os.path.exists(store_path)
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+
+from filtering import MailingListFilter, iter_line_batches
+
+
+def collect_batches(chunks, max_line_bytes=64):
+    """Run iter_line_batches over in-memory chunks and flatten the result"""
+    async def _stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def _collect():
+        return [line async for batch in iter_line_batches(_stream(), max_line_bytes) for line in batch]
+
+    return asyncio.run(_collect())
+
+
+class TestIterLineBatches:
+    """Test cases for regrouping upload chunks into lines"""
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 8, 1000])
+    def test_lines_independent_of_chunking(self, chunk_size):
+        """Test that chunk boundaries never split or merge lines"""
+        body = b"first\nsecond line\n\nlast-without-newline"
+        chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+        assert collect_batches(chunks) == [b"first", b"second line", b"", b"last-without-newline"]
+
+    @pytest.mark.parametrize("chunk_size", [1, 5, 1000])
+    def test_oversized_lines_reported_as_none(self, chunk_size):
+        """Test that lines over the limit are skipped without being buffered"""
+        body = b"ok\n" + b"x" * 40 + b"\nfine\n" + b"y" * 40
+        chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+        assert collect_batches(chunks, max_line_bytes=16) == [b"ok", None, b"fine", None]
+
+
+class TestMailingListFilter:
+    """Test cases for the row filter behind /filter-emails"""
+
+    def test_ndjson_clean_rows(self, suppression_service_with_test_data):
+        """Test that clean mode keeps only deliverable rows, byte for byte"""
+        rows = [
+            b'{"email": "Test.Complaint@example.com", "name": "A"}',
+            b'{"email": "valid@example.com", "name": "B"}',
+            b'{"email": "not-an-email"}',
+            b'not json',
+            b'',
+        ]
+        list_filter = MailingListFilter(suppression_service_with_test_data, "clean", "ndjson")
+
+        assert list_filter.filter_lines(rows) == [b'{"email": "valid@example.com", "name": "B"}\n']
+        assert (list_filter.rows, list_filter.kept, list_filter.invalid) == (4, 1, 2)
+
+    def test_csv_suppressed_rows_with_header(self, suppression_service_with_test_data):
+        """Test that the header locates the column and is echoed back"""
+        list_filter = MailingListFilter(suppression_service_with_test_data, "suppressed", "csv", email_field="Address")
+        first = list_filter.filter_lines([b"name,address\r", b"A,test.bounce@example.com\r"])
+        second = list_filter.filter_lines([b'"B, Jr",valid@example.com', None])
+
+        assert first == [b"name,address\r\n", b"A,test.bounce@example.com\r\n"]
+        assert second == []
+        assert (list_filter.rows, list_filter.kept, list_filter.invalid) == (3, 1, 1)
+
+    def test_csv_header_without_email_column(self, suppression_service_with_test_data):
+        """Test that a header lacking the email column is rejected rather than filtering another column"""
+        list_filter = MailingListFilter(suppression_service_with_test_data, "clean", "csv")
+
+        assert list_filter.needs_header
+        with pytest.raises(ValueError, match="'email'"):
+            list_filter.filter_lines([b"", b"name,address", b"A,valid@example.com"])
+
+    def test_invalid_mode_rejected(self, suppression_service_with_test_data):
+        """Test that unknown modes raise ValueError"""
+        with pytest.raises(ValueError):
+            MailingListFilter(suppression_service_with_test_data, "everything", "ndjson")
@@ -0,0 +1,188 @@
+import pytest
+import io
+import json
+import tempfile
+import os
+
+from loader import (
+    IngestError, IngestReport, _StreamingJSONReader, iter_suppressed_destinations, iter_valid_destinations,
+    validate_destination
+)
+
+
+@pytest.fixture
+def write_export():
+    """Write raw text to a temporary export file"""
+    paths = []
+
+    def _write(content: str) -> str:
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f:
+            f.write(content)
+            paths.append(f.name)
+        return f.name
+
+    yield _write
+
+    for path in paths:
+        os.unlink(path)
+
+
+class TestStreamingLoader:
+    """Test cases for the streaming SES export parser"""
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+    def test_matches_json_load(self, temp_json_file, chunk_size):
+        """Test that streaming yields the same items as json.load for any chunk size"""
+        with open(temp_json_file) as f:
+            expected = json.load(f)["SuppressedDestinationSummaries"]
+
+        items = list(iter_suppressed_destinations(temp_json_file, chunk_size=chunk_size))
+
+        assert items == expected
+
+    def test_other_top_level_keys_are_skipped(self, write_export):
+        """Test that keys around the summaries array are ignored"""
+        path = write_export(json.dumps({
+            "NextToken": "abc",
+            "SuppressedDestinationSummaries": [
+                {"EmailAddress": "a@example.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-01-15T10:30:00Z"}
+            ],
+            "Count": 12345
+        }))
+
+        items = list(iter_suppressed_destinations(path, chunk_size=3))
+
+        assert [item["EmailAddress"] for item in items] == ["a@example.com"]
+
+    @pytest.mark.parametrize("chunk_size", range(1, 40))
+    def test_numbers_across_chunks(self, write_export, chunk_size):
+        """Test that numbers split inside their fraction or exponent are not cut short"""
+        path = write_export(json.dumps({"Count": -12345.5e3, "SuppressedDestinationSummaries": [
+            {"EmailAddress": "a@example.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-01-15T10:30:00Z",
+             "Scores": [1.25e-7, 2.5, 10]}
+        ], "Total": 6.02e23}))
+
+        items = list(iter_suppressed_destinations(path, chunk_size=chunk_size))
+
+        assert items[0]["Scores"] == [1.25e-7, 2.5, 10]
+
+    def test_empty_document_and_array(self, write_export):
+        """Test exports without any entries"""
+        assert list(iter_suppressed_destinations(write_export("{}"))) == []
+        assert list(iter_suppressed_destinations(write_export('{"SuppressedDestinationSummaries": []}'))) == []
+
+    def test_multibyte_characters_across_chunks(self, write_export):
+        """Test that UTF-8 sequences split across chunk boundaries decode correctly"""
+        path = write_export(json.dumps({"SuppressedDestinationSummaries": [
+            {"EmailAddress": "josé@exämple.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-01-15T10:30:00Z"}
+        ]}, ensure_ascii=False))
+
+        items = list(iter_suppressed_destinations(path, chunk_size=1))
+
+        assert items[0]["EmailAddress"] == "josé@exämple.com"
+
+    def test_truncated_file_raises(self, write_export):
+        """Test that a truncated export is reported instead of silently yielding a partial list"""
+        path = write_export('{"SuppressedDestinationSummaries": [{"EmailAddress": "a@example.com", "Reason": "BOUN')
+
+        with pytest.raises(ValueError):
+            list(iter_suppressed_destinations(path, chunk_size=8))
+
+    def test_unterminated_string_message(self, write_export):
+        """Test that the error reads naturally for messages that already end in 'at'"""
+        path = write_export('{"SuppressedDestinationSummaries": [{"EmailAddress": "a@example.com')
+
+        with pytest.raises(ValueError, match=r"Unterminated string starting at character 53 \(row 0\)") as raised:
+            list(iter_suppressed_destinations(path, chunk_size=8))
+        assert "at at" not in str(raised.value)
+
+    def test_invalid_json_raises(self, write_export):
+        """Test that non-JSON content raises"""
+        with pytest.raises(ValueError):
+            list(iter_suppressed_destinations(write_export("invalid json content")))
+
+    def test_syntax_error_raises_without_reading_on(self, write_export):
+        """Test that a syntax error mid-file is reported at once, with its row, not after buffering the rest"""
+        rows = [{"EmailAddress": f"user{i}@example.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-01-15T10:30:00Z"}
+                for i in range(2000)]
+        text = json.dumps({"SuppressedDestinationSummaries": rows})
+        broken = text.replace('"user1@example.com", "Reason"', '"user1@example.com" "Reason"', 1)
+        path = write_export(broken)
+
+        with pytest.raises(ValueError, match=r"Expecting ',' delimiter at character .* \(row 1\)"):
+            list(iter_suppressed_destinations(path, chunk_size=64))
+
+        reader = _StreamingJSONReader(io.BytesIO(broken.encode()), 64)
+        reader.expect("{")
+        reader.value()
+        reader.expect(":")
+        reader.expect("[")
+        reader.value()
+        reader.expect(",")
+        with pytest.raises(ValueError):
+            reader.value()
+        assert reader.bytes_read <= 4 * 64 < len(broken)
+
+    def test_progress_reporting(self, temp_json_file):
+        """Test that progress is reported every N records and once at the end"""
+        calls = []
+
+        list(iter_suppressed_destinations(
+            temp_json_file,
+            progress=lambda records, bytes_read, total: calls.append((records, bytes_read, total)),
+            progress_every=2
+        ))
+
+        total = os.path.getsize(temp_json_file)
+        assert [records for records, _, _ in calls] == [2, 4, 4]
+        assert calls[-1] == (4, total, total)
+
+
+MALFORMED_EXPORT = json.dumps({"SuppressedDestinationSummaries": [
+    {"EmailAddress": "ok@example.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-01-15T10:30:00Z"},
+    {"EmailAddress": "late@example.com", "Reason": "BOUNCE", "LastUpdateTime": "yesterday"},
+    {"Reason": "COMPLAINT", "LastUpdateTime": "2024-01-15T10:30:00Z"},
+    {"EmailAddress": "fine@example.com", "Reason": "COMPLAINT", "LastUpdateTime": "2024-01-15T10:30:00+01:00"},
+]})
+
+
+class TestIngestValidation:
+    """Test cases for row validation at load time"""
+
+    def test_validate_destination_parses_timestamp(self):
+        """Test that a valid row comes back with its epoch"""
+        row = validate_destination({"EmailAddress": "a@example.com", "Reason": "BOUNCE", "LastUpdateTime": "1970-01-01T00:01:00Z"})
+        assert row == ("a@example.com", "BOUNCE", "1970-01-01T00:01:00Z", 60)
+
+    @pytest.mark.parametrize("item,message", [
+        ({"Reason": "BOUNCE", "LastUpdateTime": "2024-01-15T10:30:00Z"}, "EmailAddress"),
+        ({"EmailAddress": "a@example.com", "Reason": 3, "LastUpdateTime": "2024-01-15T10:30:00Z"}, "Reason"),
+        ({"EmailAddress": "a@example.com", "Reason": "BOUNCE"}, "LastUpdateTime"),
+        ({"EmailAddress": "a@example.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-13-45"}, "ISO-8601"),
+    ])
+    def test_validate_destination_rejects(self, item, message):
+        """Test that malformed rows are rejected with a reason"""
+        with pytest.raises(ValueError, match=message):
+            validate_destination(item)
+
+    def test_fails_fast_on_first_malformed_row(self, write_export):
+        """Test that the load stops at the first malformed row by default"""
+        report = IngestReport("export.json")
+        rows = iter_valid_destinations(write_export(MALFORMED_EXPORT), report)
+        with pytest.raises(IngestError) as raised:
+            list(rows)
+
+        assert raised.value.report is report
+        assert (report.rows, report.invalid) == (2, 1)
+        assert report.errors == [{"index": 1, "email": "late@example.com",
+                                  "error": "LastUpdateTime 'yesterday' is not an ISO-8601 timestamp"}]
+        assert "1 malformed row(s) in export.json" in str(raised.value)
+
+    def test_tolerated_rows_are_skipped_and_reported(self, write_export):
+        """Test that up to max_invalid malformed rows are skipped"""
+        report = IngestReport("export.json")
+        rows = list(iter_valid_destinations(write_export(MALFORMED_EXPORT), report, max_invalid=2))
+
+        assert [row[0] for row in rows] == ["ok@example.com", "fine@example.com"]
+        assert (report.rows, report.invalid) == (4, 2)
+        assert [error["index"] for error in report.errors] == [1, 2]
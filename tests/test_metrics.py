@@ -0,0 +1,63 @@
+import pytest
+from unittest.mock import patch
+
+from metrics import Counter, Histogram, MetricsRegistry, StageTimer
+
+
+class TestMetrics:
+    """Test cases for the Prometheus metrics primitives"""
+
+    def test_counter_render(self):
+        """Test that counters render one labelled sample per label set"""
+        counter = Counter("lookups_total", "Lookups", ("result",))
+        counter.inc("hit")
+        counter.inc("hit")
+        counter.inc("miss", amount=3)
+
+        assert counter.value("hit") == 2
+        assert counter.render() == [
+            "# HELP lookups_total Lookups",
+            "# TYPE lookups_total counter",
+            'lookups_total{result="hit"} 2',
+            'lookups_total{result="miss"} 3',
+        ]
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test bucket placement, the +Inf bucket, sum and count"""
+        histogram = Histogram("stage_seconds", "Stages", ("stage",), buckets=(0.001, 0.01))
+        for value in (0.0005, 0.001, 0.005, 0.5):
+            histogram.observe(value, "lookup")
+
+        lines = histogram.render()
+        assert 'stage_seconds_bucket{stage="lookup",le="0.001"} 2' in lines
+        assert 'stage_seconds_bucket{stage="lookup",le="0.01"} 3' in lines
+        assert 'stage_seconds_bucket{stage="lookup",le="+Inf"} 4' in lines
+        assert 'stage_seconds_sum{stage="lookup"} 0.5065' in lines
+        assert 'stage_seconds_count{stage="lookup"} 4' in lines
+        assert histogram.count("lookup") == 4
+
+    def test_registry_collectors_and_escaping(self):
+        """Test that collectors are read at render time and label values are escaped"""
+        state = {"value": 1}
+        registry = MetricsRegistry()
+        registry.collector("queue_depth", "gauge", "Depth", lambda: [("", {"queue": 'a"b'}, state["value"])])
+        state["value"] = 7
+
+        text = registry.render()
+        assert "# TYPE queue_depth gauge" in text
+        assert 'queue_depth{queue="a\\"b"} 7' in text
+        assert text.endswith("\n")
+
+    def test_stage_timer(self):
+        """Test that each mark closes the stage since the previous one"""
+        with patch("metrics.time.perf_counter", side_effect=[10.0, 10.002, 10.003, 10.0035]):
+            timer = StageTimer()
+            timer.mark("lookup")
+            timer.mark("llm")
+            timer.mark("serialize")
+
+        assert [stage for stage, _ in timer.stages] == ["lookup", "llm", "serialize"]
+        assert timer.server_timing() == "lookup;dur=2.000, llm;dur=1.000, serialize;dur=0.500"
+        histogram = Histogram("h", "h", ("stage",))
+        timer.observe(histogram)
+        assert histogram.count("llm") == 1
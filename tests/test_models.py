@@ -1,7 +1,10 @@
 import pytest
 from pydantic import ValidationError
 
-from models import EmailCheckRequest, EmailCheckResponse, SuppressionInfo
+from models import (
+    BatchEmailCheckRequest, BatchEmailCheckResult, EmailCheckRequest, EmailCheckResponse, SuppressionInfo
+)
+from config import config
 
 
 class TestEmailCheckRequest:
@@ -56,7 +59,16 @@ class TestEmailCheckRequest:
             EmailCheckRequest()
         
         assert "Field required" in str(exc_info.value)
-
+    
+    def test_callback_url_requires_deferred_mode(self):
+        """Test that a callback is only accepted together with deferred explanations"""
+        with pytest.raises(ValidationError):
+            EmailCheckRequest(email="test@example.com", callback_url="https://hooks.example.com/done")
+        
+        request = EmailCheckRequest(email="test@example.com", explanation_mode="deferred",
+                                    callback_url="https://hooks.example.com/done")
+        assert str(request.callback_url) == "https://hooks.example.com/done"
+    
 
 class TestEmailCheckResponse:
     """Test cases for EmailCheckResponse model"""
@@ -122,7 +134,11 @@ class TestEmailCheckResponse:
             "is_suppressed": True,
             "reason": "BOUNCE",
             "last_update_time": "2024-01-15T10:30:00Z",
-            "human_readable_explanation": "Email bounced"
+            "matched_rule": None,
+            "human_readable_explanation": "Email bounced",
+            "explanation_degraded": None,
+            "explanation_id": None,
+            "explanation_url": None
         }
         
         assert data == expected
@@ -220,6 +236,29 @@ class TestSuppressionInfo:
         assert data == expected
 
 
+class TestBatchModels:
+    """Test cases for the batch check models"""
+    
+    def test_batch_request_defaults(self):
+        """Test that explanations are off by default"""
+        request = BatchEmailCheckRequest(emails=["a@example.com"])
+        
+        assert request.include_explanations is False
+    
+    def test_batch_request_limits(self):
+        """Test the batch size bounds"""
+        with pytest.raises(ValidationError):
+            BatchEmailCheckRequest(emails=[])
+        with pytest.raises(ValidationError):
+            BatchEmailCheckRequest(emails=["a@example.com"] * (config.BATCH_MAX_EMAILS + 1))
+    
+    def test_batch_result_compact_serialization(self):
+        """Test that unset fields can be dropped from per-item results"""
+        result = BatchEmailCheckResult(email="a@example.com", is_suppressed=False)
+        
+        assert result.model_dump(exclude_none=True) == {"email": "a@example.com", "is_suppressed": False}
+
+
 class TestModelIntegration:
     """Integration tests for model interactions"""
     
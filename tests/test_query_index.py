@@ -0,0 +1,134 @@
+import pytest
+import random
+
+from query_index import MAX_BUCKETS, InvalidCursor, StaleCursor, SuppressionQueryIndex
+from snapshot import SnapshotSuppressionStore, write_snapshot
+from stores import CompactSuppressionStore, DictSuppressionStore, format_epoch, parse_epoch
+
+REASONS = ["BOUNCE", "COMPLAINT", "UNSUBSCRIBE", "REPUTATION"]
+START = parse_epoch("2024-01-01T00:00:00Z")
+
+
+def build_store(store, rows=2000, seed=3):
+    """Random entries over ~60 days, with many ties on the same second"""
+    rng = random.Random(seed)
+    for i in range(rows):
+        epoch = START + rng.randrange(60 * 86400) // 3600 * 3600 + rng.choice([0, 0, 59])
+        store.add(f"user{i}@example.com", f"user{i}@example.com", rng.choice(REASONS), format_epoch(epoch))
+    return store
+
+
+def expected(store, reason=None, since=None, until=None):
+    """Brute-force answer: matching entries in (time, insertion order)"""
+    rows = [(info.last_update_epoch, row, info) for row, info in enumerate(store)]
+    rows = [entry for entry in rows
+            if (reason is None or entry[2].reason == reason)
+            and (since is None or entry[0] >= since) and (until is None or entry[0] < until)]
+    return [info for _, _, info in sorted(rows, key=lambda entry: entry[:2])]
+
+
+@pytest.fixture(params=["dict", "compact", "snapshot"])
+def store(request, tmp_path):
+    if request.param == "dict":
+        yield build_store(DictSuppressionStore())
+        return
+    compact = build_store(CompactSuppressionStore())
+    if request.param == "compact":
+        yield compact
+        return
+    path = str(tmp_path / "query.snap")
+    write_snapshot(compact, path)
+    snapshot = SnapshotSuppressionStore(path)
+    yield snapshot
+    snapshot.close()
+
+
+def read_all(index, **filters):
+    """Follow next_cursor until the last page"""
+    items = []
+    cursor = None
+    while True:
+        page = index.query(cursor=cursor, **filters)
+        items.extend(page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            return items, page.total
+
+
+class TestSuppressionQueryIndex:
+    """Test cases for the reason and time secondary indexes"""
+
+    @pytest.mark.parametrize("reason", [None, "BOUNCE", "COMPLAINT"])
+    @pytest.mark.parametrize("days", [(None, None), (3, 10), (0, 1), (59, None), (None, 20)])
+    def test_queries_match_a_scan(self, store, reason, days):
+        """Test that every page walk returns exactly the scanned matches, in time order"""
+        since, until = (START + day * 86400 if day is not None else None for day in days)
+        index = SuppressionQueryIndex(store, version=1)
+        want = expected(store, reason, since, until)
+
+        items, total = read_all(index, reason=reason, since=since, until=until, limit=97)
+        assert total == len(want)
+        assert [info.email_address for info in items] == [info.email_address for info in want]
+
+        items, total = read_all(index, reason=reason, since=since, until=until, limit=50, descending=True)
+        assert [info.email_address for info in items] == [info.email_address for info in reversed(want)]
+
+    def test_reason_is_case_insensitive_and_unknown_is_empty(self, store):
+        """Test reason matching"""
+        index = SuppressionQueryIndex(store, version=1)
+        assert index.query(reason="bounce").total == len(expected(store, "BOUNCE"))
+        page = index.query(reason="NOT_A_REASON")
+        assert page.total == 0 and page.items == [] and page.next_cursor is None
+
+    def test_records_carry_display_fields(self, store):
+        """Test that listed entries are full records"""
+        index = SuppressionQueryIndex(store, version=1)
+        info = index.query(limit=1).items[0]
+        assert info == store.get(info.email_address)
+        assert info.formatted_time.endswith("UTC")
+
+    def test_cursor_errors(self, store):
+        """Test that foreign and outdated cursors are rejected"""
+        index = SuppressionQueryIndex(store, version=1)
+        cursor = index.query(limit=10).next_cursor
+        with pytest.raises(InvalidCursor):
+            index.query(cursor="not a cursor")
+        with pytest.raises(StaleCursor):
+            SuppressionQueryIndex(store, version=2).query(limit=10, cursor=cursor)
+
+    def test_counts_match_a_scan(self, store):
+        """Test per-day and per-hour counts against a scan"""
+        index = SuppressionQueryIndex(store, version=1)
+        result = index.counts()
+        by_day = {}
+        for info in store:
+            day = format_epoch(info.last_update_epoch - info.last_update_epoch % 86400)
+            by_day.setdefault(day, {}).setdefault(info.reason, 0)
+            by_day[day][info.reason] += 1
+        assert {bucket["start"]: bucket["by_reason"] for bucket in result["buckets"]} == by_day
+        assert result["total"] == len(store)
+        assert [bucket["start"] for bucket in result["buckets"]] == sorted(by_day)
+
+        since, until = START + 5 * 86400 + 1800, START + 6 * 86400
+        hourly = index.counts(reason="BOUNCE", since=since, until=until, interval="hour")
+        assert hourly["total"] == len(expected(store, "BOUNCE", since, until))
+        assert set(hourly["by_reason"]) <= {"BOUNCE"}
+        assert all(bucket["start"] >= format_epoch(since - 1800) for bucket in hourly["buckets"])
+
+    def test_counts_rejects_too_many_buckets(self, store):
+        """Test the bucket cap"""
+        index = SuppressionQueryIndex(store, version=1)
+        with pytest.raises(ValueError):
+            index.counts(since=START, until=START + (MAX_BUCKETS + 1) * 3600, interval="hour")
+
+    def test_empty_store_and_unparseable_times(self):
+        """Test an empty store, and entries whose timestamp could not be parsed"""
+        assert SuppressionQueryIndex(DictSuppressionStore(), version=1).counts()["buckets"] == []
+
+        store = CompactSuppressionStore()
+        store.add("late@example.com", "late@example.com", "BOUNCE", "2024-03-01T00:00:00Z")
+        store.add("odd@example.com", "odd@example.com", "BOUNCE", "yesterday")
+        index = SuppressionQueryIndex(store, version=1)
+        assert [info.email_address for info in index.query().items] == ["odd@example.com", "late@example.com"]
+        assert index.query(since=0).total == 1
+        assert index.counts()["total"] == 1
@@ -0,0 +1,103 @@
+import pytest
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+
+import httpx
+
+from config import config
+from serve import prepare_snapshot, snapshot_path
+from snapshot import SnapshotSuppressionStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestSnapshotPreparation:
+    """Test cases for the snapshot serve.py shares between workers"""
+
+    def test_default_path_next_to_export(self):
+        """Test that the snapshot defaults to the export's path with a .snap extension"""
+        with patch.object(config, "SUPPRESSION_SNAPSHOT_PATH", ""), \
+             patch.object(config, "SUPPRESSED_EMAILS_JSON_PATH", "/data/export.json"):
+            assert snapshot_path() == "/data/export.snap"
+        with patch.object(config, "SUPPRESSION_SNAPSHOT_PATH", "/srv/index.snap"):
+            assert snapshot_path() == "/srv/index.snap"
+
+    def test_builds_missing_and_stale_snapshots(self, temp_json_file, tmp_path):
+        """Test that a snapshot is built when missing, reused when fresh and rebuilt when stale"""
+        path = str(tmp_path / "shared.snap")
+        with patch.object(config, "SUPPRESSED_EMAILS_JSON_PATH", temp_json_file), \
+             patch.object(config, "SUPPRESSION_LOAD_PROGRESS_EVERY", 0):
+            assert prepare_snapshot(path)
+            store = SnapshotSuppressionStore(path)
+            assert len(store) == 4
+            store.close()
+
+            built = os.path.getmtime(path)
+            assert prepare_snapshot(path)
+            assert os.path.getmtime(path) == built
+
+            os.utime(temp_json_file, (built + 10, built + 10))
+            assert prepare_snapshot(path)
+            assert os.path.getmtime(path) > built
+
+    def test_missing_export_without_snapshot(self, tmp_path):
+        """Test that nothing is built when there is neither a snapshot nor an export"""
+        path = str(tmp_path / "shared.snap")
+        with patch.object(config, "SUPPRESSED_EMAILS_JSON_PATH", str(tmp_path / "missing.json")):
+            assert not prepare_snapshot(path)
+        assert not os.path.exists(path)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="serve.py forks its workers")
+class TestServeWorkers:
+    """Test cases running serve.py with several workers"""
+
+    @pytest.mark.parametrize("shared_index,backend", [("snapshot", "snapshot"), ("preload", "dict")])
+    def test_workers_share_the_index(self, temp_json_file, tmp_path, shared_index, backend):
+        """Test that requests are answered by distinct workers serving the same index"""
+        export = tmp_path / "export.json"
+        export.write_bytes(open(temp_json_file, "rb").read())
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        env = dict(os.environ, SUPPRESSED_EMAILS_JSON_PATH=str(export), SUPPRESSION_SNAPSHOT_PATH="",
+                   OLLAMA_WARMUP_ON_STARTUP="false", OLLAMA_HEALTH_CHECK_INTERVAL_SECONDS="0")
+        process = subprocess.Popen(
+            [sys.executable, "serve.py", "--workers", "2", "--host", "127.0.0.1", "--port", str(port),
+             "--shared-index", shared_index, "--no-access-log"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            pids = set()
+            deadline = time.time() + 30
+            while len(pids) < 2 and time.time() < deadline:
+                try:
+                    # A new connection per request, so the kernel can hand it to either worker
+                    response = httpx.get(f"http://127.0.0.1:{port}/admin/dataset")
+                except httpx.TransportError:
+                    time.sleep(0.1)
+                    continue
+                data = response.json()
+                assert data["backend"] == backend
+                assert data["entries"] == 4
+                pids.add(data["worker_pid"])
+            assert len(pids) == 2
+            assert process.pid not in pids
+
+            response = httpx.post(f"http://127.0.0.1:{port}/check-email",
+                                  json={"email": "test.bounce@example.com", "explanation_mode": "none"})
+            assert response.json()["is_suppressed"] is True
+            # Handles are per worker, so deferred mode is refused rather than 404ing later
+            response = httpx.post(f"http://127.0.0.1:{port}/check-email",
+                                  json={"email": "test.bounce@example.com", "explanation_mode": "deferred"})
+            assert response.status_code == 422
+            if shared_index == "snapshot":
+                assert (tmp_path / "export.snap").exists()
+        finally:
+            process.send_signal(signal.SIGTERM)
+            assert process.wait(timeout=30) == 0
@@ -1,11 +1,14 @@
+import asyncio
 import pytest
 import json
 import tempfile
 import os
-from unittest.mock import Mock, patch, MagicMock
+import time
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
 from datetime import datetime
 
-from services import SuppressionService, OllamaService
+from loader import IngestError
+from services import EXPLANATION_SYSTEM_PROMPT, SuppressionService, OllamaService
 from models import SuppressionInfo
 from config import config
 
@@ -31,18 +34,36 @@ class TestSuppressionService:
             assert service.suppressed_emails_data == []
     
     def test_load_suppressed_emails_invalid_json(self):
-        """Test handling of invalid JSON file"""
+        """Test that an invalid JSON file aborts start-up instead of serving an empty list"""
         with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
             f.write("invalid json content")
             temp_file = f.name
         
         try:
             with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_file):
-                service = SuppressionService()
-                assert service.suppressed_emails_data == []
+                with pytest.raises(IngestError, match="Malformed suppression export"):
+                    SuppressionService()
         finally:
             os.unlink(temp_file)
     
+    def test_truncated_export_aborts_startup(self, temp_json_file, tmp_path):
+        """Test that a truncated export fails start-up, and a reload keeps the previous version"""
+        export = tmp_path / "export.json"
+        with open(temp_json_file, 'rb') as f:
+            export.write_bytes(f.read()[:300])
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', str(export)):
+            with pytest.raises(IngestError, match="Malformed suppression export"):
+                SuppressionService()
+        
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file):
+            service = SuppressionService()
+        with open(temp_json_file, 'rb') as f:
+            export.write_bytes(f.read()[:300])
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', str(export)):
+            assert service.reload(force=True) is False
+        assert "Malformed suppression export" in service.dataset_info()["last_reload_error"]
+        assert service.check_email_suppression("test.bounce@example.com") is not None
+    
     def test_check_email_suppression_found(self, suppression_service_with_test_data):
         """Test finding a suppressed email"""
         service = suppression_service_with_test_data
@@ -68,6 +89,134 @@ class TestSuppressionService:
         assert result is not None
         assert result.email_address == "test.complaint@example.com"
     
+    def test_index_built_at_load(self, suppression_service_with_test_data):
+        """Test that loading builds a normalized lookup index"""
+        service = suppression_service_with_test_data
+        assert len(service.suppressed_emails_index) == 4
+        assert "test.bounce@example.com" in service.suppressed_emails_index
+    
+    def test_malformed_rows_reject_the_load(self, tmp_path):
+        """Test that a malformed row aborts start-up, and a reload keeps the previous version"""
+        export = tmp_path / "export.json"
+        rows = [
+            {"EmailAddress": "ok@example.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-01-15T10:30:00Z"},
+            {"EmailAddress": "bad@example.com", "Reason": "BOUNCE", "LastUpdateTime": "not-a-date"}
+        ]
+        export.write_text(json.dumps({"SuppressedDestinationSummaries": rows}))
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', str(export)):
+            with pytest.raises(IngestError, match="1 malformed row"):
+                SuppressionService()
+            
+            with patch.object(config, 'SUPPRESSION_MAX_INVALID_ROWS', 1):
+                service = SuppressionService()
+            assert service.dataset_version == 1
+            assert service.reload(force=True) is False
+            assert "1 malformed row(s)" in service.dataset_info()["last_reload_error"]
+            assert service.check_email_suppression("ok@example.com") is not None
+            
+            with patch.object(config, 'SUPPRESSION_MAX_INVALID_ROWS', 1):
+                assert service.reload(force=True) is True
+        
+        info = service.dataset_info()
+        assert info["entries"] == 1
+        assert info["last_reload_error"] is None
+        assert info["ingest"]["invalid"] == 1
+        assert info["ingest"]["loaded"] == 1
+        assert info["ingest"]["errors"][0]["email"] == "bad@example.com"
+    
+    def test_records_carry_display_fields(self, suppression_service_with_test_data):
+        """Test that hits come back with the formatted time and reason explanation precomputed"""
+        info = suppression_service_with_test_data.check_email_suppression("test.bounce@example.com")
+        
+        assert info.formatted_time == "January 20, 2024 at 02:45 PM UTC"
+        assert info.reason_explanation == suppression_service_with_test_data._get_reason_explanation("BOUNCE")
+        assert suppression_service_with_test_data.dataset_info()["ingest"]["duplicates"] == 0
+    
+    def test_index_normalizes_stored_addresses(self):
+        """Test that mixed-case addresses in the data file are still found"""
+        data = {"SuppressedDestinationSummaries": [
+            {"EmailAddress": "Mixed.Case@Example.COM", "Reason": "BOUNCE", "LastUpdateTime": "2024-01-15T10:30:00Z"}
+        ]}
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(data, f)
+            temp_file = f.name
+        
+        try:
+            with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_file):
+                service = SuppressionService()
+            result = service.check_email_suppression("mixed.case@example.com")
+            assert result is not None
+            assert result.email_address == "Mixed.Case@Example.COM"
+        finally:
+            os.unlink(temp_file)
+    
+    def test_index_keeps_first_duplicate(self):
+        """Test that duplicate addresses resolve to the first entry, as the old scan did"""
+        data = {"SuppressedDestinationSummaries": [
+            {"EmailAddress": "dup@example.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-01-15T10:30:00Z"},
+            {"EmailAddress": "DUP@example.com", "Reason": "COMPLAINT", "LastUpdateTime": "2024-02-15T10:30:00Z"}
+        ]}
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(data, f)
+            temp_file = f.name
+        
+        try:
+            with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_file):
+                service = SuppressionService()
+            assert service.check_email_suppression("dup@example.com").reason == "BOUNCE"
+        finally:
+            os.unlink(temp_file)
+    
+    def test_compact_store_backend(self, temp_json_file):
+        """Test lookups through the compact store backend"""
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file), \
+             patch.object(config, 'SUPPRESSION_STORE_BACKEND', 'compact'):
+            service = SuppressionService()
+        
+        result = service.check_email_suppression("TEST.BOUNCE@example.com")
+        assert result.reason == "BOUNCE"
+        assert result.last_update_time == "2024-01-20T14:45:30Z"
+        assert service.check_email_suppression("valid@example.com") is None
+        assert service.memory_footprint()["backend"] == "compact"
+        assert service.memory_footprint()["entries"] == 4
+    
+    def test_query_index_is_built_on_first_use(self, temp_json_file):
+        """Test that loading does not build the query index until it is asked for"""
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file):
+            service = SuppressionService()
+        
+        assert service._dataset.query_index is None
+        assert service.memory_footprint()["query_index_bytes"] == 0
+        index = service.query_index
+        assert index.query().total == 4
+        assert service.query_index is index
+        assert service.memory_footprint()["query_index_bytes"] > 0
+        with patch.object(config, 'SUPPRESSION_QUERY_INDEX_ENABLED', False):
+            service.reload(force=True)
+            assert service.query_index is None
+    
+    def test_negative_filter(self, temp_json_file):
+        """Test lookups with the Bloom filter enabled"""
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file), \
+             patch.object(config, 'SUPPRESSION_BLOOM_FILTER_ENABLED', True):
+            service = SuppressionService()
+        
+        assert service.negative_filter is not None
+        assert service.check_email_suppression("Test.Complaint@example.com").reason == "COMPLAINT"
+        assert service.check_email_suppression("valid@example.com") is None
+    
+    def test_negative_filter_disabled_by_default(self, suppression_service_with_test_data):
+        """Test that the Bloom filter is opt-in"""
+        assert suppression_service_with_test_data.negative_filter is None
+    
+    def test_check_emails_suppression_batch(self, suppression_service_with_test_data):
+        """Test vectorized lookups preserve order and case-insensitivity"""
+        service = suppression_service_with_test_data
+        results = service.check_emails_suppression(["valid@example.com", "TEST.BOUNCE@example.com"])
+        
+        assert results[0] is None
+        assert results[1].reason == "BOUNCE"
+    
     def test_format_datetime_human_readable(self, suppression_service_with_test_data):
         """Test datetime formatting"""
         service = suppression_service_with_test_data
@@ -120,6 +269,147 @@ class TestSuppressionService:
         assert "suppressed due to unknown_reason" in explanation
 
 
+class TestSuppressionReload:
+    """Test cases for hot reloading the suppression list"""
+    
+    @staticmethod
+    def _write(path, entries):
+        with open(path, 'w') as f:
+            json.dump({"SuppressedDestinationSummaries": entries}, f)
+        # Make sure the change is visible even on filesystems with coarse mtimes
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    
+    def test_reload_applies_diff(self, temp_json_file, sample_suppressed_emails):
+        """Test that a reload swaps in the new data and reports what changed"""
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file):
+            service = SuppressionService()
+            unchanged_before = service.check_email_suppression("test.unsubscribe@example.com")
+            
+            entries = sample_suppressed_emails["SuppressedDestinationSummaries"]
+            entries = [dict(entry) for entry in entries if entry["Reason"] != "REPUTATION"]
+            entries[0]["Reason"] = "BOUNCE"
+            entries.append({"EmailAddress": "new@example.com", "Reason": "COMPLAINT", "LastUpdateTime": "2024-03-01T00:00:00Z"})
+            self._write(temp_json_file, entries)
+            
+            assert service.reload() is True
+        
+        info = service.dataset_info()
+        assert info["version"] == 2
+        assert info["entries"] == 4
+        assert info["diff"] == {"added": 1, "changed": 1, "unchanged": 2, "removed": 1}
+        assert info["load_duration_seconds"] >= 0
+        assert service.check_email_suppression("test.complaint@example.com").reason == "BOUNCE"
+        assert service.check_email_suppression("test.reputation@example.com") is None
+        assert service.check_email_suppression("new@example.com") is not None
+        # Unchanged rows are carried over rather than rebuilt
+        assert service.check_email_suppression("test.unsubscribe@example.com") is unchanged_before
+    
+    def test_reload_skipped_when_source_unchanged(self, suppression_service_with_test_data, temp_json_file):
+        """Test that an unchanged source does not trigger a rebuild unless forced"""
+        service = suppression_service_with_test_data
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file):
+            assert service.reload() is False
+            assert service.dataset_info()["version"] == 1
+            assert service.reload(force=True) is True
+        assert service.dataset_info()["version"] == 2
+    
+    def test_failed_reload_keeps_current_dataset(self, temp_json_file):
+        """Test that a broken export does not replace the data being served"""
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file):
+            service = SuppressionService()
+            with open(temp_json_file, 'w') as f:
+                f.write('{"SuppressedDestinationSummaries": [')
+            
+            assert service.reload(force=True) is False
+        
+        assert service.dataset_info()["version"] == 1
+        assert service.dataset_info()["last_reload_error"]
+        assert service.check_email_suppression("test.complaint@example.com") is not None
+    
+    def test_watcher_reloads_on_change(self, temp_json_file):
+        """Test that the file watcher picks up a new export"""
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file):
+            service = SuppressionService()
+            service.start_watching(0.01)
+            try:
+                self._write(temp_json_file, [
+                    {"EmailAddress": "only@example.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-03-01T00:00:00Z"}
+                ])
+                deadline = time.time() + 5
+                while service.dataset_info()["version"] == 1 and time.time() < deadline:
+                    time.sleep(0.01)
+            finally:
+                service.stop_watching()
+        
+        assert service.dataset_info()["version"] == 2
+        assert service.check_email_suppression("only@example.com") is not None
+
+
+class TestDomainRules:
+    """Test cases for domain and wildcard rules alongside exact entries"""
+    
+    @pytest.fixture
+    def rules_file(self, tmp_path):
+        path = tmp_path / "rules.txt"
+        path.write_text("*@example.com REPUTATION 2024-05-01T00:00:00Z\n*.corp.example BOUNCE 2024-05-02T00:00:00Z\n")
+        return str(path)
+    
+    @pytest.mark.parametrize("bloom", [False, True])
+    def test_exact_entries_win_over_rules(self, temp_json_file, rules_file, bloom):
+        """Test that an address's own entry is reported before any domain rule"""
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file), \
+             patch.object(config, 'SUPPRESSION_DOMAIN_RULES_PATH', rules_file), \
+             patch.object(config, 'SUPPRESSION_BLOOM_FILTER_ENABLED', bloom):
+            service = SuppressionService()
+        
+        exact = service.check_email_suppression("Test.Bounce@example.com")
+        assert (exact.reason, exact.matched_rule) == ("BOUNCE", None)
+        rule = service.check_email_suppression("someone.else@example.com")
+        assert (rule.reason, rule.matched_rule) == ("REPUTATION", "*@example.com")
+        assert service.check_email_suppression("x@sub.example.com") is None
+        assert service.check_email_suppression("x@eu.corp.example").matched_rule == "*.corp.example"
+        
+        results = service.check_emails_suppression(["test.bounce@example.com", "a@example.com", "a@example.org"])
+        assert [info.matched_rule if info else None for info in results] == [None, "*@example.com", None]
+        assert results[0].reason == "BOUNCE"
+        assert results[2] is None
+        assert service.dataset_info()["domain_rules"] == 2
+    
+    def test_rules_reload_with_the_dataset(self, temp_json_file, rules_file):
+        """Test that editing the rules file is picked up by a reload"""
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file), \
+             patch.object(config, 'SUPPRESSION_DOMAIN_RULES_PATH', rules_file):
+            service = SuppressionService()
+            with open(rules_file, 'w') as f:
+                f.write("*@olddomain.net BOUNCE\n")
+            stat = os.stat(rules_file)
+            os.utime(rules_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            
+            assert service.reload() is True
+            assert service.check_email_suppression("a@olddomain.net").matched_rule == "*@olddomain.net"
+            assert service.check_email_suppression("a@example.com") is None
+            
+            with open(rules_file, 'w') as f:
+                f.write("not a rule\n")
+            assert service.reload(force=True) is False
+        
+        assert "rules.txt:1" in service.last_reload_error
+        assert service.check_email_suppression("a@olddomain.net") is not None
+    
+    def test_bad_rules_file_keeps_exact_entries(self, temp_json_file, tmp_path):
+        """Test that a broken rules file at start-up does not take the exact entries down with it"""
+        path = tmp_path / "rules.txt"
+        path.write_text("*@example.com\n")
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file), \
+             patch.object(config, 'SUPPRESSION_DOMAIN_RULES_PATH', str(path)):
+            service = SuppressionService()
+        
+        assert service.last_reload_error
+        assert service.check_email_suppression("test.bounce@example.com") is not None
+        assert service.check_email_suppression("a@example.com") is None
+
+
 class TestOllamaService:
     """Test cases for OllamaService"""
     
@@ -193,13 +483,24 @@ class TestOllamaService:
         assert "test@example.com is suppressed because recipient marked emails as spam" in result
         assert "January 15, 2024 at 10:30 AM UTC" in result
     
+    def test_template_explanation(self):
+        """Test the deterministic template explanation"""
+        result = OllamaService.template_explanation(
+            "test@example.com",
+            "January 15, 2024 at 10:30 AM UTC",
+            "recipient marked emails as spam"
+        )
+        
+        assert result == ("The email address test@example.com is suppressed because recipient marked emails as spam. "
+                          "This suppression was last updated on January 15, 2024 at 10:30 AM UTC.")
+    
     @patch('ollama.Client')
     def test_ollama_service_initialization(self, mock_client_class):
         """Test OllamaService initialization"""
         service = OllamaService()
         
         assert service.model == config.OLLAMA_MODEL
-        mock_client_class.assert_called_once_with(host=config.OLLAMA_BASE_URL)
+        mock_client_class.assert_called_once_with(host=config.OLLAMA_BASE_URL, timeout=config.OLLAMA_TIMEOUT_SECONDS)
     
     @patch('ollama.Client')
     def test_generate_human_explanation_parameters(self, mock_client_class):
@@ -227,7 +528,450 @@ class TestOllamaService:
         
         # Check that the prompt contains expected information
         messages = call_args[1]['messages']
-        prompt_content = messages[0]['content']
+        prompt_content = messages[-1]['content']
         assert "test@example.com" in prompt_content
         assert "BOUNCE" in prompt_content
         assert "January 15, 2024 at 10:30 AM UTC" in prompt_content
+    
+    def test_agenerate_human_explanation_success(self):
+        """Test the async path returns the cleaned model reply"""
+        with patch('ollama.AsyncClient') as mock_async_client_class:
+            mock_async_client_class.return_value.chat = AsyncMock(return_value={
+                'message': {'content': '<think>hmm</think> The email is   suppressed. '}
+            })
+            service = OllamaService()
+            result = asyncio.run(service.agenerate_human_explanation(
+                email="test@example.com",
+                reason="COMPLAINT",
+                last_update_time="2024-01-15T10:30:00Z",
+                formatted_time="January 15, 2024 at 10:30 AM UTC",
+                reason_explanation="recipient marked emails as spam"
+            ))
+        
+        assert result == "The email is suppressed."
+        mock_async_client_class.assert_called_once_with(host=config.OLLAMA_BASE_URL, timeout=config.OLLAMA_TIMEOUT_SECONDS)
+    
+    def test_agenerate_human_explanation_error_falls_back(self):
+        """Test that async failures fall back to the template"""
+        with patch('ollama.AsyncClient') as mock_async_client_class:
+            mock_async_client_class.return_value.chat = AsyncMock(side_effect=Exception("connection refused"))
+            service = OllamaService()
+            result = asyncio.run(service.agenerate_human_explanation(
+                email="test@example.com",
+                reason="COMPLAINT",
+                last_update_time="2024-01-15T10:30:00Z",
+                formatted_time="January 15, 2024 at 10:30 AM UTC",
+                reason_explanation="recipient marked emails as spam"
+            ))
+        
+        assert result == OllamaService.template_explanation(
+            "test@example.com", "January 15, 2024 at 10:30 AM UTC", "recipient marked emails as spam"
+        )
+    
+    def test_agenerate_respects_concurrency_limit_without_blocking_loop(self):
+        """Test that slow generations are capped and do not stall other coroutines"""
+        active = 0
+        peak = 0
+        
+        async def slow_chat(**kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+            return {'message': {'content': 'ok'}}
+        
+        async def run():
+            generations = [
+                asyncio.ensure_future(service.agenerate_human_explanation(
+                    f"user{i}@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced"
+                ))
+                for i in range(6)
+            ]
+            start = time.perf_counter()
+            await asyncio.sleep(0)
+            loop_latency = time.perf_counter() - start
+            return await asyncio.gather(*generations), loop_latency
+        
+        with patch('ollama.AsyncClient') as mock_async_client_class, \
+             patch.object(config, 'OLLAMA_MAX_CONCURRENCY', 2):
+            mock_async_client_class.return_value.chat = slow_chat
+            service = OllamaService()
+            results, loop_latency = asyncio.run(run())
+        
+        assert results == ["ok"] * 6
+        assert peak == 2
+        assert service.in_flight == 0
+        assert loop_latency < 0.01
+    
+    @patch('ollama.Client')
+    def test_generate_human_explanation_cached(self, mock_client_class):
+        """Test that repeated prompts are answered from the explanation cache"""
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.chat.return_value = {'message': {'content': 'Cached explanation'}}
+        
+        service = OllamaService()
+        args = ("test@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced")
+        first = service.generate_human_explanation(*args)
+        second = service.generate_human_explanation(*args)
+        
+        assert first == second == "Cached explanation"
+        mock_client.chat.assert_called_once()
+        assert service.explanation_cache.stats()["hits"] == 1
+    
+    @patch('ollama.Client')
+    def test_generate_human_explanation_fallback_not_cached(self, mock_client_class):
+        """Test that template fallbacks after an error are retried next time"""
+        mock_client = Mock()
+        mock_client_class.return_value = mock_client
+        mock_client.chat.side_effect = [Exception("timeout"), {'message': {'content': 'Recovered'}}]
+        
+        service = OllamaService()
+        args = ("test@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced")
+        service.generate_human_explanation(*args)
+        
+        assert service.generate_human_explanation(*args) == "Recovered"
+        assert mock_client.chat.call_count == 2
+    
+    def test_concurrent_async_requests_share_one_generation(self):
+        """Test that N concurrent callers with the same input produce exactly one model call"""
+        calls = 0
+        
+        async def slow_chat(**kwargs):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {'message': {'content': 'Shared explanation'}}
+        
+        async def run():
+            return await asyncio.gather(*(
+                service.agenerate_human_explanation(
+                    "test@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced"
+                )
+                for _ in range(20)
+            ))
+        
+        with patch('ollama.AsyncClient') as mock_async_client_class, \
+             patch.object(config, 'EXPLANATION_CACHE_MODE', 'off'):
+            mock_async_client_class.return_value.chat = slow_chat
+            service = OllamaService()
+            results = asyncio.run(run())
+        
+        assert calls == 1
+        assert results == ["Shared explanation"] * 20
+        stats = service.explanation_stats()
+        assert (stats["generations"], stats["coalesced"]) == (1, 19)
+    
+    @patch('ollama.Client')
+    def test_concurrent_sync_requests_share_one_generation(self, mock_client_class):
+        """Test coalescing on the threaded path, including a shared failure"""
+        import threading
+        
+        def slow_chat(**kwargs):
+            time.sleep(0.1)
+            raise Exception("model crashed")
+        
+        mock_client_class.return_value.chat = Mock(side_effect=slow_chat)
+        with patch.object(config, 'EXPLANATION_CACHE_MODE', 'off'):
+            service = OllamaService()
+        barrier = threading.Barrier(5)
+        results = []
+        
+        def caller():
+            barrier.wait()
+            results.append(service.generate_human_explanation(
+                "test@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced"
+            ))
+        
+        threads = [threading.Thread(target=caller) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert mock_client_class.return_value.chat.call_count == 1
+        assert results == [OllamaService.template_explanation("test@example.com", "January 15, 2024", "it bounced")] * 5
+    
+    def test_explanation_budget_exceeded_returns_degraded_template(self):
+        """Test that a slow model yields the template within budget, and its late reply is cached"""
+        async def slow_chat(**kwargs):
+            await asyncio.sleep(0.2)
+            return {'message': {'content': 'Late model reply'}}
+        
+        async def run():
+            args = ("test@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced")
+            start = time.perf_counter()
+            first = await service.agenerate_explanation(*args, budget_seconds=0.02)
+            elapsed = time.perf_counter() - start
+            await asyncio.sleep(0.3)
+            return first, elapsed, await service.agenerate_explanation(*args)
+        
+        with patch('ollama.AsyncClient') as mock_async_client_class:
+            mock_async_client_class.return_value.chat = slow_chat
+            service = OllamaService()
+            first, elapsed, second = asyncio.run(run())
+        
+        assert first.degraded is True
+        assert first.text == OllamaService.template_explanation("test@example.com", "January 15, 2024", "it bounced")
+        assert elapsed < 0.15
+        assert second == ("Late model reply", False)
+        assert service.explanation_stats()["degraded"]["timeout"] == 1
+    
+    def test_full_queue_rejects_immediately(self):
+        """Test that requests beyond concurrency plus queue depth are not admitted"""
+        release = None
+        
+        async def blocked_chat(**kwargs):
+            await release.wait()
+            return {'message': {'content': 'ok'}}
+        
+        async def run():
+            nonlocal release
+            release = asyncio.Event()
+            admitted = [
+                asyncio.ensure_future(service.agenerate_explanation(
+                    f"user{i}@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced"
+                ))
+                for i in range(2)
+            ]
+            await asyncio.sleep(0.01)
+            rejected = await service.agenerate_explanation(
+                "late@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced"
+            )
+            release.set()
+            return rejected, await asyncio.gather(*admitted)
+        
+        with patch('ollama.AsyncClient') as mock_async_client_class, \
+             patch.object(config, 'OLLAMA_MAX_CONCURRENCY', 1), \
+             patch.object(config, 'OLLAMA_MAX_QUEUE', 1):
+            mock_async_client_class.return_value.chat = blocked_chat
+            service = OllamaService()
+            rejected, admitted = asyncio.run(run())
+        
+        assert rejected.degraded is True
+        assert [result.degraded for result in admitted] == [False, False]
+        assert service.degraded["queue_full"] == 1
+        assert service.pending_generations == 0
+    
+    def test_burst_is_admitted_up_to_queue_depth(self):
+        """Test that a burst arriving at once cannot all pass the queue check before any is counted"""
+        calls = []
+        
+        async def chat(**kwargs):
+            calls.append(kwargs)
+            await asyncio.sleep(0.01)
+            return {'message': {'content': 'ok'}}
+        
+        async def run():
+            return await asyncio.gather(*(
+                service.agenerate_explanation(
+                    f"user{i}@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced"
+                )
+                for i in range(10)
+            ))
+        
+        with patch('ollama.AsyncClient') as mock_async_client_class, \
+             patch.object(config, 'OLLAMA_MAX_CONCURRENCY', 1), \
+             patch.object(config, 'OLLAMA_MAX_QUEUE', 1):
+            mock_async_client_class.return_value.chat = chat
+            service = OllamaService()
+            results = asyncio.run(run())
+        
+        assert len(calls) == 2
+        assert sum(result.degraded for result in results) == 8
+        assert service.degraded["queue_full"] == 8
+        assert service.pending_generations == 0
+    
+    def test_circuit_breaker_against_fake_ollama(self, fake_ollama_server):
+        """Test that an outage opens the circuit, skips the server, and a probe lets it recover"""
+        args = ("BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced")
+        
+        async def run():
+            fake_ollama_server.healthy = False
+            failing = [await service.agenerate_explanation(f"user{i}@example.com", *args) for i in range(3)]
+            calls_when_open = len(fake_ollama_server.requests)
+            rejected = await service.agenerate_explanation("another@example.com", *args)
+            skipped = len(fake_ollama_server.requests) == calls_when_open
+            
+            fake_ollama_server.healthy = True
+            probe_ok = await service.probe()
+            recovered = await service.agenerate_explanation("user0@example.com", *args)
+            return failing, rejected, skipped, probe_ok, recovered
+        
+        with patch.object(config, 'OLLAMA_BASE_URL', fake_ollama_server.url), \
+             patch.object(config, 'OLLAMA_BREAKER_FAILURE_THRESHOLD', 3), \
+             patch.object(config, 'OLLAMA_BREAKER_RECOVERY_SECONDS', 60):
+            service = OllamaService()
+            failing, rejected, skipped, probe_ok, recovered = asyncio.run(run())
+        
+        assert all(result.degraded for result in failing)
+        assert rejected.degraded is True
+        assert skipped
+        assert service.degraded["circuit_open"] == 1
+        assert probe_ok is True
+        assert service.last_probe["model_available"] is True
+        assert recovered == ("Fake model explanation", False)
+        assert service.breaker.state == "closed"
+        assert service.breaker.times_opened == 1
+    
+    def test_batch_generation_with_per_item_fallback(self, fake_ollama_server):
+        """Test one prompt per batch, with records missing from the reply generated singly"""
+        fake_ollama_server.drop_ids = {1}
+        items = [
+            (f"user{i}@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced")
+            for i in range(5)
+        ]
+        with patch.object(config, 'OLLAMA_BASE_URL', fake_ollama_server.url), \
+             patch.object(config, 'OLLAMA_BATCH_SIZE', 4):
+            service = OllamaService()
+            results = asyncio.run(service.agenerate_batch(items))
+        
+        assert fake_ollama_server.batch_sizes == [4]
+        assert results[0] == ("Batch explanation for user0@example.com.", False)
+        assert results[1] == ("Fake model explanation", False)
+        assert results[4] == ("Fake model explanation", False)
+        assert service.batch_fallbacks == 1
+        assert len(service.explanation_cache) == 5
+    
+    def test_batch_rejects_mislabelled_replies(self, fake_ollama_server):
+        """Test that an explanation naming another record's address is regenerated singly, not cached"""
+        fake_ollama_server.mislabel = {0: 1, 1: 0}
+        items = [
+            (f"user{i}@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced")
+            for i in range(3)
+        ]
+        with patch.object(config, 'OLLAMA_BASE_URL', fake_ollama_server.url):
+            service = OllamaService()
+            results = asyncio.run(service.agenerate_batch(items))
+        
+        assert results[0] == results[1] == ("Fake model explanation", False)
+        assert results[2] == ("Batch explanation for user2@example.com.", False)
+        assert service.batch_fallbacks == 2
+        assert service.explanation_cache.get("user0@example.com", "BOUNCE", "January 15, 2024") == "Fake model explanation"
+    
+    def test_batch_fallbacks_share_the_budget(self):
+        """Test that records retried singly get what is left of the budget, not a fresh one"""
+        items = [
+            (f"user{i}@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced")
+            for i in range(2)
+        ]
+        
+        async def slow_batch(batch):
+            await asyncio.sleep(0.2)
+            return {}
+        
+        async def scenario():
+            service = OllamaService()
+            with patch.object(service, '_agenerate_batch', slow_batch), \
+                 patch.object(service, 'agenerate_explanation', AsyncMock()) as single:
+                timed_out = await service.agenerate_batch(items, budget_seconds=0.05)
+                assert not single.called
+                await service.agenerate_batch(items, budget_seconds=1.0)
+                budgets = [call.kwargs["budget_seconds"] for call in single.call_args_list]
+            return service, timed_out, budgets
+        
+        service, timed_out, budgets = asyncio.run(scenario())
+        assert all(result.degraded for result in timed_out)
+        assert service.degraded["timeout"] == 2
+        assert len(budgets) == 2 and all(0 < budget < 0.85 for budget in budgets)
+    
+    def test_batch_timeout_releases_half_open_trial(self):
+        """Test that a batch abandoned by its budget or cancelled gives back the half-open trial"""
+        items = [
+            (f"user{i}@example.com", "BOUNCE", "2024-01-15T10:30:00Z", "January 15, 2024", "it bounced")
+            for i in range(2)
+        ]
+        
+        async def slow_chat(**kwargs):
+            await asyncio.sleep(1)
+            return {'message': {'content': '{"explanations": []}'}}
+        
+        async def scenario():
+            service.breaker.record_failure()
+            service.breaker.record_probe(True)
+            timed_out = await service.agenerate_batch(items, budget_seconds=0.1)
+            after_timeout = service.breaker.allow_request()
+            service.breaker.release_trial()
+            
+            task = asyncio.ensure_future(service.agenerate_batch(items, budget_seconds=0))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return timed_out, after_timeout, service.breaker.allow_request()
+        
+        with patch('ollama.AsyncClient') as mock_async_client_class, \
+             patch.object(config, 'OLLAMA_BREAKER_FAILURE_THRESHOLD', 1):
+            mock_async_client_class.return_value.chat = slow_chat
+            service = OllamaService()
+            timed_out, after_timeout, after_cancel = asyncio.run(scenario())
+        
+        assert all(result.degraded for result in timed_out)
+        assert service.degraded["circuit_open"] == 0
+        assert after_timeout is True
+        assert after_cancel is True
+        assert service.breaker.state == "half_open"
+        assert service.pending_generations == 0
+    
+    def test_prompt_layout_keeps_shared_prefix(self):
+        """Test that instructions sit in a fixed system message and only the record varies"""
+        service = OllamaService()
+        first = service._build_messages("a@example.com", "BOUNCE", "January 15, 2024", "it bounced")
+        second = service._build_messages("b@example.com", "BOUNCE", "January 16, 2024", "it bounced")
+        
+        assert first[0] == second[0] == {"role": "system", "content": EXPLANATION_SYSTEM_PROMPT}
+        assert "a@example.com" not in first[0]["content"]
+        assert first[1]["role"] == "user"
+        assert first[1]["content"].endswith("Email: a@example.com")
+        assert "Reason: BOUNCE" in first[1]["content"]
+    
+    def test_keep_alive_is_sent_with_requests(self):
+        """Test that OLLAMA_KEEP_ALIVE reaches Ollama, with plain numbers sent as seconds"""
+        with patch('ollama.Client') as mock_client_class, \
+             patch.object(config, 'OLLAMA_KEEP_ALIVE', '-1'):
+            mock_client_class.return_value.chat.return_value = {'message': {'content': 'Explained.'}}
+            service = OllamaService()
+            service.generate_human_explanation("test@example.com", "BOUNCE", "2024-01-15T10:30:00Z",
+                                               "January 15, 2024", "it bounced")
+        
+        assert mock_client_class.return_value.chat.call_args[1]['keep_alive'] == -1.0
+        assert OllamaService._keep_alive_value("30m") == "30m"
+        assert OllamaService._keep_alive_value(" ") is None
+    
+    def test_warm_up_loads_model_with_system_prompt(self):
+        """Test that warm-up sends the real system prompt and asks for a single token"""
+        with patch('ollama.AsyncClient') as mock_async_client_class:
+            chat = mock_async_client_class.return_value.chat = AsyncMock(return_value={'message': {'content': 'T'}})
+            service = OllamaService()
+            assert asyncio.run(service.warm_up()) is True
+        
+        kwargs = chat.call_args[1]
+        assert kwargs['messages'][0]['content'] == EXPLANATION_SYSTEM_PROMPT
+        assert kwargs['options'] == {"num_predict": 1}
+        assert kwargs['keep_alive'] == service.keep_alive
+        assert service.health()["last_warm_up"]["ok"] is True
+        assert len(service.explanation_cache) == 0
+    
+    def test_warm_up_failure_leaves_breaker_closed(self):
+        """Test that a failed warm-up is recorded but does not count against the circuit breaker"""
+        with patch('ollama.AsyncClient') as mock_async_client_class:
+            mock_async_client_class.return_value.chat = AsyncMock(side_effect=Exception("connection refused"))
+            service = OllamaService()
+            assert asyncio.run(service.warm_up()) is False
+        
+        assert service.last_warm_up["ok"] is False
+        assert "connection refused" in service.last_warm_up["error"]
+        assert service.breaker.stats()["consecutive_failures"] == 0
+    
+    def test_parse_batch_reply(self):
+        """Test that only well-formed, in-range entries are accepted"""
+        content = (
+            '<think>plan</think>```json\n{"explanations": [{"id": 0, "explanation": " First  one. "}, '
+            '{"id": 7, "explanation": "out of range"}, {"id": 1, "explanation": ""}, "junk"]}\n```'
+        )
+        
+        assert OllamaService._parse_batch_reply(content, 2) == {0: "First one."}
+        assert OllamaService._parse_batch_reply("not json", 2) == {}
+        assert OllamaService._parse_batch_reply('{"explanations": 3}', 2) == {}
+
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+class TestSingleFlight:
+    """Test cases for thread-based call coalescing"""
+
+    def test_concurrent_callers_share_one_call(self):
+        """Test that callers arriving during a slow call get its result"""
+        flight = SingleFlight()
+        calls = []
+        barrier = threading.Barrier(8)
+        results = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return "value"
+
+        def caller():
+            barrier.wait()
+            results.append(flight.do("key", slow))
+
+        threads = [threading.Thread(target=caller) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert calls == [1]
+        assert results == ["value"] * 8
+        assert (flight.leaders, flight.shared) == (1, 7)
+
+    def test_errors_reach_every_waiter_and_are_not_remembered(self):
+        """Test that a failure is shared, then the next call runs again"""
+        flight = SingleFlight()
+
+        def boom():
+            raise RuntimeError("down")
+
+        with pytest.raises(RuntimeError):
+            flight.do("key", boom)
+        assert flight.do("key", lambda: "ok") == "ok"
+        assert flight.leaders == 2
+
+
+class TestAsyncSingleFlight:
+    """Test cases for asyncio call coalescing"""
+
+    def test_distinct_keys_run_separately(self):
+        """Test that different keys never share a call"""
+        flight = AsyncSingleFlight()
+
+        async def value(v):
+            await asyncio.sleep(0.01)
+            return v
+
+        async def run():
+            return await asyncio.gather(*(flight.do(k, lambda k=k: value(k)) for k in "abca"))
+
+        assert asyncio.run(run()) == ["a", "b", "c", "a"]
+        assert (flight.leaders, flight.shared) == (3, 1)
+        assert len(flight) == 0
+
+    def test_leader_cancellation_does_not_cancel_followers(self):
+        """Test that a cancelled first caller leaves the shared work running"""
+        flight = AsyncSingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def run():
+            leader = asyncio.ensure_future(flight.do("key", slow))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.do("key", slow))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await follower
+
+        assert asyncio.run(run()) == "done"
+
+    def test_start_reports_the_leader_synchronously(self):
+        """Test that start creates the task at once and tells the caller whether it did"""
+        flight = AsyncSingleFlight()
+
+        async def value():
+            return "v"
+
+        async def run():
+            first, started = flight.start("key", value)
+            second, joined = flight.start("key", value)
+            assert (started, joined) == (True, False)
+            assert first is second and "key" in flight
+            return await first
+
+        assert asyncio.run(run()) == "v"
+        assert (flight.leaders, flight.shared) == (1, 1)
@@ -0,0 +1,153 @@
+import pytest
+import json
+import os
+from unittest.mock import patch
+
+from config import config
+from loader import IngestError
+from services import SuppressionService
+from snapshot import SnapshotError, SnapshotSuppressionStore, build_snapshot, main
+
+
+@pytest.fixture
+def snapshot_path(temp_json_file, tmp_path):
+    """A snapshot compiled from the sample export"""
+    path = str(tmp_path / "suppressed.snap")
+    build_snapshot(temp_json_file, path, progress_every=0)
+    return path
+
+
+class TestSnapshot:
+    """Test cases for the mmapped binary snapshot"""
+
+    def test_lookups_match_json(self, snapshot_path, sample_suppressed_emails):
+        """Test that every exported entry is served from the snapshot"""
+        store = SnapshotSuppressionStore(snapshot_path)
+        try:
+            assert len(store) == 4
+            for item in sample_suppressed_emails["SuppressedDestinationSummaries"]:
+                info = store.get(item["EmailAddress"])
+                assert info.email_address == item["EmailAddress"]
+                assert info.reason == item["Reason"]
+                assert info.last_update_time == item["LastUpdateTime"]
+            assert store.get("valid@example.com") is None
+        finally:
+            store.close()
+
+    def test_overflow_values_survive(self, tmp_path):
+        """Test that original casing and non-canonical timestamps are persisted"""
+        export = tmp_path / "export.json"
+        export.write_text(json.dumps({"SuppressedDestinationSummaries": [
+            {"EmailAddress": "Mixed@Example.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-01-15T10:30:00.5+01:00"}
+        ]}))
+        path = str(tmp_path / "export.snap")
+        build_snapshot(str(export), path, progress_every=0)
+
+        store = SnapshotSuppressionStore(path)
+        try:
+            info = store.get("mixed@example.com")
+            assert info.email_address == "Mixed@Example.com"
+            assert info.last_update_time == "2024-01-15T10:30:00.5+01:00"
+            assert info.formatted_time == "January 15, 2024 at 09:30 AM UTC"
+        finally:
+            store.close()
+
+    def test_malformed_export_writes_nothing(self, tmp_path):
+        """Test that a malformed row stops the build before a snapshot is written"""
+        export = tmp_path / "export.json"
+        export.write_text(json.dumps({"SuppressedDestinationSummaries": [
+            {"EmailAddress": "a@example.com", "Reason": "BOUNCE", "LastUpdateTime": "not-a-date"}
+        ]}))
+        path = str(tmp_path / "export.snap")
+
+        with pytest.raises(IngestError):
+            build_snapshot(str(export), path, progress_every=0)
+        assert not os.path.exists(path)
+        assert main(["build", str(export), path]) == 1
+        assert main(["build", str(export), path, "--max-invalid", "1"]) == 0
+        store = SnapshotSuppressionStore(path)
+        assert len(store) == 0
+        store.close()
+
+    def test_read_only(self, snapshot_path):
+        """Test that a mapped snapshot cannot be modified"""
+        store = SnapshotSuppressionStore(snapshot_path)
+        try:
+            with pytest.raises(TypeError):
+                store.add("a@example.com", "a@example.com", "BOUNCE", "2024-01-15T10:30:00Z")
+        finally:
+            store.close()
+
+    def test_rejects_non_snapshot_file(self, temp_json_file):
+        """Test that arbitrary files are rejected"""
+        with pytest.raises(SnapshotError):
+            SnapshotSuppressionStore(temp_json_file)
+
+    def test_rejects_truncated_file(self, snapshot_path):
+        """Test that a truncated snapshot is rejected"""
+        with open(snapshot_path, "r+b") as f:
+            f.truncate(os.path.getsize(snapshot_path) // 2)
+
+        with pytest.raises(SnapshotError):
+            SnapshotSuppressionStore(snapshot_path)
+
+    def test_service_uses_snapshot(self, snapshot_path):
+        """Test that SuppressionService maps a configured snapshot instead of parsing JSON"""
+        with patch.object(config, 'SUPPRESSION_SNAPSHOT_PATH', snapshot_path), \
+             patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', 'nonexistent.json'):
+            service = SuppressionService()
+
+        assert service.suppressed_emails_index.backend == "snapshot"
+        assert service.check_email_suppression("TEST.COMPLAINT@example.com").reason == "COMPLAINT"
+
+    def test_service_falls_back_to_json(self, temp_json_file, tmp_path):
+        """Test that a missing snapshot falls back to the JSON export"""
+        with patch.object(config, 'SUPPRESSION_SNAPSHOT_PATH', str(tmp_path / "missing.snap")), \
+             patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file):
+            service = SuppressionService()
+
+        assert service.suppressed_emails_index.backend == config.SUPPRESSION_STORE_BACKEND
+        assert len(service.suppressed_emails_index) == 4
+
+    def test_reload_rebuilds_stale_snapshot(self, temp_json_file, sample_suppressed_emails, snapshot_path):
+        """Test that a reload after a new export rebuilds the snapshot instead of serving the old one"""
+        with patch.object(config, 'SUPPRESSION_SNAPSHOT_PATH', snapshot_path), \
+             patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file):
+            service = SuppressionService()
+            sample_suppressed_emails["SuppressedDestinationSummaries"].append(
+                {"EmailAddress": "new@example.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-02-01T00:00:00Z"}
+            )
+            with open(temp_json_file, "w") as f:
+                json.dump(sample_suppressed_emails, f)
+            os.utime(snapshot_path, (os.path.getmtime(temp_json_file) - 10,) * 2)
+
+            assert service.reload()
+            assert service.suppressed_emails_index.backend == "snapshot"
+            assert service.check_email_suppression("new@example.com") is not None
+            assert not service.reload()
+
+    def test_reload_keeps_version_when_rebuild_fails(self, temp_json_file, snapshot_path):
+        """Test that an export that cannot be compiled is not replaced by the old snapshot"""
+        with patch.object(config, 'SUPPRESSION_SNAPSHOT_PATH', snapshot_path), \
+             patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', temp_json_file):
+            service = SuppressionService()
+            with open(temp_json_file, "w") as f:
+                json.dump({"SuppressedDestinationSummaries": [
+                    {"EmailAddress": "a@example.com", "Reason": "BOUNCE", "LastUpdateTime": "not-a-date"}
+                ]}, f)
+            os.utime(snapshot_path, (os.path.getmtime(temp_json_file) - 10,) * 2)
+
+            assert not service.reload()
+            assert service.dataset_version == 1
+            assert service.last_reload_error
+
+    def test_cli_build_and_info(self, temp_json_file, tmp_path, capsys):
+        """Test the build and info commands"""
+        path = str(tmp_path / "cli.snap")
+
+        assert main(["build", temp_json_file, path]) == 0
+        assert main(["info", path]) == 0
+
+        output = capsys.readouterr().out
+        assert "Wrote 4 suppressed emails" in output
+        assert '"entries": 4' in output
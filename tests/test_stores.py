@@ -0,0 +1,158 @@
+import pytest
+
+from stores import (
+    CompactSuppressionStore, DictSuppressionStore, INVALID_EPOCH,
+    SuppressionRecord, create_store, format_epoch, format_human, parse_epoch
+)
+
+
+@pytest.fixture(params=["dict", "compact"])
+def store(request):
+    """An empty store for each backend"""
+    return create_store(request.param)
+
+
+class TestSuppressionStores:
+    """Behaviour shared by every store backend"""
+
+    def test_add_and_get(self, store):
+        """Test that an added entry is returned as a SuppressionRecord"""
+        assert store.add("a@example.com", "a@example.com", "BOUNCE", "2024-01-15T10:30:00Z") is True
+
+        result = store.get("a@example.com")
+
+        assert result == SuppressionRecord.parse("a@example.com", "BOUNCE", "2024-01-15T10:30:00Z")
+        assert "a@example.com" in store
+        assert store.get("b@example.com") is None
+        assert "b@example.com" not in store
+
+    def test_duplicate_keeps_first(self, store):
+        """Test that the first entry for a key wins"""
+        store.add("dup@example.com", "dup@example.com", "BOUNCE", "2024-01-15T10:30:00Z")
+
+        assert store.add("dup@example.com", "DUP@example.com", "COMPLAINT", "2024-02-15T10:30:00Z") is False
+        assert store.get("dup@example.com").reason == "BOUNCE"
+        assert len(store) == 1
+
+    def test_original_values_round_trip(self, store):
+        """Test that original casing and non-canonical timestamps are returned verbatim"""
+        store.add("mixed@example.com", "Mixed@Example.com", "COMPLAINT", "2024-01-15T10:30:00.123+02:00")
+        store.add("bad@example.com", "bad@example.com", "BOUNCE", "not-a-date")
+
+        assert store.get("mixed@example.com").email_address == "Mixed@Example.com"
+        assert store.get("mixed@example.com").last_update_time == "2024-01-15T10:30:00.123+02:00"
+        assert store.get("bad@example.com").last_update_time == "not-a-date"
+
+    def test_display_fields_derived_at_ingest(self, store):
+        """Test that records carry the parsed timestamp and their display strings"""
+        store.add("a@example.com", "a@example.com", "BOUNCE", "2024-01-15T12:30:45+02:00")
+        store.add("bad@example.com", "bad@example.com", "SOMETHING_ELSE", "not-a-date")
+
+        record = store.get("a@example.com")
+        assert record.last_update_epoch == parse_epoch("2024-01-15T10:30:45Z")
+        assert record.formatted_time == "January 15, 2024 at 10:30 AM UTC"
+        assert record.reason_explanation.startswith("emails to this address consistently bounce back")
+        assert "last_update_epoch" not in record.model_dump()
+
+        bad = store.get("bad@example.com")
+        assert bad.formatted_time == "not-a-date"
+        assert bad.reason_explanation == "the email was suppressed due to something_else"
+
+    def test_many_entries_and_iteration_order(self, store):
+        """Test growth past the initial capacity and file-order iteration"""
+        for i in range(5000):
+            store.add(f"user{i}@example.com", f"user{i}@example.com", "UNSUBSCRIBE", "2024-01-15T10:30:00Z")
+
+        assert len(store) == 5000
+        assert all(f"user{i}@example.com" in store for i in range(0, 5000, 37))
+        assert [info.email_address for info in store][:3] == ["user0@example.com", "user1@example.com", "user2@example.com"]
+
+    @pytest.mark.parametrize("fields,expected", [
+        (("Mixed@Example.com", "COMPLAINT", "2024-01-15T10:30:00Z"), True),
+        (("mixed@example.com", "COMPLAINT", "2024-01-15T10:30:00Z"), False),
+        (("Mixed@Example.com", "BOUNCE", "2024-01-15T10:30:00Z"), False),
+        (("Mixed@Example.com", "COMPLAINT", "2024-01-15T10:30:01Z"), False),
+        (("Mixed@Example.com", "COMPLAINT", "2024-01-15T10:30:00+00:00"), False),
+    ])
+    def test_matches(self, store, fields, expected):
+        """Test the reload diff comparison, field by field"""
+        store.add("mixed@example.com", "Mixed@Example.com", "COMPLAINT", "2024-01-15T10:30:00Z")
+        store.add("odd@example.com", "odd@example.com", "BOUNCE", "2024-01-15T10:30:00.5Z")
+
+        assert store.matches("mixed@example.com", *fields) is expected
+        assert store.matches("mixed@example.com", *fields, parse_epoch(fields[2])) is expected
+        assert store.matches("odd@example.com", "odd@example.com", "BOUNCE", "2024-01-15T10:30:00.5Z") is True
+        assert store.matches("odd@example.com", "odd@example.com", "BOUNCE", "2024-01-15T10:30:00Z") is False
+        assert store.matches("absent@example.com", "absent@example.com", "BOUNCE", "2024-01-15T10:30:00Z") is None
+
+    def test_memory_footprint_positive(self, store):
+        """Test that every backend reports a footprint"""
+        store.add("a@example.com", "a@example.com", "BOUNCE", "2024-01-15T10:30:00Z")
+        assert store.memory_footprint() > 0
+
+
+class TestCompactSuppressionStore:
+    """Test cases specific to the columnar store"""
+
+    def test_reasons_are_interned(self):
+        """Test that repeated reasons share one code"""
+        store = CompactSuppressionStore()
+        for i in range(10):
+            store.add(f"u{i}@example.com", f"u{i}@example.com", "BOUNCE" if i % 2 else "COMPLAINT", "2024-01-15T10:30:00Z")
+
+        assert store._reason_names == ["COMPLAINT", "BOUNCE"]
+
+    def test_invalid_timestamp_uses_sentinel_epoch(self):
+        """Test that unparsable timestamps are kept verbatim with a sentinel epoch"""
+        store = CompactSuppressionStore()
+        store.add("bad@example.com", "bad@example.com", "BOUNCE", "not-a-date")
+
+        assert store._epochs[0] == INVALID_EPOCH
+
+    def test_rejects_non_string_fields(self):
+        """Test that malformed rows are rejected like the pydantic model would"""
+        store = CompactSuppressionStore()
+        with pytest.raises(TypeError):
+            store.add("a@example.com", "a@example.com", None, "2024-01-15T10:30:00Z")
+
+    def test_matches_builds_no_records(self, monkeypatch):
+        """Test that the reload diff compares the packed columns instead of materializing each row"""
+        store = CompactSuppressionStore()
+        for i in range(100):
+            store.add(f"user{i}@example.com", f"user{i}@example.com", "BOUNCE", "2024-01-15T10:30:00Z")
+        monkeypatch.setattr(store, "_materialize", lambda row: pytest.fail("built a record"))
+
+        assert all(store.matches(f"user{i}@example.com", f"user{i}@example.com", "BOUNCE", "2024-01-15T10:30:00Z",
+                                 parse_epoch("2024-01-15T10:30:00Z")) for i in range(100))
+
+    def test_smaller_than_dict_store(self):
+        """Test that the compact store is substantially smaller than the dict store"""
+        compact, plain = CompactSuppressionStore(), DictSuppressionStore()
+        for i in range(2000):
+            for store in (compact, plain):
+                store.add(f"user{i}@example.com", f"user{i}@example.com", "BOUNCE", "2024-01-15T10:30:00Z")
+
+        assert compact.memory_footprint() * 3 < plain.memory_footprint()
+
+
+class TestEpochHelpers:
+    """Test cases for timestamp conversion"""
+
+    def test_canonical_round_trip(self):
+        """Test parse/format round trip for SES timestamps"""
+        assert format_epoch(parse_epoch("2024-01-15T10:30:00Z")) == "2024-01-15T10:30:00Z"
+
+    def test_human_format_shared_per_minute(self):
+        """Test that timestamps within one minute share one formatted string"""
+        first = format_human(parse_epoch("2024-01-15T10:30:05Z"))
+        assert first == "January 15, 2024 at 10:30 AM UTC"
+        assert format_human(parse_epoch("2024-01-15T10:30:59Z")) is first
+
+    def test_offsets_are_normalized_to_utc(self):
+        """Test that timezone offsets are applied"""
+        assert parse_epoch("2024-01-15T12:30:00+02:00") == parse_epoch("2024-01-15T10:30:00Z")
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend name is rejected"""
+        with pytest.raises(ValueError):
+            create_store("nope")
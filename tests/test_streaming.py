@@ -0,0 +1,50 @@
+import pytest
+
+from services import OllamaService
+from streaming import ThinkTagStripper, sse_event
+
+
+def strip_in_chunks(text, size):
+    """Feed ``text`` to a fresh stripper in ``size``-character chunks"""
+    stripper = ThinkTagStripper()
+    pieces = [stripper.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    return "".join(pieces) + stripper.flush()
+
+
+class TestThinkTagStripper:
+    """Test cases for incremental thinking-tag removal"""
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+    @pytest.mark.parametrize("reply", [
+        "<think>Let me think about this...</think>The email is suppressed due to complaints.<thinking>More thinking</thinking>",
+        "  The address\n\nbounced   <think>hmm</think> twice.  ",
+        "a < b and <thin>x</thin> stay visible",
+        "<thinking>never closed",
+        "Visible <think>never closed</thinking> either",
+        "<thinking>a<think>b</thinking>c</think> d",
+    ])
+    def test_matches_whole_reply_cleaning(self, reply, size):
+        """Test that any chunking gives the same text as cleaning the full reply"""
+        assert strip_in_chunks(reply, size) == OllamaService._clean_content(reply)
+
+    def test_unclosed_block_hides_the_rest(self):
+        """Test that an unclosed thinking block is dropped to the end by both cleaners"""
+        assert OllamaService._clean_content("Answer. <think>still reasoning") == "Answer."
+        assert strip_in_chunks("Answer. <think>still reasoning", 4) == "Answer."
+
+    def test_thinking_is_not_released_early(self):
+        """Test that a partial opening tag is held back rather than shown"""
+        stripper = ThinkTagStripper()
+
+        assert stripper.feed("Hello <thi") == "Hello"
+        assert stripper.feed("nk>secret") == ""
+        assert stripper.feed("</think> world") == " world"
+
+
+class TestSSE:
+    """Test cases for server-sent event encoding"""
+
+    def test_sse_event(self):
+        """Test the event framing"""
+        assert sse_event("token", {"text": "hi"}) == 'event: token\ndata: {"text": "hi"}\n\n'
+
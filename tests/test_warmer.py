@@ -0,0 +1,114 @@
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import patch
+
+from config import config
+from services import OllamaService, SuppressionService
+from warmer import ExplanationWarmer
+
+
+@pytest.fixture
+def fake_ollama_service(fake_ollama_server):
+    """OllamaService wired to the local fake Ollama server"""
+    with patch.object(config, 'OLLAMA_BASE_URL', fake_ollama_server.url):
+        return OllamaService()
+
+
+class TestExplanationWarmer:
+    """Test cases for background explanation pre-generation"""
+
+    @pytest.fixture(params=[True, False], ids=["query-index", "epoch-column"])
+    def query_index_enabled(self, request):
+        """Plan "recent" from the query index, and from the store's epochs without one"""
+        with patch.object(config, 'SUPPRESSION_QUERY_INDEX_ENABLED', request.param):
+            yield request.param
+
+    def test_plan_priorities(self, suppression_service_with_test_data, fake_ollama_service, query_index_enabled):
+        """Test recent, dataset and hot ordering"""
+        warmer = ExplanationWarmer(suppression_service_with_test_data, fake_ollama_service, priority="recent")
+        recent = [info.email_address for info in warmer.plan()]
+        assert recent[0] == "test.reputation@example.com"
+        assert recent[-1] == "test.complaint@example.com"
+
+        warmer.set_controls(priority="dataset")
+        assert warmer.plan()[0].email_address == "test.complaint@example.com"
+
+        warmer.set_controls(priority="hot")
+        warmer.record_hit("test.bounce@example.com")
+        warmer.record_hit("test.bounce@example.com")
+        warmer.record_hit("nobody@example.com")
+        hot = [info.email_address for info in warmer.plan()]
+        assert hot[0] == "test.bounce@example.com"
+        assert sorted(hot) == sorted(recent)
+
+    def test_recent_compares_instants(self, tmp_path, fake_ollama_service, query_index_enabled):
+        """Test that recent ranks by the parsed time, not by the text of LastUpdateTime"""
+        export = tmp_path / "export.json"
+        export.write_text(json.dumps({"SuppressedDestinationSummaries": [
+            {"EmailAddress": "offset@example.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-01-15T10:30:00+05:00"},
+            {"EmailAddress": "utc@example.com", "Reason": "BOUNCE", "LastUpdateTime": "2024-01-15T08:00:00Z"},
+            {"EmailAddress": "old@example.com", "Reason": "BOUNCE", "LastUpdateTime": "2023-12-01T00:00:00Z"}
+        ]}))
+        with patch.object(config, 'SUPPRESSED_EMAILS_JSON_PATH', str(export)):
+            service = SuppressionService()
+        warmer = ExplanationWarmer(service, fake_ollama_service, priority="recent", max_entries=2)
+
+        assert [info.email_address for info in warmer.plan()] == ["utc@example.com", "offset@example.com"]
+
+    def test_plan_limited_by_max_entries(self, suppression_service_with_test_data, fake_ollama_service):
+        """Test that at most max_entries are planned"""
+        warmer = ExplanationWarmer(suppression_service_with_test_data, fake_ollama_service, max_entries=2)
+
+        assert len(warmer.plan()) == 2
+
+    def test_run_once_fills_cache_then_skips(self, suppression_service_with_test_data, fake_ollama_service, fake_ollama_server):
+        """Test that a pass generates every explanation and a second pass has nothing to do"""
+        fake_ollama_service.batch_size = 1
+        warmer = ExplanationWarmer(suppression_service_with_test_data, fake_ollama_service, rate_per_second=100)
+
+        async def run():
+            await warmer.run_once()
+            first = warmer.status()
+            await warmer.run_once()
+            return first, warmer.status()
+
+        first, second = asyncio.run(run())
+
+        assert (first["planned"], first["generated"], first["failed"], first["progress"]) == (4, 4, 0, 1.0)
+        assert (second["generated"], second["skipped"]) == (0, 4)
+        chats = [path for method, path in fake_ollama_server.requests if path == "/api/chat"]
+        assert len(chats) == 4
+        assert len(fake_ollama_service.explanation_cache) == 4
+
+    def test_rate_limit(self, suppression_service_with_test_data, fake_ollama_service):
+        """Test that generations are spaced by the configured rate"""
+        fake_ollama_service.batch_size = 1
+        warmer = ExplanationWarmer(suppression_service_with_test_data, fake_ollama_service, rate_per_second=10)
+
+        start = time.perf_counter()
+        asyncio.run(warmer.run_once())
+
+        assert time.perf_counter() - start >= 0.3
+        assert warmer.generated == 4
+
+    def test_run_once_batches_prompts(self, suppression_service_with_test_data, fake_ollama_service, fake_ollama_server):
+        """Test that uncached records are warmed several per prompt"""
+        fake_ollama_service.batch_size = 3
+        warmer = ExplanationWarmer(suppression_service_with_test_data, fake_ollama_service, rate_per_second=100)
+
+        asyncio.run(warmer.run_once())
+
+        assert fake_ollama_server.batch_sizes == [3]
+        assert warmer.generated == 4
+        assert len(fake_ollama_service.explanation_cache) == 4
+
+    def test_invalid_controls(self, suppression_service_with_test_data, fake_ollama_service):
+        """Test that bad rates and priorities are rejected"""
+        warmer = ExplanationWarmer(suppression_service_with_test_data, fake_ollama_service)
+
+        with pytest.raises(ValueError):
+            warmer.set_controls(rate_per_second=0)
+        with pytest.raises(ValueError):
+            warmer.set_controls(priority="random")
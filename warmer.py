@@ -0,0 +1,229 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from circuit_breaker import CLOSED
+from stores import SuppressionRecord
+
+WARMER_PRIORITIES = ("hot", "recent", "dataset")
+
+
+class ExplanationWarmer:
+    """
+    Pre-generates explanations for suppressed addresses in the background.
+
+    After each dataset load or reload it plans up to ``max_entries`` entries (by default
+    the explanation cache capacity) and generates their explanations at no more than
+    ``rate_per_second``, so lookups on those entries are served from the cache. Priority:
+
+    * ``recent`` - newest ``LastUpdateTime`` first, so freshly changed entries are ready first
+    * ``hot`` - addresses most often hit on /check-email first, then ``recent``
+    * ``dataset`` - store order
+
+    Uncached records are sent OLLAMA_BATCH_SIZE at a time as one batched prompt. The warmer
+    backs off while live requests occupy every Ollama slot or the circuit breaker is not
+    closed, and restarts its plan when a newer dataset version appears.
+    """
+
+    def __init__(self, suppression_service, ollama_service, rate_per_second: float = 1.0,
+                 priority: str = "recent", max_entries: int = 0, hot_capacity: int = 10000,
+                 poll_seconds: float = 5.0):
+        self.suppression_service = suppression_service
+        self.ollama_service = ollama_service
+        self.set_controls(rate_per_second, priority)
+        self.max_entries = max_entries
+        self.hot_capacity = hot_capacity
+        self.poll_seconds = poll_seconds
+        self._hot: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+        self._paused = False
+        self._next_slot = 0.0
+        self._warmed_version: Optional[int] = None
+        self._replan = False
+        self.state = "stopped"
+        self._reset_progress(None, 0)
+
+    def set_controls(self, rate_per_second: Optional[float] = None, priority: Optional[str] = None) -> None:
+        if rate_per_second is not None:
+            if rate_per_second <= 0:
+                raise ValueError("rate_per_second must be positive")
+            self.rate_per_second = rate_per_second
+        if priority is not None:
+            if priority not in WARMER_PRIORITIES:
+                raise ValueError(f"priority must be one of {WARMER_PRIORITIES}")
+            # A running pass re-plans the current dataset in the new order
+            self._replan = getattr(self, "priority", priority) != priority
+            self.priority = priority
+
+    def _reset_progress(self, version: Optional[int], planned: int) -> None:
+        self.dataset_version = version
+        self.planned = planned
+        self.processed = 0
+        self.generated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.pass_started = time.time()
+
+    def record_hit(self, email: str) -> None:
+        """Count a suppressed hit for ``hot`` priority; cheap enough for the request path"""
+        self._hot[email] += 1
+        if len(self._hot) > self.hot_capacity:
+            self._hot = Counter(dict(self._hot.most_common(self.hot_capacity // 2)))
+
+    def _limit(self) -> int:
+        cache = self.ollama_service.explanation_cache
+        if not cache.enabled:
+            return 0
+        return min(self.max_entries, cache.max_entries) if self.max_entries > 0 else cache.max_entries
+
+    def plan(self) -> List[SuppressionRecord]:
+        """Entries of the current dataset to warm, in priority order"""
+        store = self.suppression_service.suppressed_emails_index
+        limit = self._limit()
+        if self.priority == "dataset":
+            return list(itertools.islice(store, limit))
+        recent = self._recent(store, limit)
+        if self.priority == "recent":
+            return recent
+        entries: List[SuppressionRecord] = []
+        seen = set()
+        for email, _ in self._hot.most_common(limit):
+            info = store.get(self.suppression_service._normalize_email(email))
+            if info is not None:
+                entries.append(info)
+                seen.add(info.email_address)
+        entries.extend(info for info in recent if info.email_address not in seen)
+        return entries[:limit]
+
+    def _recent(self, store, limit: int) -> List[SuppressionRecord]:
+        """
+        The ``limit`` newest entries by LastUpdateTime, newest first.
+        
+        Read off the end of the query index's time order when it is enabled, which touches
+        only the rows returned; otherwise ranked on the store's integer epoch column. No
+        other entry is materialized either way.
+        """
+        if limit <= 0:
+            return []
+        index = self.suppression_service.query_index
+        if index is not None and index.store is store:
+            order = index.order
+            return [store.record_at(row) for row in reversed(order[max(0, len(order) - limit):])]
+        _, _, epochs = store.index_columns()
+        rows = heapq.nlargest(limit, range(len(epochs)), key=epochs.__getitem__)
+        return [store.record_at(row) for row in rows]
+
+    async def _throttle(self, cost: int = 1) -> None:
+        """Wait for ``cost`` rate-limit slots, live traffic to leave a free Ollama slot, and a closed circuit"""
+        ollama_service = self.ollama_service
+        while (self._paused or ollama_service.breaker.state != CLOSED
+               or ollama_service.pending_generations >= ollama_service.max_concurrency):
+            await asyncio.sleep(0.1)
+        delay = self._next_slot - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._next_slot = max(time.monotonic(), self._next_slot) + cost / self.rate_per_second
+
+    async def run_once(self) -> bool:
+        """Warm the current dataset; returns False if interrupted by a newer version or a re-plan"""
+        version = self.suppression_service.dataset_version
+        self._replan = False
+        self.state = "planning"
+        entries = await asyncio.to_thread(self.plan)
+        self._reset_progress(version, len(entries))
+        self.state = "running"
+        batch = []
+        for info in entries:
+            if self._replan or self.suppression_service.dataset_version != version:
+                return False
+            formatted_time = info.formatted_time
+            email = self.suppression_service._normalize_email(info.email_address)
+            if await self.ollama_service.explanation_cache.acontains(email, info.reason, formatted_time):
+                self.skipped += 1
+                self.processed += 1
+                continue
+            batch.append((email, info.reason, info.last_update_time, formatted_time, info.reason_explanation))
+            if len(batch) >= self.ollama_service.batch_size:
+                await self._warm(batch)
+                batch = []
+        if batch:
+            await self._warm(batch)
+        self._warmed_version = version
+        print(f"Explanation warmer finished dataset version {version}: "
+              f"{self.generated:,} generated, {self.skipped:,} already cached, {self.failed:,} failed")
+        return True
+
+    async def _warm(self, batch: List[Tuple[str, str, str, str, str]]) -> None:
+        """Generate one batch of uncached records (one prompt when the batch has several)"""
+        await self._throttle(len(batch))
+        if len(batch) == 1:
+            email, reason, _, formatted_time, reason_explanation = batch[0]
+            try:
+                if await self.ollama_service.warm_explanation(email, reason, formatted_time, reason_explanation):
+                    self.generated += 1
+                else:
+                    self.skipped += 1
+            except Exception as e:
+                print(f"Explanation warmer failed for {email}: {e}")
+                self.failed += 1
+        else:
+            # Nobody is waiting on a warm-up, so no latency budget applies
+            for result in await self.ollama_service.agenerate_batch(batch, budget_seconds=0):
+                if result.degraded:
+                    self.failed += 1
+                else:
+                    self.generated += 1
+        self.processed += len(batch)
+
+    async def run(self) -> None:
+        """Warm every dataset version until cancelled"""
+        while True:
+            if self._replan or self.suppression_service.dataset_version != self._warmed_version:
+                await self.run_once()
+            else:
+                self.state = "waiting_for_changes"
+                await asyncio.sleep(self.poll_seconds)
+
+    def start(self) -> bool:
+        """Start the background task on the running event loop; False if already running"""
+        self._paused = False
+        if self._task is not None and not self._task.done():
+            return False
+        self._task = asyncio.get_running_loop().create_task(self.run())
+        return True
+
+    def pause(self) -> None:
+        self._paused = True
+        self.state = "paused"
+
+    def resume(self) -> None:
+        self._paused = False
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.state = "stopped"
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = time.time() - self.pass_started
+        remaining = max(0, self.planned - self.processed)
+        rate = self.generated / elapsed if elapsed > 0 else 0.0
+        eta = remaining / min(rate, self.rate_per_second) if rate > 0 else None
+        return {
+            "state": "paused" if self._paused and self._task is not None else self.state,
+            "priority": self.priority,
+            "rate_per_second": self.rate_per_second,
+            "dataset_version": self.dataset_version,
+            "planned": self.planned,
+            "processed": self.processed,
+            "generated": self.generated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "progress": round(self.processed / self.planned, 4) if self.planned else None,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "hot_addresses": len(self._hot),
+        }